@@ -1,5 +1,12 @@
 __version__ = "0.1.0"
 
-from .main import main
+
+def main():
+    # Bot application (and its settings, read from environment) is imported only when it's started,
+    #   so tools like "blya_bot.bench" can be used without bot configuration
+    from .main import main as _main
+
+    return _main()
+
 
 __all__ = ["main"]
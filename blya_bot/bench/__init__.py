@@ -0,0 +1,5 @@
+from .asr import BenchConfig, run_asr_benchmark
+from .autotune import autotune_engine_options
+from .words import run_words_benchmark
+
+__all__ = ["BenchConfig", "autotune_engine_options", "run_asr_benchmark", "run_words_benchmark"]
@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from blya_bot.logging_conf import configure_logging
+
+from .asr import BenchConfig, run_asr_benchmark
+from .autotune import autotune_engine_options
+from .words import run_words_benchmark
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m blya_bot.bench", description="blya_bot benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    asr = subparsers.add_parser("asr", help="Speech recognition engines benchmark")
+    asr.add_argument("corpus", type=Path, help="Directory with audio files and reference transcripts (*.txt)")
+    configs = asr.add_mutually_exclusive_group(required=True)
+    configs.add_argument(
+        "--config",
+        type=Path,
+        help='JSON file with list of configurations: [{"name": ..., "engine": ..., "options": {...}, "workers": 0}]',
+    )
+    configs.add_argument("--engine", help="Engine of a single configuration")
+    asr.add_argument("--options", default="{}", help="Engine options of a single configuration, as JSON")
+    asr.add_argument("--workers", type=int, default=0, help="Recognition workers of a single configuration")
+    asr.add_argument("--repeat", type=int, default=1, help="Recognize every file N times")
+    asr.add_argument("--no-warm-up", action="store_true", help="Don't warm up engine before measurements")
+    asr.add_argument("-o", "--output", type=Path, help="Report path, stdout by default")
+
+    autotune = subparsers.add_parser("autotune", help="Tune engine threading and compute type, and save result")
+    autotune.add_argument("--engine", required=True, help="Recognition engine")
+    autotune.add_argument("--options", default="{}", help="Engine options, as JSON")
+    autotune.add_argument("--concurrency", type=int, default=1, help="Messages recognized at a time")
+    autotune.add_argument("--cpus", type=int, help="CPUs available to engine, all available by default")
+    autotune.add_argument("-o", "--output", type=Path, help="Tuned options path, stdout by default")
+
+    words = subparsers.add_parser("words", help="Word counters benchmark")
+    words.add_argument("texts", type=Path, help="File with one text per line, or directory with *.txt files")
+    words.add_argument("--dictionary", type=Path, default=Path("fixtures/bad_words.txt"), help="Dictionary file")
+    words.add_argument("--compiled", type=Path, help="Compiled dictionary path, next to dictionary by default")
+    words.add_argument("--counters", nargs="+", help="Word counters to compare, all by default")
+    words.add_argument("--repeat", type=int, default=5, help="Process every text N times")
+    words.add_argument("-o", "--output", type=Path, help="Report path, stdout by default")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    configure_logging(log_level="info", console_colors=sys.stderr.isatty())
+
+    if args.command == "asr":
+        if args.config is not None:
+            configs = [BenchConfig.from_dict(item) for item in json.loads(args.config.read_text())]
+        else:
+            configs = [
+                BenchConfig.from_dict(
+                    {"engine": args.engine, "options": json.loads(args.options), "workers": args.workers}
+                )
+            ]
+        report = run_asr_benchmark(configs, args.corpus, repeat=args.repeat, warm_up=not args.no_warm_up)
+    elif args.command == "autotune":
+        report = autotune_engine_options(
+            args.engine, json.loads(args.options), cpus=args.cpus, concurrency=args.concurrency
+        )
+    elif args.command == "words":
+        report = run_words_benchmark(
+            args.texts, args.dictionary, args.compiled, counters=args.counters, repeat=args.repeat
+        )
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output is None:
+        print(output)
+    else:
+        args.output.write_text(output + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
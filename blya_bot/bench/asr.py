@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import platform
+import re
+import resource
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import numpy as np
+import structlog
+
+from blya_bot.logging_conf import configure_logging
+from blya_bot.recognition import SAMPLE_RATE, BaseSpeechRecognizer, decode_audio, load_recognizer
+
+logger = structlog.getLogger(__name__)
+
+REFERENCE_SUFFIX = ".txt"
+
+
+@dataclass(slots=True)
+class BenchConfig:
+    name: str
+    engine: str
+    options: dict[str, Any] = field(default_factory=dict)
+    workers: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> BenchConfig:
+        return cls(
+            name=data.get("name", data["engine"]),
+            engine=data["engine"],
+            options=data.get("options", {}),
+            workers=data.get("workers", 0),
+        )
+
+
+@dataclass(slots=True)
+class CorpusItem:
+    audio_path: Path
+    reference: str
+
+
+def load_corpus(path: Path) -> list[CorpusItem]:
+    # Corpus is a directory of audio files, every one of them with reference transcript next to it: "01.ogg", "01.txt"
+    items = []
+    for audio_path in sorted(path.iterdir()):
+        if not audio_path.is_file() or audio_path.suffix == REFERENCE_SUFFIX:
+            continue
+        reference_path = audio_path.with_suffix(REFERENCE_SUFFIX)
+        if not reference_path.exists():
+            logger.warning("Reference transcript not found, file skipped", path=str(audio_path))
+            continue
+        items.append(CorpusItem(audio_path, reference_path.read_text(encoding="utf-8").strip()))
+    return items
+
+
+def normalize_words(text: str) -> list[str]:
+    text = text.lower().replace("ё", "е")
+    return re.sub(r"[^\w\s]", " ", text).split()
+
+
+def word_errors(reference: list[str], hypothesis: list[str]) -> int:
+    # Levenshtein distance over words: substitutions + deletions + insertions
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def peak_rss_mb(who: int) -> float:
+    # "ru_maxrss" is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+async def _bench_recognizer(
+    recognizer: BaseSpeechRecognizer, corpus: list[CorpusItem], repeat: int, warm_up: bool
+) -> dict[str, Any]:
+    audios = [decode_audio(str(item.audio_path)) for item in corpus]
+    if warm_up and audios:
+        await recognizer.warm_up(audios[0])
+
+    files = []
+    latencies: list[float] = []
+    total_errors = 0
+    total_words = 0
+    for item, audio in zip(corpus, audios):
+        file_latencies = []
+        hypothesis = ""
+        for _ in range(repeat):
+            start_time = perf_counter()
+            hypothesis = await recognizer.recognize(audio)
+            file_latencies.append(perf_counter() - start_time)
+        latencies.extend(file_latencies)
+
+        reference_words = normalize_words(item.reference)
+        errors = word_errors(reference_words, normalize_words(hypothesis))
+        total_errors += errors
+        total_words += len(reference_words)
+        files.append(
+            {
+                "file": item.audio_path.name,
+                "duration": len(audio) / SAMPLE_RATE,
+                "latency": float(np.mean(file_latencies)),
+                "wer": errors / len(reference_words) if reference_words else float(errors > 0),
+                "hypothesis": hypothesis,
+            }
+        )
+
+    audio_duration = sum(len(audio) for audio in audios) / SAMPLE_RATE * repeat
+    return {
+        "rtf": sum(latencies) / audio_duration if audio_duration else None,
+        "latency": {
+            "p50": float(np.percentile(latencies, 50)) if latencies else None,
+            "p95": float(np.percentile(latencies, 95)) if latencies else None,
+            "mean": float(np.mean(latencies)) if latencies else None,
+        },
+        "wer": total_errors / total_words if total_words else None,
+        "files": files,
+    }
+
+
+def run_config(config: BenchConfig, corpus: list[CorpusItem], repeat: int, warm_up: bool) -> dict[str, Any]:
+    # Runs in a separate process, so every configuration starts cold, and memory usage is measured separately
+    configure_logging(log_level="warning", console_colors=False)
+    start_time = perf_counter()
+    recognizer = load_recognizer(config.engine, config.options, workers=config.workers)
+    load_time = perf_counter() - start_time
+
+    async def bench() -> dict[str, Any]:
+        try:
+            return await _bench_recognizer(recognizer, corpus, repeat, warm_up)
+        finally:
+            await recognizer.teardown()
+
+    result = asyncio.run(bench())
+    return {
+        **asdict(config),
+        "load_time": load_time,
+        **result,
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        # Recognition workers, if any. The largest one.
+        "peak_workers_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def run_asr_benchmark(
+    configs: list[BenchConfig], corpus_path: Path, repeat: int = 1, warm_up: bool = True
+) -> dict[str, Any]:
+    from blya_bot import __version__
+
+    corpus = load_corpus(corpus_path)
+    if not corpus:
+        raise ValueError(f"No audio files with reference transcripts found in {str(corpus_path)!r}")
+
+    results = []
+    for config in configs:
+        logger.info("Running benchmark", config=config.name, engine=config.engine, files=len(corpus))
+        # "spawn" gives clean process for every configuration: engines may conflict, being loaded in one process
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            try:
+                results.append(executor.submit(run_config, config, corpus, repeat, warm_up).result())
+            except Exception as e:
+                logger.error("Benchmark failed", config=config.name, error=str(e))
+                results.append({**asdict(config), "error": str(e)})
+        if "error" not in results[-1]:
+            logger.info(
+                "Benchmark finished",
+                config=config.name,
+                rtf=f"{results[-1]['rtf']:.3f}",
+                p95=f"{results[-1]['latency']['p95']:.3f}sec.",
+                wer=f"{results[-1]['wer']:.3f}" if results[-1]["wer"] is not None else None,
+            )
+
+    return {
+        "version": __version__,
+        "host": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": multiprocessing.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "corpus": {
+            "path": str(corpus_path),
+            "files": len(corpus),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
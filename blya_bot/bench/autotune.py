@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import numpy as np
+import structlog
+
+from blya_bot.logging_conf import configure_logging
+from blya_bot.recognition import get_recognizer_by_name
+from blya_bot.utils import available_cpus
+
+logger = structlog.getLogger(__name__)
+
+TUNING_FILE_SUFFIX = ".tuning.json"
+# Options, chosen by auto-tuning, if they are not set explicitly
+TUNABLE_OPTIONS = {
+    "faster-whisper": ("compute_type", "cpu_threads", "num_workers"),
+    "pywhispercpp": ("n_threads",),
+}
+
+
+def cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def candidate_options(engine: str, options: dict[str, Any], cpus: int, concurrency: int) -> list[dict[str, Any]]:
+    """Combinations of tunable options, worth trying on given amount of CPUs. Explicitly set options are kept."""
+    if engine == "faster-whisper":
+        cuda = options.get("device", "auto") == "cuda"
+        if "compute_type" in options:
+            compute_types = [options["compute_type"]]
+        else:
+            compute_types = ["float16", "int8_float16"] if cuda else ["int8", "float32"]
+        # More parallel transcriptions than scheduler runs at once are useless
+        workers_values = [options["num_workers"]] if "num_workers" in options else sorted({1, concurrency})
+
+        candidates = []
+        for compute_type in compute_types:
+            for workers in workers_values:
+                if cuda or "cpu_threads" in options:
+                    threads_values = [options.get("cpu_threads", 0)]
+                else:
+                    # CPUs are split between parallel transcriptions, all of them are used or a half
+                    threads_values = sorted({max(1, cpus // workers), max(1, cpus // workers // 2)})
+                candidates.extend(
+                    {"compute_type": compute_type, "cpu_threads": threads, "num_workers": workers}
+                    for threads in threads_values
+                )
+        return candidates
+
+    if engine == "pywhispercpp":
+        if "n_threads" in options:
+            return []
+        # Single whisper.cpp context, transcriptions are not parallel
+        return [{"n_threads": threads} for threads in sorted({cpus, max(1, cpus // 2), max(1, cpus // 4)})]
+
+    return []
+
+
+def measure_options(engine: str, options: dict[str, Any], duration: float, concurrency: int, rounds: int) -> dict:
+    # Runs in a separate process, every candidate is loaded from scratch
+    from blya_bot.core.bot_core import make_warm_up_audio
+
+    configure_logging(log_level="warning", console_colors=False)
+    audio = make_warm_up_audio(duration)
+    recognizer = get_recognizer_by_name(engine).from_options(**options)
+
+    async def measure() -> dict:
+        try:
+            await recognizer.warm_up(audio)
+            latencies = []
+            for _ in range(rounds):
+                start_time = perf_counter()
+                await recognizer.recognize(audio)
+                latencies.append(perf_counter() - start_time)
+
+            start_time = perf_counter()
+            for _ in range(rounds):
+                await asyncio.gather(*[recognizer.recognize(audio) for _ in range(concurrency)])
+            elapsed = perf_counter() - start_time
+        finally:
+            await recognizer.teardown()
+        return {
+            "latency": float(np.median(latencies)),
+            # Seconds of audio recognized per second, with "concurrency" messages at a time
+            "throughput": duration * concurrency * rounds / elapsed,
+        }
+
+    return asyncio.run(measure())
+
+
+def choose_best(results: list[dict[str, Any]], latency_tolerance: float) -> dict[str, Any] | None:
+    # The best throughput, among candidates with single message latency close to the best one
+    measured = [result for result in results if "error" not in result]
+    if not measured:
+        return None
+    best_latency = min(result["latency"] for result in measured)
+    acceptable = [result for result in measured if result["latency"] <= best_latency * (1 + latency_tolerance)]
+    return max(acceptable, key=lambda result: result["throughput"])
+
+
+def tuning_path(engine: str, options: dict[str, Any]) -> Path:
+    # Tuning result is stored next to the model, if model is a local path
+    model = Path(options.get("model") or options.get("model_path") or engine)
+    if model.is_dir():
+        return model / f"blya_bot{TUNING_FILE_SUFFIX}"
+    if model.is_file():
+        return model.with_name(model.name + TUNING_FILE_SUFFIX)
+    if models_dir := options.get("models_dir"):
+        return Path(models_dir) / f"{model.name}{TUNING_FILE_SUFFIX}"
+    return Path(f"{engine}-{model.name}{TUNING_FILE_SUFFIX}")
+
+
+def tuning_key(engine: str, options: dict[str, Any], cpus: int, concurrency: int) -> str:
+    # Result is valid for the same hardware, load and the rest of engine options
+    fixed = {name: value for name, value in options.items() if name not in TUNABLE_OPTIONS.get(engine, ())}
+    options_hash = hashlib.blake2b(json.dumps(fixed, sort_keys=True).encode(), digest_size=8).hexdigest()
+    return f"{engine}/{cpu_model()}/cpus={cpus}/concurrency={concurrency}/{options_hash}"
+
+
+def _load_tunings(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Can't read tuning file", path=str(path), error=str(e))
+        return {}
+
+
+def _save_tunings(path: Path, tunings: dict[str, Any]) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(tunings, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # E.g. models directory is read-only, tuning will be repeated on next start
+        logger.warning("Can't save tuning file", path=str(path), error=str(e))
+
+
+def autotune_engine_options(
+    engine: str,
+    options: dict[str, Any],
+    cpus: int | None = None,
+    concurrency: int = 1,
+    duration: float = 10.0,
+    rounds: int = 2,
+    latency_tolerance: float = 0.25,
+) -> dict[str, Any]:
+    """
+    Engine options with threading and compute type, tuned for this CPU and expected concurrency.
+
+    Every candidate is measured on synthetic audio in a separate process. Result is saved to tuning file,
+    and reused on next start with the same hardware and options.
+    """
+    cpus = cpus or available_cpus()
+    candidates = candidate_options(engine, options, cpus, concurrency)
+    if len(candidates) < 2:
+        logger.info("Nothing to tune for recognition engine", engine=engine)
+        return options
+
+    path = tuning_path(engine, options)
+    key = tuning_key(engine, options, cpus, concurrency)
+    tunings = _load_tunings(path)
+    if (tuning := tunings.get(key)) is not None:
+        logger.info("Tuned engine options loaded", engine=engine, path=str(path), tuned=tuning["options"])
+        return {**options, **tuning["options"]}
+
+    logger.info(
+        "Tuning recognition engine...", engine=engine, cpus=cpus, concurrency=concurrency, candidates=len(candidates)
+    )
+    results = []
+    for candidate in candidates:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            try:
+                measured = executor.submit(
+                    measure_options, engine, {**options, **candidate}, duration, concurrency, rounds
+                ).result()
+            except Exception as e:
+                logger.warning("Tuning candidate failed", engine=engine, options=candidate, error=str(e))
+                results.append({"options": candidate, "error": str(e)})
+                continue
+        logger.info(
+            "Tuning candidate measured",
+            engine=engine,
+            options=candidate,
+            latency=f"{measured['latency']:.3f}sec.",
+            throughput=f"{measured['throughput']:.2f}x",
+        )
+        results.append({"options": candidate, **measured})
+
+    best = choose_best(results, latency_tolerance)
+    if best is None:
+        logger.warning("Recognition engine tuning failed, options are not changed", engine=engine)
+        return options
+
+    logger.info("Recognition engine tuned", engine=engine, tuned=best["options"], path=str(path))
+    tunings[key] = {"options": best["options"], "tuned_at": datetime.now().isoformat(), "results": results}
+    _save_tunings(path, tunings)
+    return {**options, **best["options"]}
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import multiprocessing
+import platform
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import numpy as np
+import structlog
+
+from blya_bot.dictionary import load_dictionary
+from blya_bot.word_count import AVAILABLE_WORD_COUNTERS, get_word_counter_by_name
+
+logger = structlog.getLogger(__name__)
+
+
+def load_texts(path: Path) -> list[str]:
+    # Directory of "*.txt" files (transcripts of ASR corpus fit), or a single file with one text per line
+    if path.is_dir():
+        texts = [item.read_text(encoding="utf-8").strip() for item in sorted(path.glob("*.txt"))]
+    else:
+        texts = path.read_text(encoding="utf-8").splitlines()
+    return [text for text in texts if text.strip()]
+
+
+def run_words_benchmark(
+    texts_path: Path,
+    dictionary_path: Path,
+    artifact_path: Path | None = None,
+    counters: list[str] | None = None,
+    repeat: int = 5,
+) -> dict[str, Any]:
+    from blya_bot import __version__
+
+    texts = load_texts(texts_path)
+    if not texts:
+        raise ValueError(f"No texts found in {str(texts_path)!r}")
+    dictionary = load_dictionary(dictionary_path, artifact_path)
+    counters = counters or list(AVAILABLE_WORD_COUNTERS)
+    total_chars = sum(len(text) for text in texts)
+
+    results = []
+    summaries: dict[str, list] = {}
+    for name in counters:
+        counter_cls = get_word_counter_by_name(name)
+        start_time = perf_counter()
+        counter = counter_cls.from_dictionary(dictionary)
+        build_time = perf_counter() - start_time
+
+        latencies: list[float] = []
+        for _ in range(repeat):
+            for text in texts:
+                start_time = perf_counter()
+                counter.calculate_summary(text)
+                latencies.append(perf_counter() - start_time)
+        summaries[name] = [counter.calculate_summary(text) for text in texts]
+
+        elapsed = sum(latencies)
+        results.append(
+            {
+                "counter": name,
+                "build_time": build_time,
+                "latency": {
+                    "p50": float(np.percentile(latencies, 50)),
+                    "p95": float(np.percentile(latencies, 95)),
+                    "mean": float(np.mean(latencies)),
+                },
+                # Characters of text per second
+                "throughput": total_chars * repeat / elapsed if elapsed else None,
+                "matches": sum(sum(summary.counter.values()) for summary in summaries[name]),
+            }
+        )
+        logger.info(
+            "Benchmark finished",
+            counter=name,
+            build_time=f"{build_time:.3f}sec.",
+            p50=f"{results[-1]['latency']['p50'] * 1000:.3f}ms",
+            matches=results[-1]["matches"],
+        )
+
+    # Texts, where counters find different words, compared to the first one
+    baseline = summaries[counters[0]]
+    for result in results:
+        result["mismatched_texts"] = sum(
+            summary.markup != expected.markup for summary, expected in zip(summaries[result["counter"]], baseline)
+        )
+
+    return {
+        "version": __version__,
+        "host": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": multiprocessing.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "corpus": {
+            "path": str(texts_path),
+            "texts": len(texts),
+            "chars": total_chars,
+            "repeat": repeat,
+        },
+        "dictionary": {"path": str(dictionary_path), "entries": len(dictionary)},
+        "results": results,
+    }
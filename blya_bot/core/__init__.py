@@ -1,3 +1,16 @@
 from .bot_core import BotCore
+from .dictionary_reloader import DictionaryReloader
+from .language_profiles import ChatLanguageProfiles, LanguageProfile
+from .media import BaseMediaSource
+from .scheduler import InferenceScheduler, Priority, SchedulerOverloaded
 
-__all__ = ["BotCore"]
+__all__ = [
+    "BotCore",
+    "BaseMediaSource",
+    "ChatLanguageProfiles",
+    "DictionaryReloader",
+    "InferenceScheduler",
+    "LanguageProfile",
+    "Priority",
+    "SchedulerOverloaded",
+]
@@ -1,19 +1,50 @@
 from __future__ import annotations
 
+import asyncio
+import io
 from datetime import datetime
-from tempfile import _TemporaryFileWrapper as TempFile
-from time import time
+from time import monotonic, time
+from typing import AsyncIterator, Awaitable, Callable
 
+import numpy as np
 import structlog
-from aiogram import types
 
 from blya_bot.models import TextSummary, TranscriptionData
-from blya_bot.recognition import BaseSpeechRecognizer
-from blya_bot.transcription_cache import BaseTranscriptionCache
+from blya_bot.recognition import (
+    SAMPLE_RATE,
+    BaseSpeechRecognizer,
+    RecognitionContext,
+    decode_audio_async,
+    recognition_context,
+)
+from blya_bot.transcription_cache import BaseTranscriptionCache, FingerprintTranscriptionCache
 from blya_bot.word_count import BaseWordCounter
 
+from .language_profiles import ChatLanguageProfiles
+from .media import BaseMediaSource
+from .scheduler import InferenceScheduler, Priority
+from .single_flight import SingleFlight
+
 logger = structlog.getLogger(__name__)
 
+# Receives text transcribed so far
+ProgressCallback = Callable[[str], Awaitable[None]]
+
+# Time (seconds), given to engine after deadline to stop on its own, before recognition task is cancelled
+DEADLINE_GRACE = 5.0
+
+WARM_UP_TEXT = "Раз, два, три, проверка связи. Ёлки-палки, как же хорошо, что всё работает!"
+
+
+def make_warm_up_audio(duration: float = 2.0) -> np.ndarray:
+    # Voice-like signal: harmonics of wobbling pitch with syllable-rate amplitude modulation, and a bit of noise
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(140 + 20 * np.sin(2 * np.pi * 3 * t)) / SAMPLE_RATE
+    voice = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    noise = np.random.default_rng(0).normal(0, 0.01, len(t))
+    return (0.1 * voice * envelope + noise).astype(np.float32)
+
 
 class BotCore:
     def __init__(
@@ -21,41 +52,221 @@ class BotCore:
         recognizer: BaseSpeechRecognizer,
         word_counter: BaseWordCounter,
         cache: BaseTranscriptionCache | None = None,
+        scheduler: InferenceScheduler | None = None,
+        fingerprint_cache: FingerprintTranscriptionCache | None = None,
+        language_profiles: ChatLanguageProfiles | None = None,
+        timeout: float = 0.0,
+        timeout_per_audio_second: float = 0.0,
     ) -> None:
         self.recognizer = recognizer
         self.word_counter = word_counter
         self.cache = cache
+        self.scheduler = scheduler
+        self.fingerprint_cache = fingerprint_cache
+        self.language_profiles = language_profiles
+        self.timeout = timeout
+        self.timeout_per_audio_second = timeout_per_audio_second
+        self._in_flight: SingleFlight[TranscriptionData] = SingleFlight()
+        # Set when warm-up is finished, and the first real request won't pay for cold start
+        self.ready = False
+
+    async def warm_up(self, recognition: bool = True) -> None:
+        if recognition:
+            logger.info("Warming up recognition engine...")
+            start_time = time()
+            await self.recognizer.warm_up(make_warm_up_audio())
+            logger.info("Recognition engine warmed up", elapsed_time=f"{time()-start_time:.4f}sec.")
+
+        start_time = time()
+        self.calculate_summary(WARM_UP_TEXT)
+        logger.info("Word counter warmed up", elapsed_time=f"{time()-start_time:.4f}sec.")
+        self.ready = True
 
-    async def transcribe_text(self, file: TempFile) -> str:
+    async def transcribe_text(
+        self,
+        audio: np.ndarray,
+        on_progress: ProgressCallback | None = None,
+        recognizer: BaseSpeechRecognizer | None = None,
+    ) -> str:
         logger.debug("Started transcribing voice")
         start_time = time()
-        transcribed_text = await self.recognizer.recognize(file)
+        recognizer = recognizer or self.recognizer
+        context = recognition_context.get()
+        if on_progress is None and (context is None or context.deadline is None):
+            transcribed_text = await recognizer.recognize(audio)
+        else:
+            # Parts are collected one by one, so text recognized before deadline is not lost
+            transcribed_text = await self._collect_parts(recognizer.recognize_iter(audio), on_progress, context)
         logger.debug("Message transcribed", elapsed_time=f"{time()-start_time:.4f}sec.")
         return transcribed_text
 
+    async def load_audio(self, media: BaseMediaSource) -> np.ndarray:
+        buf = io.BytesIO()
+        await media.download(buf)
+        buf.seek(0)
+        start_time = time()
+        audio = await decode_audio_async(buf)
+        logger.debug("Media decoded", samples=len(audio), elapsed_time=f"{time()-start_time:.4f}sec.")
+        return audio
+
+    async def transcribe_stream(
+        self,
+        media: BaseMediaSource,
+        on_progress: ProgressCallback | None = None,
+        recognizer: BaseSpeechRecognizer | None = None,
+    ) -> str:
+        logger.debug("Started transcribing voice stream")
+        start_time = time()
+        recognizer = recognizer or self.recognizer
+        transcribed_text = await self._collect_parts(
+            recognizer.recognize_stream(media.iter_chunks()), on_progress, recognition_context.get()
+        )
+        logger.debug("Message stream transcribed", elapsed_time=f"{time()-start_time:.4f}sec.")
+        return transcribed_text
+
+    @staticmethod
+    async def _collect_parts(
+        parts: AsyncIterator[str], on_progress: ProgressCallback | None, context: RecognitionContext | None = None
+    ) -> str:
+        text = ""
+        if context is None or context.deadline is None:
+            async for part in parts:
+                text += part
+                if on_progress is not None and part:
+                    await on_progress(text)
+            return text
+
+        # Engines stop on deadline themselves. Engine, which didn't stop in time (e.g. stuck in decoding),
+        #   is cancelled: cancellation stops its inference thread on the next recognized part.
+        loop = asyncio.get_running_loop()
+        try:
+            async with asyncio.timeout_at(loop.time() + context.deadline - monotonic() + DEADLINE_GRACE):
+                async for part in parts:
+                    text += part
+                    if on_progress is not None and part:
+                        await on_progress(text)
+        except TimeoutError:
+            logger.warning("Recognition didn't stop at deadline, cancelled", grace=DEADLINE_GRACE)
+            context.partial = True
+        return text
+
+    def recognition_timeout(self, duration: float) -> float | None:
+        timeout = self.timeout + self.timeout_per_audio_second * duration
+        return timeout if timeout > 0 else None
+
     def calculate_summary(self, text: str) -> TextSummary:
         logger.debug("Counting words")
         start_time = time()
-        summary = self.word_counter.calculate_summary(text.lower())  # TODO: Maybe better text preparation for counting
+        # Counter normalizes text itself, markup positions are in original text
+        summary = self.word_counter.calculate_summary(text)
         logger.debug("Words counted", elapsed_time=f"{time()-start_time:.4f}sec.")
         return summary
 
-    async def transcribe_and_summarize(self, unique_id: str, file: TempFile) -> TranscriptionData:
+    async def transcribe_and_summarize(
+        self,
+        media: BaseMediaSource,
+        chat_id: int | None = None,
+        duration: float = 0.0,
+        priority: Priority = Priority.NORMAL,
+        on_progress: ProgressCallback | None = None,
+    ) -> TranscriptionData:
+        unique_id = media.file_unique_id
+        # Cache is checked before any I/O, cache hit costs no download at all
         if self.cache:
             cached = await self.cache.get(unique_id)
             if cached:
                 logger.debug("Transcription obtained from cache")
                 return cached
 
-        transcribed_text = await self.transcribe_text(file)
+        # Concurrent requests for the same file share one download and one recognition.
+        #   Progress is reported only to the caller, which actually started transcription.
+        return await self._in_flight.do(
+            unique_id, lambda: self._download_and_transcribe(media, chat_id, duration, priority, on_progress)
+        )
+
+    async def _download_and_transcribe(
+        self,
+        media: BaseMediaSource,
+        chat_id: int | None,
+        duration: float,
+        priority: Priority,
+        on_progress: ProgressCallback | None = None,
+    ) -> TranscriptionData:
+        if self.scheduler:
+            # Fail fast before download. May raise "SchedulerOverloaded", caller is responsible for answering user
+            self.scheduler.check_admission(duration)
+
+        # Recognizer is chosen before queueing, by load, which message will wait behind
+        context = RecognitionContext(
+            chat_id=chat_id,
+            duration=duration,
+            queue_depth=self.scheduler.queue_depth if self.scheduler else 0,
+            language=self.language_profiles.language_for(chat_id) if self.language_profiles else None,
+        )
+        recognizer = self.recognizer.route(context)
+
+        fingerprint = None
+        # Fingerprint lookup requires decoded audio, so streaming recognition is not used with fingerprint cache
+        if media.streamable and recognizer.supports_streaming and self.fingerprint_cache is None:
+            # Audio is decoded and recognized while downloading, without temp file
+            transcribed_text = await self._schedule(
+                lambda: self.transcribe_stream(media, on_progress, recognizer), context, priority
+            )
+        else:
+            audio = await self.load_audio(media)
+            if self.fingerprint_cache:
+                # Same audio, uploaded as a different file
+                fingerprint = await self.fingerprint_cache.fingerprint(audio)
+                cached = await self.fingerprint_cache.get(fingerprint, media.file_unique_id)
+                if cached:
+                    logger.debug("Transcription obtained from fingerprint cache")
+                    if self.cache:
+                        await self.cache.store(media.file_unique_id, cached)
+                    return cached
+            transcribed_text = await self._schedule(
+                lambda: self.transcribe_text(audio, on_progress, recognizer), context, priority
+            )
+        if self.language_profiles:
+            await self.language_profiles.observe(context)
+
         summary = self.calculate_summary(transcribed_text)
         data = TranscriptionData(
             transcription=transcribed_text,
             summary=summary,
-            file_unique_id=unique_id,
+            file_unique_id=media.file_unique_id,
             date_processed=datetime.now(),
+            partial=context.partial,
         )
+        if data.partial:
+            # Next request for the same audio may have better luck, partial transcription is not cached
+            logger.warning("Recognition stopped by deadline, transcription is partial", duration=duration)
+            return data
         if self.cache:
-            await self.cache.store(unique_id, data)
+            await self.cache.store(media.file_unique_id, data)
             logger.debug("Transcription stored to cache")
+        if self.fingerprint_cache and fingerprint is not None:
+            await self.fingerprint_cache.store(fingerprint, data)
         return data
+
+    async def _schedule(
+        self,
+        job_fn: Callable[[], Awaitable[str]],
+        context: RecognitionContext,
+        priority: Priority,
+    ) -> str:
+        async def run_in_context() -> str:
+            # Engines read request hints from context, and report recognition details back
+            token = recognition_context.set(context)
+            # Time limit is counted from the job start, waiting in queue is limited by scheduler
+            if (timeout := self.recognition_timeout(context.duration)) is not None:
+                context.deadline = monotonic() + timeout
+            try:
+                return await job_fn()
+            finally:
+                recognition_context.reset(token)
+
+        if self.scheduler:
+            return await self.scheduler.submit(
+                run_in_context, flow=context.chat_id, cost=context.duration, priority=priority
+            )
+        return await run_in_context()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import time
+from typing import Type
+
+import structlog
+
+from blya_bot.dictionary import ExpansionBudget, load_dictionary
+from blya_bot.word_count import BaseWordCounter
+
+from .bot_core import BotCore
+
+logger = structlog.getLogger(__name__)
+
+
+class DictionaryReloader:
+    """
+    Rebuilds word counter, when dictionary file is changed (or on demand), and swaps it into bot core.
+
+    Dictionary is built in a separate process, and counter - in a thread, so event loop keeps serving messages.
+    Word counter is replaced with a single assignment: summaries, being calculated, finish with the old one.
+    """
+
+    def __init__(
+        self,
+        core: BotCore,
+        dsl_path: Path,
+        artifact_path: Path | None = None,
+        counter_cls: Type[BaseWordCounter] | None = None,
+        poll_interval: float = 0.0,
+        budget: ExpansionBudget | None = None,
+    ) -> None:
+        self.core = core
+        self.dsl_path = dsl_path
+        self.artifact_path = artifact_path
+        self.counter_cls = counter_cls or type(core.word_counter)
+        self.poll_interval = poll_interval
+        self.budget = budget
+        self._lock = asyncio.Lock()
+        self._signature = self._file_signature()
+        self._watch_task: asyncio.Task | None = None
+
+    def _file_signature(self) -> tuple[int, int] | None:
+        try:
+            stat = self.dsl_path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def reload(self) -> int:
+        """Rebuilds dictionary and word counter, returns amount of dictionary words"""
+        async with self._lock:
+            logger.info("Reloading dictionary...", path=str(self.dsl_path))
+            start_time = time()
+            self._signature = self._file_signature()
+            loop = asyncio.get_running_loop()
+            # Clean process: morphological analyzer is loaded only there, and its memory is freed after build
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                dictionary = await loop.run_in_executor(
+                    executor, load_dictionary, self.dsl_path, self.artifact_path, None, self.budget
+                )
+            word_counter = await asyncio.to_thread(self.counter_cls.from_dictionary, dictionary)
+            self.core.word_counter = word_counter
+            logger.info(
+                "Dictionary reloaded", total_loaded=len(dictionary), elapsed_time=f"{time()-start_time:.4f}sec."
+            )
+            return len(dictionary)
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self._file_signature() == self._signature:
+                continue
+            try:
+                await self.reload()
+            except Exception:
+                # E.g. syntax error in dictionary, old counter is kept until file is changed again
+                logger.exception("Dictionary reload failed", path=str(self.dsl_path))
+
+    def start(self) -> None:
+        if self.poll_interval > 0 and self._watch_task is None:
+            logger.info("Watching dictionary file", path=str(self.dsl_path), poll_interval=self.poll_interval)
+            self._watch_task = asyncio.create_task(self.watch())
+
+    async def stop(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
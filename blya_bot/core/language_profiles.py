@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import structlog
+
+from blya_bot.recognition import RecognitionContext
+
+logger = structlog.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class LanguageProfile:
+    language: str | None = None
+    # Amount of confident detections of "language" in a row
+    detections: int = 0
+    pinned: bool = False
+    # Messages recognized with pinned language since the last detection
+    since_detection: int = 0
+
+
+class ChatLanguageProfiles:
+    """
+    Learns language of every chat from engine language detection, and pins it, once it's stable.
+
+    Pinned language is passed to engine, so language detection is skipped. Language is detected again
+    after every "redetect_every" messages, or when recognition with pinned language looks unreliable.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        min_probability: float = 0.8,
+        pin_after: int = 3,
+        redetect_every: int = 50,
+        min_avg_logprob: float = -1.0,
+    ) -> None:
+        self.path = path
+        self.min_probability = min_probability
+        self.pin_after = pin_after
+        self.redetect_every = redetect_every
+        self.min_avg_logprob = min_avg_logprob
+        self._profiles: dict[int, LanguageProfile] = {}
+        self._save_lock = asyncio.Lock()
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self._profiles = {int(chat_id): LanguageProfile(**profile) for chat_id, profile in data.items()}
+        logger.info(
+            "Chat language profiles loaded",
+            chats=len(self._profiles),
+            pinned=sum(profile.pinned for profile in self._profiles.values()),
+        )
+
+    def _dump(self, data: str) -> None:
+        assert self.path is not None  # noqa: S101
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    async def save(self) -> None:
+        if self.path is None:
+            return
+        data = json.dumps({str(chat_id): asdict(profile) for chat_id, profile in self._profiles.items()})
+        async with self._save_lock:
+            await asyncio.get_running_loop().run_in_executor(None, self._dump, data)
+
+    def language_for(self, chat_id: int | None) -> str | None:
+        if chat_id is None or (profile := self._profiles.get(chat_id)) is None or not profile.pinned:
+            return None
+        if profile.since_detection >= self.redetect_every:
+            # Language may change over time, detect it again sometimes
+            return None
+        return profile.language
+
+    async def observe(self, context: RecognitionContext) -> None:
+        if context.chat_id is None or context.detected_language is None:
+            return
+        profile = self._profiles.setdefault(context.chat_id, LanguageProfile())
+        was_pinned, was_language = profile.pinned, profile.language
+
+        if context.language is not None:
+            # Recognized with pinned language
+            profile.since_detection += 1
+            if context.avg_logprob is not None and context.avg_logprob < self.min_avg_logprob:
+                profile.pinned = False
+                profile.detections = 0
+        elif context.language_probability is not None and context.language_probability >= self.min_probability:
+            if context.detected_language == profile.language:
+                profile.detections += 1
+            else:
+                profile.language = context.detected_language
+                profile.detections = 1
+            profile.pinned = profile.detections >= self.pin_after
+            profile.since_detection = 0
+        else:
+            # Not sure about language, better to keep detecting it
+            profile.pinned = False
+            profile.detections = 0
+            profile.since_detection = 0
+
+        if profile.pinned != was_pinned:
+            logger.info(
+                "Chat language pinned" if profile.pinned else "Chat language unpinned",
+                chat_id=context.chat_id,
+                language=profile.language,
+            )
+        if profile.pinned != was_pinned or profile.language != was_language:
+            # Profiles are saved only when chat language is learned or forgotten, not on every message:
+            #   counters lost on restart are just learned again
+            await self.save()
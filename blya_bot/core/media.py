@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from abc import abstractmethod
+from typing import AsyncIterator, BinaryIO, Protocol
+
+
+class BaseMediaSource(Protocol):
+    # Stable file identifier, used as cache and deduplication key
+    file_unique_id: str
+    # Media container can be decoded sequentially, without seeking (ogg voice notes, but not mp4 video notes)
+    streamable: bool
+
+    @abstractmethod
+    async def download(self, destination: BinaryIO) -> None:
+        pass
+
+    @abstractmethod
+    def iter_chunks(self) -> AsyncIterator[bytes]:
+        pass
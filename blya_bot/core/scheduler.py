@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+from dataclasses import dataclass, field
+from enum import IntEnum
+from itertools import count
+from time import time
+from typing import Any, Awaitable, Callable, Hashable
+
+import structlog
+
+logger = structlog.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    # Value is used as a weight multiplier in fair queuing, bigger value - bigger share
+    NORMAL = 1
+    HIGH = 4
+
+
+class SchedulerOverloaded(Exception):
+    def __init__(self, reason: str, queue_depth: int, expected_wait: float) -> None:
+        super().__init__(
+            f"Scheduler overloaded ({reason}): queue_depth={queue_depth}, expected_wait={expected_wait:.1f}s"
+        )
+        self.reason = reason
+        self.queue_depth = queue_depth
+        self.expected_wait = expected_wait
+
+
+@dataclass(order=True, slots=True)
+class _Job:
+    finish_tag: float
+    seq: int
+    flow: Hashable = field(compare=False)
+    cost: float = field(compare=False)
+    start_tag: float = field(compare=False)
+    job_fn: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    # Context of submitter (structlog variables, recognition context), job runs in it
+    context: contextvars.Context = field(compare=False)
+
+
+class InferenceScheduler:
+    """
+    Bounded, weighted-fair job queue with concurrency limit.
+
+    Jobs are grouped in flows (usually by chat id), and ordered with weighted fair queuing: the job with
+    the smallest virtual finish tag goes first, so one busy chat can't starve others. Virtual time follows
+    the start tag of the last dispatched job. Cost of job is audio duration in seconds,
+    job weight is defined by its priority.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 1,
+        max_queue_depth: int = 100,
+        max_expected_wait: float | None = None,
+        initial_cost_rate: float = 1.0,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("Scheduler concurrency must be positive")
+        self.concurrency = concurrency
+        self.max_queue_depth = max_queue_depth
+        self.max_expected_wait = max_expected_wait
+
+        self._queue: list[_Job] = []
+        self._seq = count()
+        self._virtual_time = 0.0
+        self._flow_finish: dict[Hashable, float] = {}
+        self._running = 0
+        self._queued_cost = 0.0
+        # Moving average of processing seconds per unit of job cost, used to estimate wait time
+        self._cost_rate = initial_cost_rate
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def expected_wait(self, cost: float = 0.0) -> float:
+        if self._running < self.concurrency and not self._queue:
+            return 0.0
+        return (self._queued_cost + cost) * self._cost_rate / self.concurrency
+
+    def check_admission(self, cost: float) -> None:
+        if len(self._queue) >= self.max_queue_depth:
+            raise SchedulerOverloaded("queue_depth", len(self._queue), self.expected_wait(cost))
+        if self.max_expected_wait is not None:
+            expected_wait = self.expected_wait(cost)
+            if expected_wait > self.max_expected_wait:
+                raise SchedulerOverloaded("expected_wait", len(self._queue), expected_wait)
+
+    async def submit(
+        self,
+        job_fn: Callable[[], Awaitable[Any]],
+        flow: Hashable = None,
+        cost: float = 1.0,
+        priority: Priority = Priority.NORMAL,
+    ) -> Any:
+        cost = max(cost, 1.0)
+        self.check_admission(cost)
+
+        start_tag = max(self._virtual_time, self._flow_finish.get(flow, 0.0))
+        finish_tag = start_tag + cost / int(priority)
+        self._flow_finish[flow] = finish_tag
+
+        job = _Job(
+            finish_tag=finish_tag,
+            seq=next(self._seq),
+            flow=flow,
+            cost=cost,
+            start_tag=start_tag,
+            job_fn=job_fn,
+            future=asyncio.get_running_loop().create_future(),
+            context=contextvars.copy_context(),
+        )
+        heapq.heappush(self._queue, job)
+        self._queued_cost += cost
+        logger.debug("Job queued", flow=flow, cost=cost, priority=priority.name, queue_depth=len(self._queue))
+        self._dispatch()
+        return await job.future
+
+    def _dispatch(self) -> None:
+        while self._running < self.concurrency and self._queue:
+            job = heapq.heappop(self._queue)
+            self._queued_cost -= job.cost
+            if job.future.done():
+                # Submitter gave up waiting (cancelled), skip job
+                continue
+            self._virtual_time = max(self._virtual_time, job.start_tag)
+            self._running += 1
+            # Jobs are dispatched from "finally" of previous ones, so context of dispatcher is not the right one
+            task = asyncio.create_task(self._run(job), context=job.context)
+            # Propagate cancellation of waiting submitter to running job
+            job.future.add_done_callback(lambda f, t=task: t.cancel() if f.cancelled() else None)
+
+        if not self._queue:
+            # Nothing is waiting, so all flows are on equal terms again
+            self._flow_finish.clear()
+            self._queued_cost = 0.0
+
+    async def _run(self, job: _Job) -> None:
+        start_time = time()
+        try:
+            result = await job.job_fn()
+        except asyncio.CancelledError:
+            if not job.future.done():
+                job.future.cancel()
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+            self._cost_rate = 0.8 * self._cost_rate + 0.2 * ((time() - start_time) / job.cost)
+        finally:
+            self._running -= 1
+            self._dispatch()
@@ -1,3 +1,5 @@
-from .dsl_dict import DslFileDict
+from .compiled import compile_dictionary, load_dictionary
+from .dsl_dict import DslError, DslFileDict, ExpansionBudget
 from .interface import IDictionaryLoader, IDictionaryModifier
 from .morph_modifier import PyMorphyRuDictModifier
+from .store import DictionaryStore
@@ -0,0 +1,46 @@
+import argparse
+import sys
+from pathlib import Path
+
+from blya_bot.logging_conf import configure_logging
+
+from .compiled import compile_dictionary, default_artifact_path
+from .dsl_dict import ExpansionBudget
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m blya_bot.dictionary", description="blya_bot dictionary tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compile_ = subparsers.add_parser("compile", help="Build dictionary from DSL file, and write compiled artifact")
+    compile_.add_argument("dsl_file", type=Path, help="Dictionary DSL file")
+    compile_.add_argument("-o", "--output", type=Path, help="Artifact path, next to DSL file by default")
+    compile_.add_argument("--force", action="store_true", help="Rebuild, even if artifact is up-to-date")
+    compile_.add_argument(
+        "--max-line-expansions",
+        type=int,
+        default=ExpansionBudget().max_line_expansions,
+        help="Fail, if a line expands to more combinations of groups",
+    )
+    compile_.add_argument(
+        "--max-expansions",
+        type=int,
+        default=ExpansionBudget().max_expansions,
+        help="Fail, if file expands to more combinations of groups",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    configure_logging(log_level="info", console_colors=sys.stderr.isatty())
+
+    if args.command == "compile":
+        budget = ExpansionBudget(max_line_expansions=args.max_line_expansions, max_expansions=args.max_expansions)
+        compile_dictionary(
+            args.dsl_file, args.output or default_artifact_path(args.dsl_file), force=args.force, budget=budget
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from dataclasses import asdict, dataclass
+from importlib import metadata
+from pathlib import Path
+from time import time
+
+import numpy as np
+import structlog
+
+from .dsl_dict import DslFileDict, ExpansionBudget
+from .entry import DictEntry
+from .store import DictionaryStore
+
+logger = structlog.getLogger(__name__)
+
+# Equal chars ("е" and "ё", "и" and "й") are folded by word counter normalization, not by variants expansion
+DEFAULT_EQUAL_CHARS: list[tuple[str, str]] = []
+ARTIFACT_SUFFIX = ".compiled"
+
+MAGIC = b"BLYADICT"
+FORMAT_VERSION = 2
+# Magic, format version, header length
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 8
+
+
+def morph_dictionary_version() -> str | None:
+    # Package metadata only: morphological analyzer itself is not imported, if dictionary is already compiled
+    try:
+        return metadata.version("pymorphy3-dicts-ru")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def source_digest(dsl_path: Path, equal_chars: list[tuple[str, str]]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(dsl_path.read_bytes())
+    digest.update(json.dumps(equal_chars, ensure_ascii=False).encode())
+    return digest.hexdigest()
+
+
+def default_artifact_path(dsl_path: Path) -> Path:
+    return dsl_path.with_name(dsl_path.name + ARTIFACT_SUFFIX)
+
+
+def build_dictionary(
+    dsl_path: Path, equal_chars: list[tuple[str, str]], budget: ExpansionBudget | None = None
+) -> list[DictEntry]:
+    # Imported here: morphological analyzer is needed only to build dictionary
+    from .morph_modifier import PyMorphyRuDictModifier
+
+    loader = DslFileDict(equal_chars=equal_chars, budget=budget)
+    logger.info("Loading dictionary file...", path=str(dsl_path))
+    dictionary = loader.load(dsl_path)
+    logger.info("Dict loaded", total_loaded=len(dictionary))
+
+    logger.info("Morphing word forms...")
+    dictionary = PyMorphyRuDictModifier().modify_dict(dictionary)
+    logger.info("Dict morphed", total_morphed=len(dictionary))
+    return dictionary
+
+
+@dataclass(slots=True)
+class ArtifactHeader:
+    source_digest: str
+    morph_version: str | None
+    entries: int
+    patterns: int
+    words: int
+    words_size: int
+    created_at: float
+
+    def to_json(self) -> bytes:
+        data = {"format": FORMAT_VERSION, **asdict(self)}
+        return json.dumps(data).encode()
+
+    @classmethod
+    def from_json(cls, raw: bytes) -> ArtifactHeader:
+        data = json.loads(raw)
+        data.pop("format")
+        return cls(**data)
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % _ALIGN)
+
+
+def write_artifact(path: Path, store: DictionaryStore, source_digest: str, morph_version: str | None) -> ArtifactHeader:
+    """
+    Writes dictionary store arrays as is, so they can be mapped back from file without copying.
+
+    Layout, after preamble and JSON header, every array is 8-bytes aligned:
+    word offsets (uint32, words + 1), UTF-8 words, word ids (uint32), flags (uint8), parents (int32),
+    patterns (uint32).
+    """
+    header = ArtifactHeader(
+        source_digest=source_digest,
+        morph_version=morph_version,
+        entries=store.entries,
+        patterns=len(store),
+        words=len(store.offsets) - 1,
+        words_size=len(store.words),
+        created_at=time(),
+    )
+    raw_header = header.to_json()
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(raw_header)))
+        f.write(raw_header + _padding(_PREAMBLE.size + len(raw_header)))
+        for array in (store.offsets, store.words, store.word_ids, store.flags, store.parents, store.patterns):
+            chunk = array.tobytes()
+            f.write(chunk + _padding(len(chunk)))
+    os.replace(tmp_path, path)
+    return header
+
+
+def read_header(path: Path) -> ArtifactHeader | None:
+    try:
+        with open(path, "rb") as f:
+            magic, version, header_size = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                return None
+            return ArtifactHeader.from_json(f.read(header_size))
+    except (OSError, struct.error, ValueError, TypeError, KeyError):
+        return None
+
+
+def read_artifact(path: Path) -> DictionaryStore:
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_size = _PREAMBLE.unpack_from(buf)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Not a compiled dictionary, or unsupported format version: {str(path)!r}")
+    header = ArtifactHeader.from_json(buf[_PREAMBLE.size : _PREAMBLE.size + header_size])
+
+    offset = _PREAMBLE.size + header_size
+    offset += -offset % _ALIGN
+
+    def array(dtype: type, count: int) -> np.ndarray:
+        # Read-only view of mapped file: pages are loaded on access, and shared between processes
+        nonlocal offset
+        result = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+        offset += result.nbytes + (-result.nbytes % _ALIGN)
+        return result
+
+    return DictionaryStore(
+        offsets=array(np.uint32, header.words + 1),
+        words=array(np.uint8, header.words_size),
+        word_ids=array(np.uint32, header.entries),
+        flags=array(np.uint8, header.entries),
+        parents=array(np.int32, header.entries),
+        patterns=array(np.uint32, header.patterns),
+    )
+
+
+def is_artifact_fresh(header: ArtifactHeader | None, digest: str, morph_version: str | None) -> bool:
+    if header is None or header.source_digest != digest:
+        return False
+    # Without morphological dictionary installed, artifact can't be rebuilt anyway, so it's trusted as is
+    return morph_version is None or header.morph_version == morph_version
+
+
+def compile_dictionary(
+    dsl_path: Path,
+    artifact_path: Path | None = None,
+    equal_chars: list[tuple[str, str]] | None = None,
+    force: bool = False,
+    budget: ExpansionBudget | None = None,
+) -> tuple[DictionaryStore, Path]:
+    """Builds dictionary from DSL file, and writes compiled artifact, unless up-to-date one exists"""
+    equal_chars = DEFAULT_EQUAL_CHARS if equal_chars is None else equal_chars
+    artifact_path = artifact_path or default_artifact_path(dsl_path)
+    digest = source_digest(dsl_path, equal_chars)
+    morph_version = morph_dictionary_version()
+    if not force and is_artifact_fresh(read_header(artifact_path), digest, morph_version):
+        logger.info("Compiled dictionary is up-to-date", path=str(artifact_path))
+        return read_artifact(artifact_path), artifact_path
+
+    start_time = time()
+    store = DictionaryStore.from_entries(build_dictionary(dsl_path, equal_chars, budget))
+    header = write_artifact(artifact_path, store, digest, morph_version)
+    logger.info(
+        "Dictionary compiled",
+        path=str(artifact_path),
+        entries=header.entries,
+        patterns=header.patterns,
+        size=artifact_path.stat().st_size,
+        elapsed_time=f"{time()-start_time:.4f}sec.",
+    )
+    return store, artifact_path
+
+
+def load_dictionary(
+    dsl_path: Path,
+    artifact_path: Path | None = None,
+    equal_chars: list[tuple[str, str]] | None = None,
+    budget: ExpansionBudget | None = None,
+) -> DictionaryStore:
+    """
+    Loads compiled dictionary, if it's up-to-date with DSL file, options and morphological dictionary.
+
+    Otherwise dictionary is built from DSL file, and compiled artifact is written for the next start.
+    """
+    equal_chars = DEFAULT_EQUAL_CHARS if equal_chars is None else equal_chars
+    artifact_path = artifact_path or default_artifact_path(dsl_path)
+    header = read_header(artifact_path)
+    if is_artifact_fresh(header, source_digest(dsl_path, equal_chars), morph_dictionary_version()):
+        start_time = time()
+        dictionary = read_artifact(artifact_path)
+        logger.info(
+            "Compiled dictionary loaded",
+            path=str(artifact_path),
+            total_loaded=len(dictionary),
+            elapsed_time=f"{time()-start_time:.4f}sec.",
+        )
+        return dictionary
+
+    if header is not None:
+        logger.info("Compiled dictionary is outdated, rebuilding", path=str(artifact_path))
+    try:
+        dictionary, _ = compile_dictionary(dsl_path, artifact_path, equal_chars, force=True, budget=budget)
+    except OSError as e:
+        # E.g. read-only directory: dictionary is built on every start then
+        logger.warning("Can't write compiled dictionary", path=str(artifact_path), error=str(e))
+        dictionary = DictionaryStore.from_entries(build_dictionary(dsl_path, equal_chars, budget))
+    return dictionary
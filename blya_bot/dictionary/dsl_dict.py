@@ -1,7 +1,9 @@
+import math
 from dataclasses import dataclass
 from enum import Enum, auto
+from itertools import product
 from pathlib import Path
-from typing import Generator, List, Optional
+from typing import Generator, Iterator, List, Optional
 
 from .entry import DictEntry, DictEntryFlags
 from .interface import IDictionaryLoader
@@ -27,22 +29,77 @@ class GroupNode(Node):
     options: List[List[Node]]  # Each option is a list of Nodes
 
 
+@dataclass(slots=True)
+class ExpansionBudget:
+    # Combinations of groups (duplicates included), a single line or the whole file may be expanded to. Limits are far
+    #   above any real dictionary, they stop a line with a few nested groups from eating all memory and time.
+    max_line_expansions: int = 10_000
+    max_expansions: int = 1_000_000
+
+
+class DslError(ValueError):
+    def __init__(self, message: str, line_number: int, line: str) -> None:
+        # All arguments are passed to base class, so error is pickled (raised in dictionary loading process)
+        super().__init__(message, line_number, line)
+        self.message = message
+        self.line_number = line_number
+        self.line = line
+
+    def __str__(self) -> str:
+        return f"Line {self.line_number}: {self.message}: {self.line!r}"
+
+
+class Combinations:
+    """Combinations of nodes variants, generated lazily. Amount of them is known before generation."""
+
+    __slots__ = ("variants", "size")
+
+    def __init__(self, variants: list[list[str]]) -> None:
+        self.variants = variants
+        self.size = math.prod(map(len, variants))
+
+    def __iter__(self) -> Iterator[str]:
+        return map("".join, product(*self.variants))
+
+
 class DslFileDict(IDictionaryLoader):
-    def __init__(self, group_separator="|", equal_chars: list[tuple[str, str]] | None = None):
+    def __init__(
+        self,
+        group_separator="|",
+        equal_chars: list[tuple[str, str]] | None = None,
+        budget: ExpansionBudget | None = None,
+    ):
         self.group_separator = group_separator
         self.equal_chars = equal_chars or []
+        self.budget = budget or ExpansionBudget()
 
     def load(self, file_path: Path) -> List[DictEntry]:
-        entries: List[DictEntry] = []
+        return list(self.iter_entries(file_path))
+
+    def iter_entries(self, file_path: Path) -> Iterator[DictEntry]:
+        """Dictionary entries, line by line. Expansion budget is checked before words of a line are generated."""
+        total = 0
         with file_path.open("r", encoding="utf-8") as file:
-            for line in file:
+            for line_number, line in enumerate(file, 1):
                 line = line.strip()
                 if not line or line.startswith("#"):
                     continue  # Skip comments and empty lines
-                entries.extend(set(self.parse_line(line)))
-        return entries
-
-    def parse_line(self, line: str) -> Generator[DictEntry, None, None]:
+                try:
+                    combinations, entries = self.parse_line(line, limit=self.budget.max_line_expansions)
+                except ValueError as e:
+                    raise DslError(str(e), line_number, line) from e
+                total += combinations
+                if total > self.budget.max_expansions:
+                    raise DslError(
+                        f"dictionary expands to more than {self.budget.max_expansions} combinations", line_number, line
+                    )
+                yield from entries
+
+    def parse_line(self, line: str, limit: int | None = None) -> tuple[int, Iterator[DictEntry]]:
+        """
+        Amount of combinations of a line (duplicates included, checked against "limit"),
+        and unique words of the line, expanded lazily.
+        """
         original_line = line  # Keep the original line for reference
         flags = DictEntryFlags()
 
@@ -59,30 +116,42 @@ class DslFileDict(IDictionaryLoader):
             flags.morphing = False
             line = line.replace("^", "")
 
-        # Expand the line into words
-        def expand_line(line: str):
-            for word in self.expand(line):
+        combinations = self.generate(self.parse(line), limit=limit)
+        return combinations.size, self._line_entries(original_line, flags, combinations)
+
+    def _line_entries(
+        self, original_line: str, flags: DictEntryFlags, combinations: Combinations
+    ) -> Generator[DictEntry, None, None]:
+        parent = DictEntry(word=original_line, flags=flags)
+        seen = set()
+        for expansion in combinations:
+            # Equal chars are substituted in expanded words, line is not parsed and expanded again for every char
+            for word in self.equal_chars_variants(expansion):
+                if word in seen:
+                    continue
+                seen.add(word)
                 if word == original_line:
                     yield DictEntry(word=word, flags=flags, parent=None)
                 else:
-                    yield DictEntry(word=word, flags=flags, parent=DictEntry(word=original_line, flags=flags))
-
-        yield from expand_line(line)
+                    yield DictEntry(word=word, flags=flags, parent=parent)
 
+    def equal_chars_variants(self, word: str) -> Iterator[str]:
+        yield word
         for chars in self.equal_chars:
             for char in chars:
-                if char in line:
-                    to_add = set(chars)
-                    to_add.discard(char)
-                    for other_char in to_add:
-                        yield from expand_line(line.replace(char, other_char))
+                if char in word:
+                    for other_char in set(chars) - {char}:
+                        yield word.replace(char, other_char)
 
-    def expand(self, s: str) -> List[str]:
+    def expand(self, s: str) -> Iterator[str]:
         # Parse the input string into a nested structure of Nodes
         nodes = self.parse(s)
-        # Generate all combinations from the parsed structure
-        expansions = self.generate(nodes)
-        return expansions
+        # Generate unique combinations from the parsed structure, one by one
+        seen = set()
+        for word in self.generate(nodes):
+            if word not in seen:
+                seen.add(word)
+                yield word
 
     def parse(self, s: str) -> List[Node]:
         index = 0
@@ -142,30 +211,35 @@ class DslFileDict(IDictionaryLoader):
             raise ValueError(f"Unexpected character '{s[index]}' at position {index}")
         return nodes
 
-    def generate(self, nodes: List[Node]) -> List[str]:
-        from itertools import product
-
-        if not nodes:
-            return [""]
-
-        def expand_nodes(node_list: List[Node]) -> List[str]:
-            results = [""]
-            for node in node_list:
-                if isinstance(node, LiteralNode):
-                    results = [prefix + node.value for prefix in results]
-                elif isinstance(node, GroupNode):
-                    group_options = []
-                    for option in node.options:
-                        option_expansions = expand_nodes(option)
-                        group_options.append(option_expansions)
-                    if node.group_type == GroupType.OPTIONAL:
-                        # Include absence of the group content
-                        group_options.append([""])
-                    # Efficiently compute combinations using itertools.product
-                    combinations = ["".join(p) for p in product(results, sum(group_options, []))]
-                    results = combinations
-                else:
-                    raise ValueError("Unknown node type encountered during generation")
-            return results
+    def generate(self, nodes: List[Node], limit: int | None = None) -> Combinations:
+        """
+        All combinations of parsed nodes, generated lazily: product of groups is never materialized,
+        only variants of every group are. May contain duplicates, e.g. for "[a|a]b" or "[a][a]".
+
+        Amount of combinations of nodes, and of every group options, is checked against "limit"
+        before they are generated, duplicates are counted too.
+        """
+
+        def node_variants(node: Node) -> list[str]:
+            if isinstance(node, LiteralNode):
+                return [node.value]
+            elif isinstance(node, GroupNode):
+                variants = {}
+                for option in node.options:
+                    variants.update(dict.fromkeys(expand_nodes(option)))
+                    if limit is not None and len(variants) > limit:
+                        raise ValueError(f"Group expands to more than {limit} variants")
+                if node.group_type == GroupType.OPTIONAL:
+                    # Include absence of the group content
+                    variants[""] = None
+                return list(variants)
+            else:
+                raise ValueError("Unknown node type encountered during generation")
+
+        def expand_nodes(node_list: List[Node]) -> Combinations:
+            combinations = Combinations([node_variants(node) for node in node_list])
+            if limit is not None and combinations.size > limit:
+                raise ValueError(f"Expands to more than {limit} combinations")
+            return combinations
 
         return expand_nodes(nodes)
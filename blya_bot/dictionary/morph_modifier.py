@@ -1,47 +1,161 @@
+import multiprocessing
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from time import time
 
 import structlog
 
+from blya_bot.utils import available_cpus
+
 from .entry import DictEntry
 from .interface import IDictionaryModifier
 
 logger = structlog.getLogger(__name__)
 
+# Morphing is spread over processes only for large dictionaries: every worker loads its own analyzer
+MIN_WORDS_PER_WORKER = 2000
+CHUNK_SIZE = 500
+MIN_FORM_LENGTH = 3
+
+
+def make_morph_analyzer():
+    try:
+        import pymorphy3
+        import pymorphy3_dicts_ru
+
+        # Dictionary words may be written with "е" and "и" in place of "ё" and "й" (they are equal for
+        #   word counter), analyzer checks both spellings
+        return pymorphy3.MorphAnalyzer(path=pymorphy3_dicts_ru.get_path(), char_substitutes={"е": "ё", "и": "й"})
+
+    except ImportError:
+        warnings.warn("Morphological extension is not available, install 'pymorphy3' and 'pymorphy3-dicts-ru'")
+        raise
+
+
+class WordFormsGenerator:
+    """Word forms of all lexemes of a word. Lexeme is generated once for every normal form, tag and paradigm."""
+
+    def __init__(self, morph) -> None:
+        self.morph = morph
+        self.lexemes: dict[tuple, tuple[str, ...]] = {}
+        self.lexeme_hits = 0
+
+    def word_forms(self, word: str) -> tuple[str, ...]:
+        forms = {word: None}
+        for variant in self.morph.parse(word):
+            normalized = variant.normalized
+            # Normal form and its tag, paradigm included: words, guessed by different analyzers, may share them
+            key = (normalized.word, normalized.tag, normalized.methods_stack)
+            if (lexeme := self.lexemes.get(key)) is None:
+                lexeme = tuple(inflect.word for inflect in variant.lexeme if len(inflect.word) >= MIN_FORM_LENGTH)
+                self.lexemes[key] = lexeme
+            else:
+                self.lexeme_hits += 1
+            forms.update(dict.fromkeys(lexeme))
+        return tuple(forms)
+
+    def chunk_forms(self, words: list[str]) -> tuple[list[tuple[str, ...]], int, int]:
+        """Word forms of every word, amount of generated lexemes and cache hits"""
+        lexemes, hits = len(self.lexemes), self.lexeme_hits
+        forms = [self.word_forms(word) for word in words]
+        return forms, len(self.lexemes) - lexemes, self.lexeme_hits - hits
+
+
+_worker_generator: WordFormsGenerator | None = None
+
+
+def _init_worker() -> None:
+    global _worker_generator
+    _worker_generator = WordFormsGenerator(make_morph_analyzer())
+
+
+def _chunk_forms(words: list[str]) -> tuple[list[tuple[str, ...]], int, int]:
+    if _worker_generator is None:
+        raise RuntimeError("Word forms generator is not available in worker process")
+    return _worker_generator.chunk_forms(words)
+
 
 class PyMorphyRuDictModifier(IDictionaryModifier):
-    def __init__(self, morph=None) -> None:
-        if morph:
-            self.morph = morph
-        else:
-            try:
-                import pymorphy3
-                import pymorphy3_dicts_ru
+    def __init__(self, morph=None, workers: int | None = None) -> None:
+        """
+        "workers" - processes to spread morphing over, by default - one per CPU, if dictionary is large enough.
+        "0" - morph in current process. Custom analyzer ("morph") is used only in current process.
+        """
+        # Analyzer is loaded only if words are morphed in current process, workers load their own ones
+        self.morph = morph
+        self.custom_morph = morph is not None
+        self.workers = workers
 
-                self.morph = pymorphy3.MorphAnalyzer(path=pymorphy3_dicts_ru.get_path())
+    def _workers_for(self, words: int) -> int:
+        if self.custom_morph:
+            return 0
+        if self.workers is not None:
+            return self.workers
+        workers = min(available_cpus(), words // MIN_WORDS_PER_WORKER)
+        return workers if workers > 1 else 0
 
-            except ImportError:
-                warnings.warn("Morphological extension is not available, install 'pymorphy3' and 'pymorphy3-dicts-ru'")
-                raise
+    def _word_forms(self, words: list[str]) -> dict[str, tuple[str, ...]]:
+        start_time = time()
+        workers = self._workers_for(len(words))
+        # Neighbour words are likely to share lexemes, so they are kept in the same chunk (and the same cache)
+        words = sorted(words)
+        chunks = [words[idx : idx + CHUNK_SIZE] for idx in range(0, len(words), CHUNK_SIZE)]
+        forms: dict[str, tuple[str, ...]] = {}
+        lexemes = hits = 0
+
+        def collect(chunk: list[str], result: tuple[list[tuple[str, ...]], int, int]) -> None:
+            nonlocal lexemes, hits
+            forms.update(zip(chunk, result[0]))
+            lexemes += result[1]
+            hits += result[2]
+            logger.info(
+                "Morphing progress",
+                done=len(forms),
+                total=len(words),
+                elapsed_time=f"{time()-start_time:.4f}sec.",
+            )
+
+        if workers > 0:
+            logger.info("Morphing words in worker processes", words=len(words), workers=workers)
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+            ) as executor:
+                for chunk, result in zip(chunks, executor.map(_chunk_forms, chunks)):
+                    collect(chunk, result)
+        else:
+            if self.morph is None:
+                self.morph = make_morph_analyzer()
+            generator = WordFormsGenerator(self.morph)
+            for chunk in chunks:
+                collect(chunk, generator.chunk_forms(chunk))
+
+        logger.info(
+            "Word forms generated",
+            words=len(words),
+            lexemes=lexemes,
+            lexeme_cache_hits=hits,
+            workers=workers,
+            elapsed_time=f"{time()-start_time:.4f}sec.",
+        )
+        return forms
 
     def modify_dict(self, dictionary: list[DictEntry]) -> list[DictEntry]:
+        # Every word is analyzed once, even if it's expanded from several dictionary lines
+        words = list(dict.fromkeys(entry.word for entry in dictionary if entry.flags.morphing))
+        forms = self._word_forms(words)
+
         ext_dictionary = []
-        for entry in dictionary:
+        # Forms of distinct entries are distinct (their parents differ), so only source entries are deduplicated
+        for entry in dict.fromkeys(dictionary):
             if not entry.flags.morphing:
                 ext_dictionary.append(entry)
                 continue
 
-            words_dedup = set()
-            words_dedup.add(entry.word)
-            for variant in self.morph.parse(entry.word):
-                for inflect in variant.lexeme:
-                    if len(inflect.word) > 2:
-                        words_dedup.add(inflect.word)
-
-            for word in words_dedup:
+            for word in forms[entry.word]:
                 if word == entry.word:
                     ext_dictionary.append(entry)
                     continue
 
                 ext_dictionary.append(DictEntry(word=word, flags=entry.flags, parent=entry))
 
-        return list(set(ext_dictionary))
+        return ext_dictionary
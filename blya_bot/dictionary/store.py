@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .entry import DictEntry, DictEntryFlags
+
+FLAG_MORPHING = 1
+FLAG_EXCLUDE = 2
+FLAG_EXACT_MATCH = 4
+
+
+def pack_flags(flags: DictEntryFlags) -> int:
+    return (
+        (FLAG_MORPHING if flags.morphing else 0)
+        | (FLAG_EXCLUDE if flags.exclude else 0)
+        | (FLAG_EXACT_MATCH if flags.exact_match else 0)
+    )
+
+
+def unpack_flags(value: int) -> DictEntryFlags:
+    return DictEntryFlags(
+        morphing=bool(value & FLAG_MORPHING),
+        exclude=bool(value & FLAG_EXCLUDE),
+        exact_match=bool(value & FLAG_EXACT_MATCH),
+    )
+
+
+class Provenance:
+    """Source chain of dictionary word ("root -> variant -> form"), string is built only when it's rendered"""
+
+    __slots__ = ("store", "entry")
+
+    def __init__(self, store: DictionaryStore, entry: int) -> None:
+        self.store = store
+        self.entry = entry
+
+    def __str__(self) -> str:
+        chain = []
+        entry = self.entry
+        while entry >= 0:
+            chain.append(self.store.entry_word(entry))
+            entry = int(self.store.parents[entry])
+        return " -> ".join(reversed(chain))
+
+    def __repr__(self) -> str:
+        return repr(str(self))
+
+
+@dataclass(slots=True)
+class DictionaryStore:
+    """
+    Dictionary in columnar form: table of all entries (dictionary words and their parents), referenced by index.
+
+    Every distinct word is stored once, as UTF-8 in a single buffer. Entry is a word id, packed flags
+    and parent index (-1 for root), parents always precede children. Dictionary words ("patterns") are
+    indices of table entries. Arrays may be views of compiled dictionary file, nothing is copied on load.
+    """
+
+    # Word offsets in "words" buffer (uint32, words + 1)
+    offsets: np.ndarray
+    # UTF-8 words (uint8)
+    words: np.ndarray
+    # Word id of every entry (uint32)
+    word_ids: np.ndarray
+    # Packed flags of every entry (uint8)
+    flags: np.ndarray
+    # Parent of every entry (int32, -1 for root)
+    parents: np.ndarray
+    # Entries of dictionary words (uint32)
+    patterns: np.ndarray
+
+    @classmethod
+    def from_entries(cls, dictionary: list[DictEntry]) -> DictionaryStore:
+        words: dict[str, int] = {}
+        index: dict[DictEntry, int] = {}
+        word_ids: list[int] = []
+        flags: list[int] = []
+        parents: list[int] = []
+
+        def add(entry: DictEntry) -> int:
+            if (idx := index.get(entry)) is not None:
+                return idx
+            parent = add(entry.parent) if entry.parent is not None else -1
+            index[entry] = len(word_ids)
+            word_ids.append(words.setdefault(entry.word, len(words)))
+            flags.append(pack_flags(entry.flags))
+            parents.append(parent)
+            return index[entry]
+
+        patterns = [add(entry) for entry in dictionary]
+        encoded = [word.encode() for word in words]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        np.cumsum([len(word) for word in encoded], out=offsets[1:])
+        return cls(
+            offsets=offsets,
+            words=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            word_ids=np.array(word_ids, dtype=np.uint32),
+            flags=np.array(flags, dtype=np.uint8),
+            parents=np.array(parents, dtype=np.int32),
+            patterns=np.array(patterns, dtype=np.uint32),
+        )
+
+    @classmethod
+    def coerce(cls, dictionary: DictionaryStore | list[DictEntry]) -> DictionaryStore:
+        return dictionary if isinstance(dictionary, DictionaryStore) else cls.from_entries(dictionary)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    @property
+    def entries(self) -> int:
+        return len(self.flags)
+
+    def entry_word(self, entry: int) -> str:
+        word_id = self.word_ids[entry]
+        return self.words[self.offsets[word_id] : self.offsets[word_id + 1]].tobytes().decode()
+
+    def word(self, idx: int) -> str:
+        return self.entry_word(int(self.patterns[idx]))
+
+    def pattern_words(self) -> list[str]:
+        # All dictionary words at once: decoded with a single pass over buffer
+        buf = self.words.tobytes()
+        offsets = self.offsets.tolist()
+        words = [buf[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+        return [words[word_id] for word_id in self.word_ids[self.patterns].tolist()]
+
+    def exact_match(self) -> np.ndarray:
+        """Exact match flag of every dictionary word"""
+        return (self.flags[self.patterns] & FLAG_EXACT_MATCH) != 0
+
+    def provenance(self, idx: int) -> Provenance:
+        return Provenance(self, int(self.patterns[idx]))
+
+    def to_entries(self) -> list[DictEntry]:
+        # Entries with the same flags share flags object, as they do after parsing
+        words = self.words.tobytes()
+        offsets = self.offsets.tolist()
+        flags_cache = {value: unpack_flags(value) for value in set(self.flags.tolist())}
+        table: list[DictEntry] = []
+        for word_id, flags, parent in zip(self.word_ids.tolist(), self.flags.tolist(), self.parents.tolist()):
+            table.append(
+                DictEntry(
+                    word=words[offsets[word_id] : offsets[word_id + 1]].decode(),
+                    flags=flags_cache[flags],
+                    parent=table[parent] if parent >= 0 else None,
+                )
+            )
+        return [table[idx] for idx in self.patterns.tolist()]
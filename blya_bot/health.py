@@ -21,7 +21,7 @@ def handler(callback: Callable):
                 is_ok = callback()
         except Exception as e:
             logger.error(e)
-            return web.json_response({"ok": False, "message": e}, status=422)
+            return web.json_response({"ok": False, "message": str(e)}, status=422)
 
         if is_ok:
             return web.json_response({"ok": True}, status=200)
@@ -50,9 +50,20 @@ def health_check_server(probe_fn, host: str, port: int, path: str, loop=None):
 
 
 @asynccontextmanager
-async def async_health_check_server(probe_fn, host: str, port: int, path: str, loop=None):
+async def async_health_check_server(
+    probe_fn,
+    host: str,
+    port: int,
+    path: str,
+    loop=None,
+    ready_probe_fn=None,
+    ready_path: str = "/health/ready",
+):
     app = web.Application()
     add_health_check_probe(app, probe_fn, path=path)
+    if ready_probe_fn is not None:
+        # Readiness is reported separately: service may be alive, but not ready to process requests yet
+        add_health_check_probe(app, ready_probe_fn, path=ready_path)
     runner = BackgroundAppRunner(app, loop=loop)
     logger.info("Starting health check server...")
     await runner.async_start_http_server(host=host, port=port)
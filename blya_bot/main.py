@@ -8,46 +8,67 @@ import structlog
 
 # from aiogram.utils import executor
 from . import settings
-from .core import BotCore
-from .dictionary import DslFileDict, IDictionaryLoader, PyMorphyRuDictModifier
+from .bench.autotune import autotune_engine_options
+from .core import BotCore, ChatLanguageProfiles, DictionaryReloader, InferenceScheduler
+from .dictionary import ExpansionBudget, load_dictionary
 from .health import async_health_check_server
 from .logging_conf import configure_logging
-from .recognition import BaseSpeechRecognizer, get_recognizer_by_name
+from .recognition import SAMPLE_RATE, BaseSpeechRecognizer, RoutingSpeechRecognizer, load_recognizer
 from .telegram import build_bot
 from .transcription_cache import (
     BaseTranscriptionCache,
+    FingerprintTranscriptionCache,
     InMemoryTranscriptionCache,
     NullTranscriptionCache,
     SqliteTranscriptionCache,
 )
-from .word_count import AhoCorasickWordCounter, BaseWordCounter
+from .utils import available_cpus
+from .word_count import BaseWordCounter, get_word_counter_by_name
 
 logger = structlog.getLogger(__name__)
 STOP_SIGNALS = (signal.SIGHUP, signal.SIGINT, signal.SIGTERM)
 
 
+def tune_engine_options(engine: str, options: dict, workers: int) -> dict:
+    if not settings.RECOGNITION_AUTOTUNE:
+        return options
+    # Every worker process recognizes one message at a time, using its share of CPUs
+    cpus = max(1, available_cpus() // workers) if workers > 0 else None
+    concurrency = 1 if workers > 0 else settings.SCHEDULER_CONCURRENCY
+    return autotune_engine_options(engine, options, cpus=cpus, concurrency=concurrency)
+
+
 def load_recognition_core() -> BaseSpeechRecognizer:
-    recognizer_cls = get_recognizer_by_name(settings.RECOGNITION_ENGINE)
-    logger.info("Loading speech recognition engine...", engine=recognizer_cls.__name__)
-    recognizer: BaseSpeechRecognizer = recognizer_cls.from_options(**settings.RECOGNITION_ENGINE_OPTIONS)
-    logger.info("Speech recognition engine loaded")
-    return recognizer
+    if settings.RECOGNITION_ENGINE != "router":
+        options = tune_engine_options(
+            settings.RECOGNITION_ENGINE, settings.RECOGNITION_ENGINE_OPTIONS, settings.RECOGNITION_WORKERS
+        )
+        return load_recognizer(settings.RECOGNITION_ENGINE, options, workers=settings.RECOGNITION_WORKERS)
 
+    engines = {}
+    for name, engine in settings.RECOGNITION_ENGINE_OPTIONS["engines"].items():
+        workers = engine.get("workers", 0)
+        options = tune_engine_options(engine["engine"], engine.get("options", {}), workers)
+        engines[name] = load_recognizer(engine["engine"], options, workers=workers)
+    router = RoutingSpeechRecognizer.from_engines(engines, **settings.RECOGNITION_ENGINE_OPTIONS)
+    logger.info("Recognition router created", engines=list(engines), routes=router.routes)
+    return router
 
-def load_word_counter() -> BaseWordCounter:
-    loader = DslFileDict(equal_chars=[("е", "ё"), ("и", "й")])
-    logger.info("Dict loader created", engine="DslFileDict")
 
-    logger.info("Loading dictionary file...", path=settings.SERVICE_BAD_WORDS_FILE)
-    dictionary = loader.load(settings.SERVICE_BAD_WORDS_FILE)
-    logger.info("Dict loaded", total_loaded=len(dictionary))
+def expansion_budget() -> ExpansionBudget:
+    return ExpansionBudget(
+        max_line_expansions=settings.SERVICE_BAD_WORDS_MAX_LINE_EXPANSIONS,
+        max_expansions=settings.SERVICE_BAD_WORDS_MAX_EXPANSIONS,
+    )
 
-    logger.info("Morphing word forms...")
-    dictionary = PyMorphyRuDictModifier().modify_dict(dictionary)
-    logger.info("Dict morphed", total_morphed=len(dictionary))
 
-    logger.info("Assembling automata...")
-    return AhoCorasickWordCounter.from_dictionary(dictionary)
+def load_word_counter() -> BaseWordCounter:
+    dictionary = load_dictionary(
+        settings.SERVICE_BAD_WORDS_FILE, settings.SERVICE_BAD_WORDS_COMPILED_FILE, budget=expansion_budget()
+    )
+    counter_cls = get_word_counter_by_name(settings.SERVICE_WORD_COUNTER)
+    logger.info("Assembling word counter...", word_counter=counter_cls.__name__)
+    return counter_cls.from_dictionary(dictionary)
 
 
 async def make_cache() -> BaseTranscriptionCache:
@@ -68,15 +89,66 @@ async def make_cache() -> BaseTranscriptionCache:
     return cache
 
 
+def load_language_profiles() -> ChatLanguageProfiles | None:
+    if not settings.RECOGNITION_LANGUAGE_PINNING:
+        return None
+    language_profiles = ChatLanguageProfiles(Path(settings.RECOGNITION_LANGUAGE_PROFILES_FILE))
+    language_profiles.load()
+    logger.info("Chat language pinning enabled", path=settings.RECOGNITION_LANGUAGE_PROFILES_FILE)
+    return language_profiles
+
+
+def make_fingerprint_cache(cache: BaseTranscriptionCache) -> FingerprintTranscriptionCache | None:
+    if not settings.CACHE_FINGERPRINT:
+        return None
+    if isinstance(cache, NullTranscriptionCache):
+        logger.warning("Cache disabled, fingerprint cache is not used")
+        return None
+    logger.info("Fingerprint cache enabled")
+    return FingerprintTranscriptionCache(cache, SAMPLE_RATE)
+
+
 async def _main(stop_event: asyncio.Event, loop):
     configure_logging(log_level=settings.SERVICE_LOG_LEVEL, console_colors=settings.SERVICE_LOG_COLORS)
     logger.info("Logging configured", log_level=settings.SERVICE_LOG_LEVEL, console_colors=settings.SERVICE_LOG_COLORS)
 
     logger.info("Creating bot core...")
+    # Recognition core must be loaded first: worker processes are forked from this process,
+    #   so it's better to have as few threads and open connections as possible here
+    recognizer = load_recognition_core()
     cache = await make_cache()
     await cache.setup()
-    bot_core = BotCore(load_recognition_core(), load_word_counter(), cache=cache)
+    scheduler = InferenceScheduler(
+        concurrency=settings.SCHEDULER_CONCURRENCY,
+        max_queue_depth=settings.SCHEDULER_MAX_QUEUE_DEPTH,
+        max_expected_wait=settings.SCHEDULER_MAX_EXPECTED_WAIT,
+    )
+    logger.info(
+        "Scheduler created",
+        concurrency=settings.SCHEDULER_CONCURRENCY,
+        max_queue_depth=settings.SCHEDULER_MAX_QUEUE_DEPTH,
+        max_expected_wait=settings.SCHEDULER_MAX_EXPECTED_WAIT,
+    )
+    bot_core = BotCore(
+        recognizer,
+        load_word_counter(),
+        cache=cache,
+        scheduler=scheduler,
+        fingerprint_cache=make_fingerprint_cache(cache),
+        language_profiles=load_language_profiles(),
+        timeout=settings.RECOGNITION_TIMEOUT,
+        timeout_per_audio_second=settings.RECOGNITION_TIMEOUT_PER_AUDIO_SECOND,
+    )
     logger.info("Bot core assembled")
+    dictionary_reloader = None
+    if settings.SERVICE_BAD_WORDS_RELOAD_INTERVAL > 0 or settings.TELEGRAM_ADMIN_IDS:
+        dictionary_reloader = DictionaryReloader(
+            bot_core,
+            settings.SERVICE_BAD_WORDS_FILE,
+            settings.SERVICE_BAD_WORDS_COMPILED_FILE,
+            poll_interval=settings.SERVICE_BAD_WORDS_RELOAD_INTERVAL,
+            budget=expansion_budget(),
+        )
 
     logger.info("Starting bot...")
     logger.info("Using bot token", token=f"{settings.TELEGRAM_BOT_TOKEN[:5]}...{settings.TELEGRAM_BOT_TOKEN[-5:]}")
@@ -87,10 +159,23 @@ async def _main(stop_event: asyncio.Event, loop):
         settings.HEALTH_CHECK_PORT,
         settings.HEALTH_CHECK_PATH,
         loop=loop,
+        ready_probe_fn=lambda: bot_core.ready,
+        ready_path=settings.HEALTH_CHECK_READY_PATH,
     ):
+        # Messages are not polled until warm-up is done, readiness probe stays red meanwhile
+        await bot_core.warm_up(recognition=settings.RECOGNITION_WARMUP)
+
         bot, dispatcher = build_bot(
-            settings.TELEGRAM_BOT_TOKEN, bot_core, transcribe_command=settings.TELEGRAM_BOT_TRANSCRIBE_COMMAND,
+            settings.TELEGRAM_BOT_TOKEN,
+            bot_core,
+            transcribe_command=settings.TELEGRAM_BOT_TRANSCRIBE_COMMAND,
+            progressive_replies=settings.TELEGRAM_PROGRESSIVE_REPLIES,
+            dictionary_reloader=dictionary_reloader,
+            reload_dictionary_command=settings.TELEGRAM_BOT_RELOAD_DICTIONARY_COMMAND,
+            admin_ids=settings.TELEGRAM_ADMIN_IDS,
         )
+        if dictionary_reloader is not None:
+            dictionary_reloader.start()
 
         # FIXME: aiogram configures logging and override our setting, so here we hacking it by setting config again.
         configure_logging(log_level=settings.SERVICE_LOG_LEVEL, console_colors=settings.SERVICE_LOG_COLORS)
@@ -98,7 +183,10 @@ async def _main(stop_event: asyncio.Event, loop):
         task = asyncio.create_task(dispatcher.start_polling(bot, handle_signals=False))
         # TODO: Better state management/failfast
         await stop_event.wait()
+        if dictionary_reloader is not None:
+            await dictionary_reloader.stop()
         await cache.teardown()
+        await recognizer.teardown()
 
         if not task.done():
             task.cancel()
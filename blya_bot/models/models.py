@@ -30,6 +30,8 @@ class TranscriptionData:
     transcription: str
     summary: TextSummary
     date_processed: datetime
+    # Recognition was stopped by deadline, only the beginning of audio is transcribed
+    partial: bool = False
 
     def as_dict(self) -> dict[str, Any]:
         return {
@@ -37,6 +39,7 @@ class TranscriptionData:
             "transcription": self.transcription,
             "summary": self.summary.as_dict(),
             "date_processed": int(self.date_processed.timestamp()),  # Store as timestamp
+            "partial": self.partial,
         }
 
     @classmethod
@@ -46,4 +49,5 @@ class TranscriptionData:
             summary=TextSummary.from_dict(data["summary"]),
             file_unique_id=data["file_unique_id"],
             date_processed=datetime.fromtimestamp(data["date_processed"]),  # Convert timestamp to datetime
+            partial=data.get("partial", False),
         )
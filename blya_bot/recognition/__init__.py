@@ -1,8 +1,17 @@
-from typing import Type
+from typing import Any, Type
 
-from .interface import BaseSpeechRecognizer, TempFile
+import structlog
 
-AVAILABLE_RECOGNIZERS = ["vosk", "faster-whisper", "pywhispercpp"]
+from .chunked import ChunkedSpeechRecognizer, SilenceSplitter
+from .decoding import SAMPLE_RATE, decode_audio, decode_audio_async
+from .interface import BaseSpeechRecognizer, RecognitionContext, recognition_context
+from .process_pool import ProcessPoolSpeechRecognizer
+from .router import Route, RoutingSpeechRecognizer
+from .vad import EnergyVad, VadSpeechRecognizer
+
+logger = structlog.getLogger(__name__)
+
+AVAILABLE_RECOGNIZERS = ["vosk", "faster-whisper", "pywhispercpp", "router"]
 
 
 def get_recognizer_by_name(name: str) -> Type[BaseSpeechRecognizer]:
@@ -23,12 +32,46 @@ def get_recognizer_by_name(name: str) -> Type[BaseSpeechRecognizer]:
 
         return PyWhisperCppSpeechRecognizer
 
+    elif name == "router":
+        return RoutingSpeechRecognizer
+
     else:
         raise Exception(f"Unknown recognizer name {name!r}, available recognizers: {', '.join(AVAILABLE_RECOGNIZERS)}")
 
 
+def load_recognizer(engine: str, options: dict[str, Any], workers: int = 0) -> BaseSpeechRecognizer:
+    recognizer_cls = get_recognizer_by_name(engine)
+    logger.info("Loading speech recognition engine...", engine=recognizer_cls.__name__)
+    recognizer: BaseSpeechRecognizer = recognizer_cls.from_options(**options)
+    logger.info("Speech recognition engine loaded")
+    if workers > 0:
+        logger.info("Starting recognition workers...", workers=workers)
+        recognizer = ProcessPoolSpeechRecognizer(recognizer, workers=workers)
+    if vad_options := options.get("vad"):
+        # Silence is trimmed in bot process, so workers receive less audio
+        logger.info("Voice activity detection enabled", vad_options=vad_options)
+        recognizer = VadSpeechRecognizer(recognizer, EnergyVad.from_options(vad_options))
+    if chunking_options := options.get("chunking"):
+        # Long audio is split at pauses, chunks are recognized by all workers in parallel
+        logger.info("Chunked recognition enabled", chunking_options=chunking_options)
+        recognizer = ChunkedSpeechRecognizer.wrap(recognizer, chunking_options, parallelism=max(workers, 1))
+    return recognizer
+
+
 __all__ = (
+    "SAMPLE_RATE",
     "BaseSpeechRecognizer",
-    "TempFile",
+    "ChunkedSpeechRecognizer",
+    "EnergyVad",
+    "ProcessPoolSpeechRecognizer",
+    "RecognitionContext",
+    "Route",
+    "RoutingSpeechRecognizer",
+    "SilenceSplitter",
+    "VadSpeechRecognizer",
+    "decode_audio",
+    "decode_audio_async",
     "get_recognizer_by_name",
+    "load_recognizer",
+    "recognition_context",
 )
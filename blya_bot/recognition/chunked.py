@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator
+
+import numpy as np
+import structlog
+
+from .decoding import SAMPLE_RATE
+from .interface import BaseSpeechRecognizer, recognition_context
+from .vad import EnergyVad
+
+logger = structlog.getLogger(__name__)
+
+
+class SilenceSplitter:
+    """Splits long audio in chunks, cutting in the middle of pauses where possible"""
+
+    def __init__(
+        self,
+        vad: EnergyVad,
+        max_chunk_duration: float = 30.0,
+        min_chunk_duration: float = 10.0,
+        sample_rate: int = SAMPLE_RATE,
+    ) -> None:
+        if min_chunk_duration > max_chunk_duration:
+            raise ValueError("Minimal chunk duration can't be bigger than maximal one")
+        self.vad = vad
+        self.max_chunk = int(max_chunk_duration * sample_rate)
+        self.min_chunk = int(min_chunk_duration * sample_rate)
+
+    def cut_points(self, audio: np.ndarray) -> list[int]:
+        if len(audio) <= self.max_chunk:
+            return []
+
+        spans = self.vad.detect(audio)
+        # Middle of every pause between speech spans is a good place to cut
+        pauses = [(end + next_start) // 2 for (_, end), (next_start, _) in zip(spans, spans[1:])]
+
+        points: list[int] = []
+        start = 0
+        while len(audio) - start > self.max_chunk:
+            candidates = [p for p in pauses if start + self.min_chunk <= p <= start + self.max_chunk]
+            # The latest pause gives the longest chunk, so the fewest cuts. Without pauses - hard cut.
+            point = candidates[-1] if candidates else start + self.max_chunk
+            points.append(point)
+            start = point
+        return points
+
+    def split(self, audio: np.ndarray) -> list[np.ndarray]:
+        return np.split(audio, self.cut_points(audio))
+
+
+class ChunkedSpeechRecognizer(BaseSpeechRecognizer):
+    """
+    Recognizes long audio in chunks, split at silence, concurrently.
+
+    Chunks are passed to wrapped recognizer in parallel (up to "parallelism" at a time),
+    so with process pool or batched inference long message is recognized by several workers at once.
+    Chunks texts are joined in original order.
+    """
+
+    def __init__(
+        self,
+        recognizer: BaseSpeechRecognizer,
+        splitter: SilenceSplitter,
+        parallelism: int = 1,
+        min_duration: float = 45.0,
+    ) -> None:
+        if parallelism < 1:
+            raise ValueError("Chunked recognition parallelism must be positive")
+        self.recognizer = recognizer
+        self.splitter = splitter
+        self.parallelism = parallelism
+        # Shorter audio is recognized as is
+        self.min_duration = min_duration
+
+    @classmethod
+    def from_options(cls, **options) -> ChunkedSpeechRecognizer:
+        from . import get_recognizer_by_name
+
+        recognizer_cls = get_recognizer_by_name(options["engine"])
+        recognizer = recognizer_cls.from_options(**options.get("options", {}))
+        return cls.wrap(recognizer, options.get("chunking", True))
+
+    @classmethod
+    def wrap(
+        cls, recognizer: BaseSpeechRecognizer, options: dict[str, Any] | bool, parallelism: int = 1
+    ) -> ChunkedSpeechRecognizer:
+        options = {} if isinstance(options, bool) else dict(options)
+        # Pauses between words are shorter than the ones VAD trims by default
+        vad = EnergyVad(min_silence_ms=options.pop("min_silence_ms", 300), padding_ms=0)
+        splitter = SilenceSplitter(
+            vad,
+            max_chunk_duration=options.pop("max_chunk_duration", 30.0),
+            min_chunk_duration=options.pop("min_chunk_duration", 10.0),
+        )
+        return cls(recognizer, splitter, parallelism=options.pop("parallelism", parallelism), **options)
+
+    def with_params(self, **params) -> ChunkedSpeechRecognizer:
+        return type(self)(self.recognizer.with_params(**params), self.splitter, self.parallelism, self.min_duration)
+
+    def split(self, audio: np.ndarray) -> list[np.ndarray]:
+        if len(audio) < self.min_duration * SAMPLE_RATE:
+            return [audio]
+        chunks = self.splitter.split(audio)
+        logger.debug(
+            "Audio split in chunks",
+            duration=f"{len(audio) / SAMPLE_RATE:.2f}sec.",
+            chunks=[f"{len(chunk) / SAMPLE_RATE:.2f}" for chunk in chunks],
+        )
+        return chunks
+
+    def _start(self, chunks: list[np.ndarray]) -> list[asyncio.Task[str]]:
+        semaphore = asyncio.Semaphore(self.parallelism)
+
+        async def recognize_chunk(chunk: np.ndarray) -> str:
+            async with semaphore:
+                context = recognition_context.get()
+                if context is not None and context.expired():
+                    # Chunks, which haven't started before deadline, are skipped
+                    context.partial = True
+                    return ""
+                return await self.recognizer.recognize(chunk)
+
+        return [asyncio.create_task(recognize_chunk(chunk)) for chunk in chunks]
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        chunks = self.split(audio)
+        if len(chunks) == 1:
+            return await self.recognizer.recognize(audio)
+
+        tasks = self._start(chunks)
+        try:
+            texts = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return " ".join(text.strip() for text in texts if text.strip())
+
+    async def recognize_iter(self, audio: np.ndarray) -> AsyncIterator[str]:
+        chunks = self.split(audio)
+        if len(chunks) == 1:
+            async for part in self.recognizer.recognize_iter(audio):
+                yield part
+            return
+
+        tasks = self._start(chunks)
+        try:
+            # Chunks are finished in any order, but yielded in original one, joined as in "recognize"
+            separator = ""
+            for task in tasks:
+                text = (await task).strip()
+                if text:
+                    yield separator + text
+                    separator = " "
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def warm_up(self, audio: np.ndarray) -> None:
+        await self.recognizer.warm_up(audio)
+
+    async def teardown(self):
+        await self.recognizer.teardown()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+from typing import BinaryIO
+
+import numpy as np
+import structlog
+
+logger = structlog.getLogger(__name__)
+
+try:
+    import av
+except ImportError:
+    logger.error("'av' audio decoding dependencies not installed")
+    raise
+
+# All recognition engines work with 16kHz mono audio
+SAMPLE_RATE = 16000
+
+
+def decode_audio(file: BinaryIO | str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode audio track of any media file into mono float32 PCM with values in [-1, 1]"""
+    chunks: list[np.ndarray] = []
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+
+    with av.open(file, mode="r", metadata_errors="ignore") as container:
+        if not container.streams.audio:
+            raise ValueError("Media file has no audio track")
+        # Demuxing only audio stream packets, video track of video notes is never decoded
+        stream = container.streams.audio[0]
+        for packet in container.demux(stream):
+            for frame in packet.decode():
+                for resampled in resampler.resample(frame):
+                    chunks.append(resampled.to_ndarray())
+        # Flushing buffered samples
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray())
+
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+
+    audio = np.concatenate(chunks, axis=1).reshape(-1)
+    return audio.astype(np.float32) / 32768.0
+
+
+async def decode_audio_async(file: BinaryIO | str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, decode_audio, file, sample_rate)
+
+
+def audio_duration(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> float:
+    return len(audio) / sample_rate
+
+
+def to_pcm16(audio: np.ndarray) -> bytes:
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
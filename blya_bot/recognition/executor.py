@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import AsyncIterator, Callable, Generic, Iterable, TypeVar
+
+import structlog
+
+logger = structlog.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Emits produced item to the event loop. Returns False, if consumer gone and production should be stopped.
+Emit = Callable[[T], bool]
+
+
+class _Bridge(Generic[T]):
+    """
+    Passes items from producer thread to event loop.
+
+    Items are buffered, and event loop is woken up only when buffer becomes non-empty,
+    so everything produced while consumer was busy is delivered at once.
+    Producer is blocked, when consumer lags behind for more than "max_buffered" items.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_buffered: int) -> None:
+        self._loop = loop
+        self._max_buffered = max_buffered
+        self._cond = threading.Condition()
+        self._buffer: list[T] = []
+        self._done = False
+        self._closed = False
+        self._error: BaseException | None = None
+        self._waiter: asyncio.Future | None = None
+
+    def put(self, item: T) -> bool:
+        with self._cond:
+            while len(self._buffer) >= self._max_buffered and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return False
+            self._buffer.append(item)
+            notify = len(self._buffer) == 1
+        if notify:
+            self._notify()
+        return True
+
+    def finish(self, error: BaseException | None = None) -> None:
+        with self._cond:
+            self._done = True
+            self._error = error
+        self._notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _notify(self) -> None:
+        with suppress(RuntimeError):  # Event loop already closed
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def batches(self) -> AsyncIterator[list[T]]:
+        while True:
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+                done, error = self._done, self._error
+                self._cond.notify_all()
+            if batch:
+                yield batch
+                continue
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+            self._waiter = self._loop.create_future()
+            with self._cond:
+                # Producer could emit something before waiter was set
+                ready = bool(self._buffer) or self._done
+            try:
+                if not ready:
+                    await self._waiter
+            finally:
+                self._waiter = None
+
+
+class InferenceExecutor:
+    """
+    Long-lived thread pool, owned by recognition engine.
+
+    Inference threads are named after engine, and may be pinned to a set of CPUs (Linux only),
+    engine's own compute threads, started from them, inherit this affinity.
+    Threads are created lazily, so executor also works in forked worker processes.
+    """
+
+    def __init__(self, name: str, workers: int = 1, cpu_affinity: Iterable[int] | None = None) -> None:
+        if workers < 1:
+            raise ValueError("Inference executor requires at least one worker")
+        self.name = name
+        self.workers = workers
+        self.cpu_affinity = set(cpu_affinity) if cpu_affinity else None
+        if self.cpu_affinity and not hasattr(os, "sched_setaffinity"):
+            logger.warning("CPU affinity is not supported on this platform", executor=name)
+            self.cpu_affinity = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._pid: int | None = None
+
+    def _init_thread(self) -> None:
+        if self.cpu_affinity:
+            os.sched_setaffinity(0, self.cpu_affinity)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Threads don't survive fork, executor of parent process is useless in the child one
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix=f"{self.name}-inference",
+                initializer=self._init_thread,
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    async def run(self, fn: Callable[..., R], *args) -> R:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def stream(self, produce: Callable[[Emit[T]], None], max_buffered: int = 64) -> AsyncIterator[T]:
+        """Runs "produce" in executor, and yields everything it emits"""
+        loop = asyncio.get_running_loop()
+        bridge: _Bridge[T] = _Bridge(loop, max_buffered)
+
+        def run() -> None:
+            try:
+                produce(bridge.put)
+            except BaseException as e:
+                bridge.finish(e)
+            else:
+                bridge.finish()
+
+        loop.run_in_executor(self.executor, run)
+        try:
+            async for batch in bridge.batches():
+                for item in batch:
+                    yield item
+        finally:
+            # Stops producer on next emitted item, if consumer exits early
+            bridge.close()
+
+    def iterate(self, make_iter: Callable[[], Iterable[T]], max_buffered: int = 64) -> AsyncIterator[T]:
+        """Creates iterator and iterates it in executor, so even iterator setup doesn't block event loop"""
+
+        def produce(emit: Emit[T]) -> None:
+            it = iter(make_iter())
+            try:
+                for item in it:
+                    if not emit(item):
+                        break
+            finally:
+                close = getattr(it, "close", None)
+                if close is not None:
+                    close()
+
+        return self.stream(produce, max_buffered=max_buffered)
+
+    def shutdown(self) -> None:
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
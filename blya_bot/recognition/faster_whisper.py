@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import asyncio
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Generator
 
+import numpy as np
 import structlog
 
-from .interface import BaseSpeechRecognizer, TempFile
-from .utils import async_wrap_iter
+from .decoding import SAMPLE_RATE
+from .executor import InferenceExecutor
+from .interface import BaseSpeechRecognizer, RecognitionContext, recognition_context
 
 logger = structlog.getLogger(__name__)
 
@@ -17,32 +20,235 @@ except (ImportError, ModuleNotFoundError):
     logger.error("'faster_whisper' recognition core dependencies not installed")
     raise
 
+try:
+    from faster_whisper import BatchedInferencePipeline
+except ImportError:
+    # Available since faster-whisper 1.1.0
+    BatchedInferencePipeline = None
+
+
+# Whisper encoder always works with 30 sec. windows
+CHUNK_DURATION = 30.0
+
+
+@dataclass(slots=True)
+class _BatchRequest:
+    audio: np.ndarray
+    future: asyncio.Future
+    language: str | None = None
+    context: RecognitionContext | None = None
+    # Position of request audio in concatenated batch audio, seconds
+    start: float = 0.0
+    end: float = 0.0
+    texts: list[str] = field(default_factory=list)
+    logprobs: list[float] = field(default_factory=list)
+
+
+def report_transcription(
+    context: RecognitionContext | None, language: str, language_probability: float, logprobs: list[float]
+) -> None:
+    if context is None:
+        return
+    context.detected_language = language
+    context.language_probability = language_probability
+    context.avg_logprob = sum(logprobs) / len(logprobs) if logprobs else None
+
+
+class WhisperMicroBatcher:
+    """
+    Gathers audio from concurrent requests during short time window, and runs it through batched inference.
+
+    Requests audio is concatenated, and split in clips no longer than 30 seconds, so every clip is
+    a separate item of encoder/decoder batch. Long messages are batched this way even without concurrent requests.
+    """
+
+    def __init__(
+        self,
+        model: "WhisperModel",
+        lang: str | None,
+        executor: InferenceExecutor,
+        beam_size: int = 5,
+        batch_size: int = 8,
+        batch_window: float = 0.01,
+    ) -> None:
+        self.pipeline = BatchedInferencePipeline(model=model)
+        self.executor = executor
+        self.lang = lang
+        self.beam_size = beam_size
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+
+        self._pending: list[_BatchRequest] = []
+        self._pending_clips = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    async def recognize(self, audio: np.ndarray, context: RecognitionContext | None = None) -> str:
+        loop = asyncio.get_running_loop()
+        language = self.lang or (context.language if context else None)
+        request = _BatchRequest(audio=audio, future=loop.create_future(), language=language, context=context)
+
+        if language is None:
+            # Language is detected once per batch, so requests with unknown language can't be mixed together
+            self._run_batch([request])
+            return await request.future
+
+        self._pending.append(request)
+        self._pending_clips += max(1, int(np.ceil(len(audio) / SAMPLE_RATE / CHUNK_DURATION)))
+        if self._pending_clips >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await request.future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending, self._pending_clips = self._pending, [], 0
+        # Batch is transcribed with a single language
+        batches: dict[str | None, list[_BatchRequest]] = {}
+        for request in pending:
+            batches.setdefault(request.language, []).append(request)
+        for batch in batches.values():
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: list[_BatchRequest]) -> None:
+        logger.debug("Running inference batch", requests=len(batch))
+        task = asyncio.ensure_future(self.executor.run(self._transcribe_batch, batch))
+        task.add_done_callback(lambda t: self._resolve(batch, t))
+
+    @staticmethod
+    def _resolve(batch: list[_BatchRequest], task: asyncio.Future) -> None:
+        for request in batch:
+            if request.future.done():
+                continue
+            if task.cancelled():
+                request.future.cancel()
+            elif (exc := task.exception()) is not None:
+                request.future.set_exception(exc)
+            else:
+                request.future.set_result("".join(request.texts))
+
+    def _transcribe_batch(self, batch: list[_BatchRequest]) -> None:
+        clips: list[dict[str, float]] = []
+        offset = 0.0
+        for request in batch:
+            duration = len(request.audio) / SAMPLE_RATE
+            request.start, request.end = offset, offset + duration
+            clip_start = 0.0
+            while clip_start < duration:
+                clip_end = min(clip_start + CHUNK_DURATION, duration)
+                clips.append({"start": offset + clip_start, "end": offset + clip_end})
+                clip_start = clip_end
+            offset += duration
+        if not clips:
+            return
+
+        audio = np.concatenate([request.audio for request in batch])
+        segments, info = self.pipeline.transcribe(
+            audio,
+            language=batch[0].language,
+            beam_size=self.beam_size,
+            clip_timestamps=clips,
+            batch_size=self.batch_size,
+        )
+        logger.debug("Batch transcription info", language=info.language, duration=info.duration, clips=len(clips))
+
+        # Segments are returned in clips order, with timestamps in concatenated audio timeline
+        idx = 0
+        for segment in segments:
+            middle = (segment.start + segment.end) / 2
+            while idx < len(batch) - 1 and middle >= batch[idx].end:
+                idx += 1
+            batch[idx].texts.append(segment.text)
+            batch[idx].logprobs.append(segment.avg_logprob)
+            # Batch is stopped only when nobody waits for the rest of it
+            if all(request.context is not None and request.context.expired() for request in batch[idx:]):
+                for request in batch[idx:]:
+                    request.context.partial = True  # type: ignore[union-attr]
+                break
+
+        for request in batch:
+            report_transcription(request.context, info.language, info.language_probability, request.logprobs)
+
 
 class FastWhisperSpeechRecognizer(BaseSpeechRecognizer):
-    def __init__(self, whisper_model: "WhisperModel", lang: str, beam_size: int = 5) -> None:
+    def __init__(
+        self,
+        whisper_model: "WhisperModel",
+        lang: str,
+        beam_size: int = 5,
+        batch_size: int = 0,
+        batch_window: float = 0.01,
+        executor: InferenceExecutor | None = None,
+    ) -> None:
         self.model = whisper_model
         self.lang = lang
         self.beam_size = beam_size
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.executor = executor or InferenceExecutor("faster-whisper")
+        self.batcher: WhisperMicroBatcher | None = None
+        if batch_size > 1:
+            if BatchedInferencePipeline is None:
+                raise RuntimeError("Batched inference requires 'faster-whisper>=1.1.0'")
+            self.batcher = WhisperMicroBatcher(
+                whisper_model,
+                lang,
+                self.executor,
+                beam_size=beam_size,
+                batch_size=batch_size,
+                batch_window=batch_window,
+            )
 
     @classmethod
     def from_options(cls, **options) -> FastWhisperSpeechRecognizer:
         logger.info("Loading whisper model", options=options)
+        num_workers = options.get("num_workers", 1)
         model = WhisperModel(
             model_size_or_path=options["model"],
             device=options.get("device", "auto"),
             compute_type=options.get("compute_type", None),
+            # "0" - ctranslate2 default, 4 threads or less
+            cpu_threads=options.get("cpu_threads", 0),
+            num_workers=num_workers,
         )
         logger.info("Whisper model loaded")
-        return cls(model, lang=options.get("language", None))
+        return cls(
+            model,
+            lang=options.get("language", None),
+            beam_size=options.get("beam_size", 5),
+            batch_size=options.get("batch_size", 0),
+            batch_window=options.get("batch_window_ms", 10) / 1000,
+            # Model runs up to "num_workers" transcriptions in parallel, one inference thread for each
+            executor=InferenceExecutor("faster-whisper", workers=num_workers, cpu_affinity=options.get("cpu_affinity")),
+        )
+
+    def with_params(self, **params) -> FastWhisperSpeechRecognizer:
+        if unknown := set(params) - {"language", "beam_size"}:
+            raise ValueError(f"Unknown faster-whisper decoding parameters: {', '.join(unknown)}")
+        return type(self)(
+            self.model,
+            lang=params.get("language", self.lang),
+            beam_size=params.get("beam_size", self.beam_size),
+            batch_size=self.batch_size,
+            batch_window=self.batch_window,
+            executor=self.executor,
+        )
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        if self.batcher is not None:
+            return await self.batcher.recognize(audio, recognition_context.get())
+        return "".join([text async for text in self.recognize_iter(audio)])
 
-    async def recognize(self, file: TempFile) -> str:
+    def _transcribe(self, audio: np.ndarray, context: RecognitionContext | None) -> Generator[str, None, None]:
+        # Runs in inference thread: "transcribe" itself runs VAD and language detection before the first segment
         segments, info = self.model.transcribe(
-            file.name,
-            language=self.lang,
+            audio,
+            language=self.lang or (context.language if context else None),
             no_speech_threshold=None,
             beam_size=self.beam_size,
         )
-        text = ""
         logger.debug(
             "Transcription info",
             transcription_options=info.transcription_options,
@@ -51,9 +257,26 @@ class FastWhisperSpeechRecognizer(BaseSpeechRecognizer):
             duration=info.duration,
             duration_after_vad=info.duration_after_vad,
         )
+        logprobs = []
+        # Segments are decoded lazily, one by one, so decoding stops right after deadline
+        for segment in segments:
+            logprobs.append(segment.avg_logprob)
+            yield segment.text
+            if context is not None and context.expired():
+                context.partial = True
+                break
+        report_transcription(context, info.language, info.language_probability, logprobs)
+
+    async def recognize_iter(self, audio: np.ndarray) -> AsyncIterator[str]:
+        if self.batcher is not None:
+            # Batched inference returns results only when whole batch is processed
+            yield await self.batcher.recognize(audio, recognition_context.get())
+            return
+
+        # Context is read here: it's not propagated to executor threads
+        context = recognition_context.get()
+        async for text in self.executor.iterate(lambda: self._transcribe(audio, context)):
+            yield text
 
-        # Convert the sync generator to an async one
-        async for seg in async_wrap_iter(segments):
-            text += seg.text
-            await asyncio.sleep(0)  # This will make the task cooperative
-        return text
+    async def teardown(self):
+        self.executor.shutdown()
@@ -1,8 +1,38 @@
 from __future__ import annotations
 
 from abc import abstractmethod
-from tempfile import _TemporaryFileWrapper as TempFile
-from typing import Protocol
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import monotonic
+from typing import TYPE_CHECKING, AsyncIterator, Protocol
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+@dataclass(slots=True)
+class RecognitionContext:
+    # Request details, used to pick recognizer for particular message
+    chat_id: int | None = None
+    duration: float = 0.0
+    queue_depth: int = 0
+    # Language hint, used by engines with language detection, if language is not configured
+    language: str | None = None
+    # "time.monotonic()" value, after which engine should stop, and return text recognized so far
+    deadline: float | None = None
+    # Reported by engine after recognition
+    detected_language: str | None = None
+    language_probability: float | None = None
+    avg_logprob: float | None = None
+    # Recognition was stopped by deadline, text is incomplete
+    partial: bool = False
+
+    def expired(self) -> bool:
+        return self.deadline is not None and monotonic() >= self.deadline
+
+
+# Context of request, which is being recognized in current task. Engines read hints from it, and report results to it.
+recognition_context: ContextVar[RecognitionContext | None] = ContextVar("recognition_context", default=None)
 
 
 class BaseSpeechRecognizer(Protocol):
@@ -12,5 +42,37 @@ class BaseSpeechRecognizer(Protocol):
         pass
 
     @abstractmethod
-    async def recognize(self, file: TempFile) -> str:
+    async def recognize(self, audio: np.ndarray) -> str:
+        # Audio is mono float32 PCM with "decoding.SAMPLE_RATE" sample rate
+        pass
+
+    async def recognize_iter(self, audio: np.ndarray) -> AsyncIterator[str]:
+        # Engines, producing text incrementally, yield text parts as soon as they are recognized.
+        #   Concatenated parts are equal to the full transcription.
+        yield await self.recognize(audio)
+
+    @property
+    def supports_streaming(self) -> bool:
+        return False
+
+    def recognize_stream(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        # Recognize audio while it's being downloaded, available only if "supports_streaming" is True.
+        #   Yields text parts, same as "recognize_iter"
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming recognition")
+
+    async def warm_up(self, audio: np.ndarray) -> None:
+        # Runs audio through recognizer once, so model weights are paged in and engine kernels are initialized
+        await self.recognize(audio)
+
+    def with_params(self, **params) -> BaseSpeechRecognizer:
+        # Recognizer sharing the same loaded model, with overridden decoding parameters (e.g. "beam_size")
+        if params:
+            raise ValueError(f"{type(self).__name__} does not support decoding parameters: {', '.join(params)}")
+        return self
+
+    def route(self, context: RecognitionContext) -> BaseSpeechRecognizer:
+        # Recognizer, which should process request with given context
+        return self
+
+    async def teardown(self):
         pass
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import dataclasses
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import structlog
+
+from .interface import BaseSpeechRecognizer, RecognitionContext, recognition_context
+
+logger = structlog.getLogger(__name__)
+
+# Recognizer with loaded model, inherited by forked workers. Set right before workers are forked.
+_worker_recognizer: BaseSpeechRecognizer | None = None
+# Worker-side recognizers with overridden decoding parameters, by parameters
+_worker_variants: dict[tuple, BaseSpeechRecognizer] = {}
+
+
+def _init_worker() -> None:
+    # Forked workers inherit event loop signal handling of the bot process, leave shutdown to the parent
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+
+
+def _worker_ping(_: int) -> int:
+    return os.getpid()
+
+
+async def _recognize_in_context(
+    recognizer: BaseSpeechRecognizer, audio: np.ndarray, context: RecognitionContext | None
+) -> str:
+    recognition_context.set(context)
+    return await recognizer.recognize(audio)
+
+
+def _worker_recognize(
+    shm_name: str, samples: int, params: dict | None = None, context: RecognitionContext | None = None
+) -> tuple[str, RecognitionContext | None]:
+    if _worker_recognizer is None:
+        raise RuntimeError("Recognizer is not available in worker process")
+    recognizer = _worker_recognizer
+    if params:
+        key = tuple(sorted(params.items()))
+        if key not in _worker_variants:
+            _worker_variants[key] = _worker_recognizer.with_params(**params)
+        recognizer = _worker_variants[key]
+
+    # Segment is owned (and unlinked) by the parent process. Worker shares resource tracker of the parent,
+    #   so registration on attach is a no-op, and it must not be unregistered here.
+    shm = SharedMemory(name=shm_name)
+    try:
+        # Zero-copy view of PCM samples, written by the parent process
+        audio = np.ndarray((samples,), dtype=np.float32, buffer=shm.buf)
+        try:
+            # Context is passed back, with results reported by engine
+            return asyncio.run(_recognize_in_context(recognizer, audio, context)), context
+        finally:
+            del audio
+    finally:
+        shm.close()
+
+
+class ProcessPoolSpeechRecognizer(BaseSpeechRecognizer):
+    def __init__(self, recognizer: BaseSpeechRecognizer, workers: int) -> None:
+        global _worker_recognizer
+
+        if workers < 1:
+            raise ValueError("Process pool requires at least one worker")
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("Process pool recognizer requires 'fork' start method support")
+
+        self.recognizer = recognizer
+        self.workers = workers
+        self.params: dict = {}
+
+        _worker_recognizer = recognizer
+        # Workers inherit running resource tracker, instead of starting their own ones, which would unlink
+        #   shared memory segments of the parent, when worker exits
+        resource_tracker.ensure_running()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+        )
+        # Fork all workers right now, while model is loaded and process does not run extra threads yet.
+        #   Model weights are shared between workers copy-on-write.
+        pids = set(self.executor.map(_worker_ping, range(workers * 4)))
+        logger.info("Recognition workers started", workers=workers, pids=sorted(pids))
+
+    @classmethod
+    def from_options(cls, **options) -> ProcessPoolSpeechRecognizer:
+        from . import get_recognizer_by_name
+
+        recognizer_cls = get_recognizer_by_name(options["engine"])
+        recognizer = recognizer_cls.from_options(**options.get("options", {}))
+        return cls(recognizer, workers=options.get("workers", os.cpu_count() or 1))
+
+    def with_params(self, **params) -> ProcessPoolSpeechRecognizer:
+        # Parameters are validated here, workers apply them to their own copy of recognizer
+        variant = copy.copy(self)
+        variant.recognizer = self.recognizer.with_params(**params)
+        variant.params = {**self.params, **params}
+        return variant
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        loop = asyncio.get_running_loop()
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+
+        # Passing audio through shared memory segment, only segment name is pickled
+        shm = SharedMemory(create=True, size=max(audio.nbytes, 1))
+        try:
+            shared = np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)
+            shared[:] = audio
+            del shared
+            context = recognition_context.get()
+            text, worker_context = await loop.run_in_executor(
+                self.executor, _worker_recognize, shm.name, len(audio), self.params, context
+            )
+            if context is not None and worker_context is not None:
+                for field in dataclasses.fields(context):
+                    setattr(context, field.name, getattr(worker_context, field.name))
+            return text
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def warm_up(self, audio: np.ndarray) -> None:
+        # Every worker has to initialize engine on its own, one request per worker (most likely)
+        await asyncio.gather(*[self.recognize(audio) for _ in range(self.workers)])
+
+    async def teardown(self):
+        logger.info("Stopping recognition workers...")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: self.executor.shutdown(wait=True, cancel_futures=True))
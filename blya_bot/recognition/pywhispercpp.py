@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-import asyncio
 import re
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-from contextlib import suppress
+from typing import AsyncIterator
 
+import numpy as np
 import structlog
 
-from .interface import BaseSpeechRecognizer, TempFile
+from .chunked import SilenceSplitter
+from .executor import Emit, InferenceExecutor
+from .interface import BaseSpeechRecognizer, RecognitionContext, recognition_context
+from .vad import EnergyVad
 
 logger = structlog.getLogger(__name__)
 
@@ -28,9 +30,16 @@ def add_space_after_punctuation(text):
 
 
 class PyWhisperCppSpeechRecognizer(BaseSpeechRecognizer):
-    def __init__(self, model: "Model", lang: str) -> None:
+    def __init__(
+        self, model: "Model", lang: str, executor: InferenceExecutor | None = None, n_processors: int | None = None
+    ) -> None:
         self.model = model
         self.lang = lang
+        self.n_processors = n_processors
+        # Model holds single whisper.cpp context, which can't be used concurrently
+        self.executor = executor or InferenceExecutor("pywhispercpp", workers=1)
+        # whisper.cpp transcription can't be interrupted, so audio with deadline is transcribed in chunks
+        self.splitter = SilenceSplitter(EnergyVad(min_silence_ms=300, padding_ms=0))
 
     @classmethod
     def from_options(cls, **options) -> PyWhisperCppSpeechRecognizer:
@@ -39,48 +48,62 @@ class PyWhisperCppSpeechRecognizer(BaseSpeechRecognizer):
             model=options["model"],
             models_dir=options.get("models_dir", None),
             params_sampling_strategy=options.get("params_sampling_strategy", 0),
+            # Model default is min(4, CPU count)
+            **({"n_threads": options["n_threads"]} if options.get("n_threads") else {}),
         )
         logger.info("Whisper model loaded")
-        return cls(model, lang=options.get("language", None))
-
-    async def recognize(self, file: TempFile) -> str:
-        # Define a sentinel value that will be used to signal the end of transcription
-        SENTINEL = object()
-
-        # Define an asyncio queue to receive the segments asynchronously
-        queue: asyncio.Queue[Segment | object] = asyncio.Queue()
-
-        # Define the callback that will be used to push segments into the queue
-        def callback(segments):
-            for seg in segments:
-                # Push segments into the queue asynchronously but from the main thread
-                queue.put_nowait(seg)
-
-        def transcribe_sync():
-            logger.debug("Transcription started")
-            self.model.transcribe(file.name, language=self.lang, new_segment_callback=callback, n_processors=None)
-            # After transcription finishes, put the sentinel in the queue to indicate completion
-            queue.put_nowait(SENTINEL)
-
-        text = ""
-        # Use ProcessPoolExecutor to run the transcribe method in a separate process
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as pool:
-            transcribe_future = loop.run_in_executor(pool, transcribe_sync)
-
-            # Process segments asynchronously from the queue
-            while True:
-                # Use await to consume each segment from the queue as they are added by the callback
-                with suppress(asyncio.TimeoutError):
-                    # segment = await asyncio.wait_for(queue.get(), 5.0)
-                    segment = await queue.get()
-                    logger.debug(f"Segment transcribed: {segment}")
-                    if segment is SENTINEL:  # Sentinel value to signify the end of transcription
-                        break
-                    # Append segment text to the result
-                    text += segment.text + " "  # type: ignore
-
-            # Wait for the transcription to finish in the separate process
-            await transcribe_future
-
-        return add_space_after_punctuation(text)
+        return cls(
+            model,
+            lang=options.get("language", None),
+            executor=InferenceExecutor("pywhispercpp", workers=1, cpu_affinity=options.get("cpu_affinity")),
+            n_processors=options.get("n_processors", None),
+        )
+
+    def with_params(self, **params) -> PyWhisperCppSpeechRecognizer:
+        if unknown := set(params) - {"language"}:
+            raise ValueError(f"Unknown pywhispercpp decoding parameters: {', '.join(unknown)}")
+        return type(self)(
+            self.model, lang=params.get("language", self.lang), executor=self.executor, n_processors=self.n_processors
+        )
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        return "".join([text async for text in self.recognize_iter(audio)])
+
+    def _transcribe(self, audio: np.ndarray, emit: Emit[str], context: RecognitionContext | None) -> None:
+        stopped = False
+
+        def callback(segments: list[Segment]):
+            nonlocal stopped
+            for segment in segments:
+                logger.debug(f"Segment transcribed: {segment}")
+                if not emit(segment.text):
+                    # Consumer gone, the rest of audio is not transcribed
+                    stopped = True
+
+        logger.debug("Transcription started")
+        # Deadline is checked between chunks, split at silence
+        chunks = self.splitter.split(audio) if context is not None and context.deadline is not None else [audio]
+        for chunk in chunks:
+            if stopped:
+                return
+            if context is not None and context.expired():
+                context.partial = True
+                return
+            self.model.transcribe(
+                chunk, language=self.lang, new_segment_callback=callback, n_processors=self.n_processors
+            )
+
+    async def recognize_iter(self, audio: np.ndarray) -> AsyncIterator[str]:
+        # Context is read here: it's not propagated to executor threads
+        context = recognition_context.get()
+        # Segments are yielded as soon as whisper.cpp reports them, formatted the same way as the whole text
+        separator = ""
+        async for text in self.executor.stream(lambda emit: self._transcribe(audio, emit, context)):
+            text = add_space_after_punctuation(text)
+            if not text:
+                continue
+            yield separator + text
+            separator = " "
+
+    async def teardown(self):
+        self.executor.shutdown()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+import numpy as np
+import structlog
+
+from .interface import BaseSpeechRecognizer, RecognitionContext
+
+logger = structlog.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class Route:
+    engine: str
+    # Decoding parameters, applied to engine recognizer (e.g. "beam_size")
+    params: dict[str, Any] = field(default_factory=dict)
+    # Route is used only if message is not longer and queue is not deeper than limits
+    max_duration: float | None = None
+    max_queue_depth: int | None = None
+    recognizer: BaseSpeechRecognizer | None = field(default=None, repr=False)
+
+    @classmethod
+    def from_options(cls, options: dict[str, Any] | str) -> Route:
+        if isinstance(options, str):
+            return cls(engine=options)
+        return cls(
+            engine=options["engine"],
+            params=options.get("params", {}),
+            max_duration=options.get("max_duration"),
+            max_queue_depth=options.get("max_queue_depth"),
+        )
+
+    def matches(self, context: RecognitionContext) -> bool:
+        if self.max_duration is not None and context.duration > self.max_duration:
+            return False
+        if self.max_queue_depth is not None and context.queue_depth > self.max_queue_depth:
+            return False
+        return True
+
+
+class RoutingSpeechRecognizer(BaseSpeechRecognizer):
+    """
+    Holds several loaded recognizers, and picks one for every request.
+
+    Routes are checked in order, first route matching message duration and current queue depth is used,
+    if nothing matches - the last route. Chats may have their own routes list.
+    Usually routes go from the most accurate to the fastest one, so under load bot degrades to faster models.
+    """
+
+    def __init__(
+        self,
+        engines: dict[str, BaseSpeechRecognizer],
+        routes: list[Route],
+        chat_routes: dict[int, list[Route]] | None = None,
+    ) -> None:
+        if not routes:
+            raise ValueError("At least one recognition route required")
+        self.engines = engines
+        self.routes = routes
+        self.chat_routes = chat_routes or {}
+        for route in self._all_routes():
+            if route.engine not in engines:
+                raise ValueError(f"Unknown engine {route.engine!r} in recognition route, defined: {', '.join(engines)}")
+            # Recognizers for every route created once, sharing loaded models
+            route.recognizer = engines[route.engine].with_params(**route.params)
+
+    @classmethod
+    def from_options(cls, **options) -> RoutingSpeechRecognizer:
+        from . import get_recognizer_by_name
+
+        engines = {
+            name: get_recognizer_by_name(engine["engine"]).from_options(**engine.get("options", {}))
+            for name, engine in options["engines"].items()
+        }
+        return cls.from_engines(engines, **options)
+
+    @classmethod
+    def from_engines(
+        cls,
+        engines: dict[str, BaseSpeechRecognizer],
+        routes: list[dict[str, Any] | str],
+        chats: dict[str, list[dict[str, Any] | str] | dict[str, Any] | str] | None = None,
+        **_,
+    ) -> RoutingSpeechRecognizer:
+        chat_routes = {}
+        for chat_id, options in (chats or {}).items():
+            options = options if isinstance(options, list) else [options]
+            chat_routes[int(chat_id)] = [Route.from_options(route) for route in options]
+        return cls(engines, [Route.from_options(route) for route in routes], chat_routes)
+
+    def _all_routes(self):
+        yield from self.routes
+        for routes in self.chat_routes.values():
+            yield from routes
+
+    def select(self, context: RecognitionContext) -> Route:
+        routes = self.routes
+        if context.chat_id is not None:
+            routes = self.chat_routes.get(context.chat_id, routes)
+        for route in routes:
+            if route.matches(context):
+                return route
+        return routes[-1]
+
+    def route(self, context: RecognitionContext) -> BaseSpeechRecognizer:
+        route = self.select(context)
+        logger.debug(
+            "Recognition route selected",
+            engine=route.engine,
+            params=route.params,
+            duration=context.duration,
+            queue_depth=context.queue_depth,
+        )
+        return route.recognizer  # type: ignore[return-value]
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        # Without request context - treat as the shortest message on idle bot
+        return await self.route(RecognitionContext()).recognize(audio)
+
+    async def recognize_iter(self, audio: np.ndarray) -> AsyncIterator[str]:
+        async for part in self.route(RecognitionContext()).recognize_iter(audio):
+            yield part
+
+    async def warm_up(self, audio: np.ndarray) -> None:
+        for name, recognizer in self.engines.items():
+            logger.debug("Warming up recognition engine", engine=name)
+            await recognizer.warm_up(audio)
+
+    async def teardown(self):
+        for recognizer in self.engines.values():
+            await recognizer.teardown()
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from time import time
+from typing import Any, AsyncIterator
+
+import numpy as np
+import structlog
+
+from .decoding import SAMPLE_RATE
+from .interface import BaseSpeechRecognizer
+
+logger = structlog.getLogger(__name__)
+
+# Speech span in samples, [start, end)
+Span = tuple[int, int]
+
+
+class EnergyVad:
+    """
+    Lightweight voice activity detector, based on short-time frame energy.
+
+    Frame is considered as speech, if its energy is noticeably higher than noise floor of the recording.
+    Short pauses inside speech are kept, and speech spans are padded, so words are never cut.
+    """
+
+    def __init__(
+        self,
+        frame_ms: int = 30,
+        threshold_db: float = -50.0,
+        noise_margin_db: float = 10.0,
+        min_silence_ms: int = 500,
+        min_speech_ms: int = 200,
+        padding_ms: int = 200,
+        sample_rate: int = SAMPLE_RATE,
+    ) -> None:
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.min_silence = sample_rate * min_silence_ms // 1000
+        self.min_speech = sample_rate * min_speech_ms // 1000
+        self.padding = sample_rate * padding_ms // 1000
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_options(cls, options: dict[str, Any] | bool) -> EnergyVad:
+        if isinstance(options, bool):
+            return cls()
+        return cls(**options)
+
+    def detect(self, audio: np.ndarray) -> list[Span]:
+        frames_count = len(audio) // self.frame_size
+        if frames_count == 0:
+            return [(0, len(audio))] if len(audio) else []
+
+        frames = audio[: frames_count * self.frame_size].reshape(frames_count, self.frame_size)
+        energy_db = 10 * np.log10(np.mean(np.square(frames, dtype=np.float64), axis=1) + 1e-12)
+        noise_floor = np.percentile(energy_db, 10)
+        # When the whole recording is loud (no pauses at all), noise floor is close to peak level
+        threshold = min(noise_floor + self.noise_margin_db, np.max(energy_db) - self.noise_margin_db)
+        is_speech = energy_db > max(self.threshold_db, threshold)
+
+        # Frame flags into sample spans
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0]))))
+        spans = [(int(s) * self.frame_size, int(e) * self.frame_size) for s, e in zip(edges[::2], edges[1::2])]
+        if spans and spans[-1][1] == frames_count * self.frame_size:
+            # Speech lasts till the end, include incomplete tail frame
+            spans[-1] = (spans[-1][0], len(audio))
+
+        # Spans are merged and filtered before padding: padding is clipped at audio edges, so length of padded
+        #   span is not a measure of speech length. Padded spans, which would overlap, are merged here too
+        merged: list[Span] = []
+        for start, end in spans:
+            if merged and start - merged[-1][1] < self.min_silence + 2 * self.padding:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+
+        return [
+            (max(start - self.padding, 0), min(end + self.padding, len(audio)))
+            for start, end in merged
+            if end - start >= self.min_speech
+        ]
+
+    def trim(self, audio: np.ndarray) -> np.ndarray:
+        spans = self.detect(audio)
+        if not spans:
+            return np.zeros(0, dtype=audio.dtype)
+        if len(spans) == 1 and spans[0] == (0, len(audio)):
+            return audio
+        return np.concatenate([audio[start:end] for start, end in spans])
+
+
+class VadSpeechRecognizer(BaseSpeechRecognizer):
+    """Removes silence and non-speech spans from audio before passing it to wrapped recognizer"""
+
+    def __init__(self, recognizer: BaseSpeechRecognizer, vad: EnergyVad) -> None:
+        self.recognizer = recognizer
+        self.vad = vad
+
+    @classmethod
+    def from_options(cls, **options) -> VadSpeechRecognizer:
+        from . import get_recognizer_by_name
+
+        recognizer_cls = get_recognizer_by_name(options["engine"])
+        recognizer = recognizer_cls.from_options(**options.get("options", {}))
+        return cls(recognizer, EnergyVad.from_options(options.get("vad", True)))
+
+    def with_params(self, **params) -> VadSpeechRecognizer:
+        return type(self)(self.recognizer.with_params(**params), self.vad)
+
+    def trim(self, audio: np.ndarray) -> np.ndarray:
+        start_time = time()
+        trimmed = self.vad.trim(audio)
+        logger.debug(
+            "Silence trimmed",
+            duration=f"{len(audio) / SAMPLE_RATE:.2f}sec.",
+            duration_after_vad=f"{len(trimmed) / SAMPLE_RATE:.2f}sec.",
+            elapsed_time=f"{time()-start_time:.4f}sec.",
+        )
+        return trimmed
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        trimmed = self.trim(audio)
+        if not len(trimmed):
+            return ""
+        return await self.recognizer.recognize(trimmed)
+
+    async def recognize_iter(self, audio: np.ndarray) -> AsyncIterator[str]:
+        trimmed = self.trim(audio)
+        if not len(trimmed):
+            return
+        async for part in self.recognizer.recognize_iter(trimmed):
+            yield part
+
+    async def warm_up(self, audio: np.ndarray) -> None:
+        await self.recognizer.warm_up(audio)
+
+    async def teardown(self):
+        await self.recognizer.teardown()
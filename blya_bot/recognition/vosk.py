@@ -1,82 +1,223 @@
 import asyncio
-import io
 import json
-import wave
-from concurrent.futures import ThreadPoolExecutor
-from typing import Generator
+import shutil
+from collections import defaultdict
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Generator
 
+import numpy as np
 import structlog
 
-from .interface import BaseSpeechRecognizer, TempFile
-from .utils import async_wrap_iter
+from .decoding import SAMPLE_RATE, to_pcm16
+from .executor import InferenceExecutor
+from .interface import BaseSpeechRecognizer, RecognitionContext, recognition_context
 
 logger = structlog.getLogger(__name__)
 
 try:
-    import pydub
     import vosk
 except ImportError:
     logger.error("'vosk' recognition core dependencies not installed")
     raise
 
 
-async def convert_audio_async(input_buf: io.IOBase) -> io.BytesIO:
-    loop = asyncio.get_event_loop()
+# 0.25 sec. of 16-bit mono PCM
+FRAME_SIZE = SAMPLE_RATE // 4 * 2
 
-    # Define the blocking task as a helper function
-    def convert_audio(input_buf: io.IOBase) -> io.BytesIO:
-        input_buf.seek(0)
-        audio: pydub.AudioSegment = pydub.AudioSegment.from_file(input_buf)
-        audio = audio.set_channels(1)
-        audio = audio.set_sample_width(2)
 
-        wav_buf = io.BytesIO()
-        audio.export(format="wav", out_f=wav_buf)
-        wav_buf.seek(0)
-        return wav_buf
+async def start_stream_decoder() -> asyncio.subprocess.Process:
+    # Decoder reads any (streamable) media container from stdin, and writes raw 16-bit mono PCM to stdout
+    return await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        *("-hide_banner", "-loglevel", "error"),
+        *("-i", "pipe:0"),
+        *("-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le"),
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
 
-    # Run the blocking code in a separate thread
-    with ThreadPoolExecutor() as pool:
-        return await loop.run_in_executor(pool, convert_audio, input_buf)
+
+class KaldiRecognizerPool:
+    """
+    Pool of ready to use recognizers, by sample rate.
+
+    Recognizer setup (decoding graph, decoder state) is done once, recognizers are reset and reused between messages.
+    Amount of concurrent recognitions is limited by pool size.
+    """
+
+    def __init__(self, model: "vosk.Model", size: int, sample_rates: tuple[int, ...] = (SAMPLE_RATE,)) -> None:
+        if size < 1:
+            raise ValueError("Recognizer pool size must be positive")
+        self.model = model
+        self.size = size
+        self._idle: dict[int, list[vosk.KaldiRecognizer]] = defaultdict(list)
+        self._slots = asyncio.Semaphore(size)
+        self.in_use = 0
+        self.waiting = 0
+        self.created = 0
+        self.discarded = 0
+        for sample_rate in sample_rates:
+            self._idle[sample_rate].extend(self._create(sample_rate) for _ in range(size))
+
+    def _create(self, sample_rate: int) -> "vosk.KaldiRecognizer":
+        self.created += 1
+        return vosk.KaldiRecognizer(self.model, sample_rate)
+
+    @property
+    def utilization(self) -> float:
+        return self.in_use / self.size
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "idle": sum(len(idle) for idle in self._idle.values()),
+            "created": self.created,
+            "discarded": self.discarded,
+            "utilization": self.utilization,
+        }
+
+    @asynccontextmanager
+    async def acquire(self, sample_rate: int = SAMPLE_RATE) -> AsyncIterator["vosk.KaldiRecognizer"]:
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        idle = self._idle[sample_rate]
+        rec = idle.pop() if idle else self._create(sample_rate)
+        self.in_use += 1
+        logger.debug("Kaldi recognizer acquired", **self.stats())
+        released = False
+        try:
+            yield rec
+            released = True
+        finally:
+            self.in_use -= 1
+            self._slots.release()
+            if released:
+                rec.Reset()
+                idle.append(rec)
+            else:
+                # Recognition failed or cancelled: recognizer may still be used by executor thread, or be broken
+                self.discarded += 1
 
 
 class VoskSpeechRecognizer(BaseSpeechRecognizer):
-    def __init__(self, model: "vosk.Model") -> None:
+    def __init__(
+        self,
+        model: "vosk.Model",
+        streaming: bool = True,
+        pool_size: int = 4,
+        cpu_affinity: list[int] | None = None,
+    ) -> None:
         self.model = model
+        self.pool = KaldiRecognizerPool(model, pool_size)
+        # One inference thread per pooled recognizer
+        self.executor = InferenceExecutor("vosk", workers=pool_size, cpu_affinity=cpu_affinity)
+        self.streaming = streaming and shutil.which("ffmpeg") is not None
+        if streaming and not self.streaming:
+            logger.warning("'ffmpeg' executable not found, streaming recognition disabled")
 
     @classmethod
     def from_options(cls, **options):
         model = vosk.Model(model_path=options.get("model_path"))
-        return cls(model)
-
-    def _recognize(self, wav_buf: io.IOBase) -> Generator[str, None, None]:
-        # Loading as wave to obtain framerate for recognizer
-        wf = wave.open(wav_buf, "rb")  # type: ignore
-
-        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-            logger.warning("Audio file must be WAV format mono PCM.")
-
-        rec = vosk.KaldiRecognizer(self.model, wf.getframerate())
+        return cls(
+            model,
+            streaming=options.get("streaming", True),
+            pool_size=options.get("pool_size", 4),
+            cpu_affinity=options.get("cpu_affinity"),
+        )
+
+    @property
+    def supports_streaming(self) -> bool:
+        return self.streaming
+
+    @staticmethod
+    def _recognize(
+        rec: "vosk.KaldiRecognizer", audio: np.ndarray, context: RecognitionContext | None = None
+    ) -> Generator[str, None, None]:
         # rec.SetWords(True)
         # rec.SetPartialWords(True)
         # rec.SetNLSML(True)
 
-        while True:
-            data = wav_buf.read(4000)
-            if len(data) == 0:
+        pcm = to_pcm16(audio)
+        for offset in range(0, len(pcm), FRAME_SIZE):
+            if context is not None and context.expired():
+                # Audio accepted so far is still recognized by final result
+                context.partial = True
                 break
-            if rec.AcceptWaveform(data):
+            if rec.AcceptWaveform(pcm[offset : offset + FRAME_SIZE]):
                 result = json.loads(rec.Result())
                 yield result["text"] + " "
 
         final_result = json.loads(rec.FinalResult())
         yield final_result["text"]
 
-        rec.Reset()
-        del rec
-        del wf
-
-    async def recognize(self, file: TempFile) -> str:
-        wav_buf = await convert_audio_async(file.file)  # type: ignore
-        parts = [part async for part in async_wrap_iter(self._recognize(wav_buf))]
+    async def recognize(self, audio: np.ndarray) -> str:
+        parts = [part async for part in self.recognize_iter(audio)]
         return "".join(parts)
+
+    async def recognize_iter(self, audio: np.ndarray) -> AsyncIterator[str]:
+        # Context is read here: it's not propagated to executor threads
+        context = recognition_context.get()
+        async with self.pool.acquire(SAMPLE_RATE) as rec:
+            async for part in self.executor.iterate(lambda: self._recognize(rec, audio, context)):
+                yield part
+
+    async def recognize_stream(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        context = recognition_context.get()
+        # Recognizer is taken first: decoder is not started while waiting for free recognizer
+        async with self.pool.acquire(SAMPLE_RATE) as rec:
+            decoder = await start_stream_decoder()
+            assert decoder.stdin is not None and decoder.stdout is not None  # noqa: S101
+
+            async def feed_decoder():
+                try:
+                    async for chunk in chunks:
+                        decoder.stdin.write(chunk)  # type: ignore
+                        await decoder.stdin.drain()  # type: ignore
+                finally:
+                    decoder.stdin.close()  # type: ignore
+
+            feeder = asyncio.create_task(feed_decoder())
+            try:
+                while True:
+                    if context is not None and context.expired():
+                        context.partial = True
+                        break
+                    # PCM frames are recognized as soon as decoder emits them, memory usage does not depend on duration
+                    try:
+                        data = await decoder.stdout.readexactly(FRAME_SIZE)
+                    except asyncio.IncompleteReadError as e:
+                        data = e.partial  # Decoder finished, last frame is shorter
+                    if not data:
+                        break
+                    if await self.executor.run(rec.AcceptWaveform, data):
+                        yield json.loads(rec.Result())["text"] + " "
+
+                if context is not None and context.partial:
+                    # Rest of the stream is not needed, decoder is stopped below
+                    yield json.loads(rec.FinalResult())["text"]
+                    return
+
+                await feeder
+                if await decoder.wait() != 0:
+                    stderr = await decoder.stderr.read()  # type: ignore
+                    raise RuntimeError(f"Audio stream decoding failed: {stderr.decode(errors='replace').strip()}")
+
+                yield json.loads(rec.FinalResult())["text"]
+            finally:
+                if not feeder.done():
+                    feeder.cancel()
+                if decoder.returncode is None:
+                    with suppress(ProcessLookupError):
+                        decoder.kill()
+                    await decoder.wait()
+
+    async def teardown(self):
+        self.executor.shutdown()
@@ -3,7 +3,8 @@ from environs import Env
 
 logger = structlog.getLogger(__name__)
 
-AVAILABLE_RECOGNITION_ENGINES = ("vosk", "pywhispercpp", "faster-whisper")
+AVAILABLE_RECOGNITION_ENGINES = ("vosk", "pywhispercpp", "faster-whisper", "router")
+AVAILABLE_WORD_COUNTERS = ("aho-corasick",)
 
 env = Env()
 env.read_env()
@@ -11,6 +12,15 @@ env.read_env()
 
 TELEGRAM_BOT_TRANSCRIBE_COMMAND = env("TELEGRAM_BOT_TRANSCRIBE_COMMAND", "/t")
 TELEGRAM_BOT_TOKEN = env("TELEGRAM_BOT_TOKEN")
+# Post placeholder reply right away, and edit it with intermediate results while transcribing
+TELEGRAM_PROGRESSIVE_REPLIES = env.bool("TELEGRAM_PROGRESSIVE_REPLIES", False)
+TELEGRAM_PROGRESS_EDIT_INTERVAL = env.float("TELEGRAM_PROGRESS_EDIT_INTERVAL", 2.0)
+TELEGRAM_PROGRESS_PLACEHOLDER = env("TELEGRAM_PROGRESS_PLACEHOLDER", "<i>Слушаю...</i> :hourglass_not_done:")
+# Running bad words count under placeholder, "{counted}" - amount of bad words found so far
+TELEGRAM_PROGRESS_COUNTED = env("TELEGRAM_PROGRESS_COUNTED", "Уже насчитал: <b>{counted}</b>")
+# Telegram user ids, allowed to use admin commands
+TELEGRAM_ADMIN_IDS = env.list("TELEGRAM_ADMIN_IDS", [], subcast=int)
+TELEGRAM_BOT_RELOAD_DICTIONARY_COMMAND = env("TELEGRAM_BOT_RELOAD_DICTIONARY_COMMAND", "/reload_dictionary")
 TELEGRAM_USE_WEBHOOK = env.bool("TELEGRAM_USE_WEBHOOK", False)
 if TELEGRAM_USE_WEBHOOK:
     TELEGRAM_WEBHOOK_URL = env("TELEGRAM_WEBHOOK_URL", None)  # "https://my-server.com/webhook"
@@ -22,12 +32,34 @@ else:
     TELEGRAM_WEBHOOK_PATH = None
 
 
-SERVICE_MY_NERVES_LIMIT = env.int("SERVICE_POLITE_RESPONSE", 5 * 60)
+SERVICE_MY_NERVES_LIMIT = env.int("SERVICE_MY_NERVES_LIMIT", 5 * 60)
 SERVICE_POLITE_RESPONSE = env("SERVICE_POLITE_RESPONSE", "Бот сломан, больше пяти минут войса ему не переварить")
+SERVICE_PARTIAL_RESPONSE = env("SERVICE_PARTIAL_RESPONSE", "Не успел дослушать до конца, это только начало")
+SERVICE_OVERLOAD_RESPONSE = env("SERVICE_OVERLOAD_RESPONSE", "Бот перегружен, попробуйте попозже")
+SERVICE_EMPTY_TRANSCRIPTION_RESPONSE = env("SERVICE_EMPTY_TRANSCRIPTION_RESPONSE", "<i>Ничего не разобрал</i>")
+# Replies to dictionary reload command, "{total_loaded}" - amount of dictionary words, "{error}" - failure reason
+SERVICE_DICTIONARY_RELOADED_RESPONSE = env(
+    "SERVICE_DICTIONARY_RELOADED_RESPONSE", "Словарь перезагружен, слов: {total_loaded}"
+)
+SERVICE_DICTIONARY_RELOAD_FAILED_RESPONSE = env(
+    "SERVICE_DICTIONARY_RELOAD_FAILED_RESPONSE", "Не получилось перезагрузить словарь: {error}"
+)
 SERVICE_IGNORE_FORWARDED = env.bool("SERVICE_IGNORE_FORWARDED", True)
 SERVICE_LOG_LEVEL = env("SERVICE_LOG_LEVEL", "info")
 SERVICE_LOG_COLORS = env.bool("SERVICE_LOG_COLORS", False)
 SERVICE_BAD_WORDS_FILE = env.path("SERVICE_BAD_WORDS_FILE", "./fixtures/bad_words.txt")
+# Dictionary, compiled from "SERVICE_BAD_WORDS_FILE", next to it by default. Built on start, if missing or outdated.
+SERVICE_BAD_WORDS_COMPILED_FILE = env.path("SERVICE_BAD_WORDS_COMPILED_FILE", None)
+# Check "SERVICE_BAD_WORDS_FILE" for changes every N seconds, and reload dictionary without restart. "0" - don't check.
+SERVICE_BAD_WORDS_RELOAD_INTERVAL = env.float("SERVICE_BAD_WORDS_RELOAD_INTERVAL", 0.0)
+# Dictionary build fails, if a single line or the whole file expands to more words (variants, before morphing)
+SERVICE_BAD_WORDS_MAX_LINE_EXPANSIONS = env.int("SERVICE_BAD_WORDS_MAX_LINE_EXPANSIONS", 10_000)
+SERVICE_BAD_WORDS_MAX_EXPANSIONS = env.int("SERVICE_BAD_WORDS_MAX_EXPANSIONS", 1_000_000)
+SERVICE_WORD_COUNTER = env("SERVICE_WORD_COUNTER", "aho-corasick").lower()
+if SERVICE_WORD_COUNTER not in AVAILABLE_WORD_COUNTERS:
+    raise Exception(
+        f"Please choose supported word counter: {', '.join(AVAILABLE_WORD_COUNTERS)}, not {SERVICE_WORD_COUNTER!r}"
+    )
 
 RECOGNITION_ENGINE = env("RECOGNITION_ENGINE").lower()
 if RECOGNITION_ENGINE not in AVAILABLE_RECOGNITION_ENGINES:
@@ -35,20 +67,61 @@ if RECOGNITION_ENGINE not in AVAILABLE_RECOGNITION_ENGINES:
         f"Please choose supported recognition engine: {', '.join(AVAILABLE_RECOGNITION_ENGINES)}, not {RECOGNITION_ENGINE!r}"
     )
 RECOGNITION_ENGINE_OPTIONS = env.json("RECOGNITION_ENGINE_OPTIONS", "{}")
+# Amount of forked recognition worker processes, sharing loaded model. "0" - recognize in bot process
+RECOGNITION_WORKERS = env.int("RECOGNITION_WORKERS", 0)
+# Learn language of every chat from language detection, and skip detection, once chat language is known.
+#   Used only if language is not set in engine options. Profiles are persisted in JSON file.
+RECOGNITION_LANGUAGE_PINNING = env.bool("RECOGNITION_LANGUAGE_PINNING", False)
+RECOGNITION_LANGUAGE_PROFILES_FILE = env.path("RECOGNITION_LANGUAGE_PROFILES_FILE", "language_profiles.json")
+# Recognition time limit (seconds): "RECOGNITION_TIMEOUT" + "RECOGNITION_TIMEOUT_PER_AUDIO_SECOND" * duration.
+#   Engine is stopped after it, and text recognized so far is returned. "0" for both - no limit.
+RECOGNITION_TIMEOUT = env.float("RECOGNITION_TIMEOUT", 0.0)
+RECOGNITION_TIMEOUT_PER_AUDIO_SECOND = env.float("RECOGNITION_TIMEOUT_PER_AUDIO_SECOND", 0.0)
+# Measure a few threading and compute type options of engine on startup, and use the best ones.
+#   Result is saved next to the model, and tuning is skipped on next start.
+RECOGNITION_AUTOTUNE = env.bool("RECOGNITION_AUTOTUNE", False)
+# Run synthetic audio through recognizer on startup, before accepting messages
+RECOGNITION_WARMUP = env.bool("RECOGNITION_WARMUP", True)
+
+
+def _validate_engine_options(engine: str, options: dict, config: str = "RECOGNITION_ENGINE_OPTIONS") -> None:
+    if engine == "vosk":
+        if options.get("model_path") is None:
+            raise Exception(f"Please provide 'model_path' option in {config!r} config")
 
-if RECOGNITION_ENGINE == "vosk":
-    if RECOGNITION_ENGINE_OPTIONS.get("model_path") is None:
-        raise Exception("Please provide 'model_path' option in 'RECOGNITION_ENGINE_OPTIONS' config")
+    elif engine in ("pywhispercpp", "faster-whisper") and options.get("model") is None:
+        raise Exception(f"Please provide 'model' option in {config!r} config")
+
+
+if RECOGNITION_ENGINE == "router":
+    # Several engines loaded together, see "recognition.router" for routes format
+    if not RECOGNITION_ENGINE_OPTIONS.get("engines") or not RECOGNITION_ENGINE_OPTIONS.get("routes"):
+        raise Exception("Please provide 'engines' and 'routes' options in 'RECOGNITION_ENGINE_OPTIONS' config")
+    for _name, _engine in RECOGNITION_ENGINE_OPTIONS["engines"].items():
+        if _engine.get("engine") == "router" or _engine.get("engine") not in AVAILABLE_RECOGNITION_ENGINES:
+            raise Exception(f"Please choose supported recognition engine for {_name!r} in 'RECOGNITION_ENGINE_OPTIONS'")
+        _validate_engine_options(
+            _engine["engine"], _engine.get("options", {}), f"RECOGNITION_ENGINE_OPTIONS.engines.{_name}.options"
+        )
+else:
+    _validate_engine_options(RECOGNITION_ENGINE, RECOGNITION_ENGINE_OPTIONS)
 
-elif RECOGNITION_ENGINE in ("pywhispercpp", "faster-whisper") and RECOGNITION_ENGINE_OPTIONS.get("model") is None:
-    raise Exception("Please provide 'model' option in 'RECOGNITION_ENGINE_OPTIONS' config")
+SCHEDULER_CONCURRENCY = env.int("SCHEDULER_CONCURRENCY", 2)
+SCHEDULER_MAX_QUEUE_DEPTH = env.int("SCHEDULER_MAX_QUEUE_DEPTH", 50)
+# Seconds, expected wait time is estimated from queued audio duration and recent processing speed
+SCHEDULER_MAX_EXPECTED_WAIT = env.float("SCHEDULER_MAX_EXPECTED_WAIT", 5 * 60)
+if SCHEDULER_CONCURRENCY < 1:
+    raise Exception("'SCHEDULER_CONCURRENCY' must be positive")
 
 HEALTH_CHECK_HOST = env("HEALTH_CHECK_HOST", "0.0.0.0")  # noqa: S104
 HEALTH_CHECK_PORT = env.int("HEALTH_CHECK_PORT", 8080)
 HEALTH_CHECK_PATH = env("HEALTH_CHECK_PATH", "/health/live")
+HEALTH_CHECK_READY_PATH = env("HEALTH_CHECK_READY_PATH", "/health/ready")
 
 CACHE_ENGINE = env("CACHE_ENGINE", None)
 CACHE_PARAMS = env.json("CACHE_PARAMS", "{}")
+# Also look up transcriptions by decoded audio content, so re-uploaded audio is not recognized again
+CACHE_FINGERPRINT = env.bool("CACHE_FINGERPRINT", False)
 if CACHE_ENGINE == "sqlite":
     if CACHE_PARAMS.get("db_path") is None:
         CACHE_PARAMS["db_path"] = "transcription_cache.db"
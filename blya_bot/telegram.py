@@ -1,25 +1,121 @@
-import tempfile
-from typing import Awaitable, Callable
+import asyncio
+from contextlib import suppress
+from dataclasses import dataclass
+from time import monotonic
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable
 
 import emoji  # type: ignore
 import structlog
 from aiogram import Bot, Dispatcher, F, types
-from aiogram.enums import ParseMode
+from aiogram.enums import ChatType, ParseMode
+from aiogram.exceptions import TelegramBadRequest
 
-from blya_bot.models.models import TranscriptionData
+from blya_bot.models.models import TextSummary, TranscriptionData
 
 from . import settings
-from .core import BotCore
+from .core import BotCore, DictionaryReloader, Priority, SchedulerOverloaded
 from .utils import highlight_text, split_in_chunks
 from .word_count.utils import count_words_total
 
 logger = structlog.getLogger(__name__)
 
 
+@dataclass(slots=True)
+class TelegramMediaSource:
+    bot: Bot
+    file_id: str
+    file_unique_id: str
+    streamable: bool = False
+    chunk_size: int = 64 * 1024
+
+    async def download(self, destination: BinaryIO) -> None:
+        await self.bot.download(self.file_id, destination=destination, chunk_size=self.chunk_size)
+        logger.debug("Media file downloaded", file_id=self.file_id)
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        file = await self.bot.get_file(self.file_id)
+        if file.file_path is None:
+            raise ValueError(f"File {self.file_id!r} is not available for download")
+
+        if self.bot.session.api.is_local:
+            # Local Bot API server stores files on disk, no need for streaming
+            buf = await self.bot.download_file(file.file_path, chunk_size=self.chunk_size)
+            while chunk := buf.read(self.chunk_size):  # type: ignore
+                yield chunk
+            return
+
+        url = self.bot.session.api.file_url(self.bot.token, file.file_path)
+        async for chunk in self.bot.session.stream_content(
+            url=url, timeout=30, chunk_size=self.chunk_size, raise_for_status=True
+        ):
+            yield chunk
+        logger.debug("Media file streamed", file_id=self.file_id)
+
+
+class ProgressiveReply:
+    """Placeholder reply message, which is edited with intermediate results while transcription is running"""
+
+    def __init__(self, message: types.Message, render: Callable[[str], str], interval: float = 2.0) -> None:
+        self.message = message
+        self.render = render
+        self.interval = interval
+        self.placeholder: types.Message | None = None
+        self._last_edit = 0.0
+        self._edit_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self.placeholder = await self.message.reply(
+            emoji.emojize(settings.TELEGRAM_PROGRESS_PLACEHOLDER), parse_mode=ParseMode.HTML
+        )
+        self._last_edit = monotonic()
+
+    async def update(self, text: str) -> None:
+        if self.placeholder is None:
+            return
+        # Throttling edits: Telegram limits message edits rate, and recognition should never wait for network
+        if self._edit_task is not None and not self._edit_task.done():
+            return
+        if monotonic() - self._last_edit < self.interval:
+            return
+        self._last_edit = monotonic()
+        self._edit_task = asyncio.create_task(self.edit(self.render(text)))
+
+    async def edit(self, text: str) -> None:
+        if self.placeholder is None:
+            return
+        try:
+            await self.placeholder.edit_text(text, parse_mode=ParseMode.HTML)
+        except TelegramBadRequest as e:
+            # Most likely "message is not modified"
+            logger.debug("Progress message not edited", reason=e.message)
+
+    async def finish(self) -> types.Message | None:
+        # Waiting for pending intermediate edit, so it won't overwrite final result
+        if self._edit_task is not None:
+            with suppress(Exception):
+                await self._edit_task
+        return self.placeholder
+
+    async def cancel(self) -> None:
+        await self.finish()
+        if self.placeholder is not None:
+            with suppress(TelegramBadRequest):
+                await self.placeholder.delete()
+            self.placeholder = None
+
+
 class TelegramViews:
-    def __init__(self, core: BotCore, bot: Bot) -> None:
+    def __init__(
+        self,
+        core: BotCore,
+        bot: Bot,
+        progressive_replies: bool = False,
+        dictionary_reloader: DictionaryReloader | None = None,
+    ) -> None:
         self.core = core
         self.bot = bot
+        self.progressive_replies = progressive_replies
+        self.dictionary_reloader = dictionary_reloader
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
@@ -36,11 +132,22 @@ class TelegramViews:
             return
 
         if message.voice.duration > settings.SERVICE_MY_NERVES_LIMIT:
-            return await message.reply(settings.SERVICE_MY_NERVES_LIMIT)
+            return await message.reply(settings.SERVICE_POLITE_RESPONSE)
 
         with structlog.contextvars.bound_contextvars(message_id=message.message_id, chat_id=message.chat.id):
-            data = await self.transcribe_media(message.voice.file_id, message.voice.file_unique_id)
-            return await self.answer_transcription(message, data)
+            progress = await self.start_progress(message, self.render_transcription_progress)
+            data = await self.transcribe_media(
+                message,
+                message.voice.file_id,
+                message.voice.file_unique_id,
+                message.voice.duration,
+                Priority.HIGH,
+                streamable=True,
+                progress=progress,
+            )
+            if data is None:
+                return
+            return await self.answer_transcription(message, data, progress)
 
     async def handle_video_note_reply(self, message: types.Message):
         if message.reply_to_message is None:
@@ -51,11 +158,32 @@ class TelegramViews:
             return
 
         with structlog.contextvars.bound_contextvars(message_id=message.message_id, chat_id=message.chat.id):
-            data = await self.transcribe_media(message.video_note.file_id, message.video_note.file_unique_id)
-            return await self.answer_transcription(message, data)
+            progress = await self.start_progress(message, self.render_transcription_progress)
+            data = await self.transcribe_media(
+                message,
+                message.video_note.file_id,
+                message.video_note.file_unique_id,
+                message.video_note.duration,
+                Priority.HIGH,
+                progress=progress,
+            )
+            if data is None:
+                return
+            return await self.answer_transcription(message, data, progress)
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
+    async def handle_reload_dictionary(self, message: types.Message):
+        if self.dictionary_reloader is None:
+            return
+        logger.info("Dictionary reload requested", user_id=message.from_user.id if message.from_user else None)
+        try:
+            total_loaded = await self.dictionary_reloader.reload()
+        except Exception as e:
+            logger.exception("Dictionary reload failed")
+            return await message.reply(settings.SERVICE_DICTIONARY_RELOAD_FAILED_RESPONSE.format(error=e))
+        return await message.reply(settings.SERVICE_DICTIONARY_RELOADED_RESPONSE.format(total_loaded=total_loaded))
+
     async def handle_voice(self, message: types.Message):
         if message.voice is None:
             return
@@ -65,68 +193,177 @@ class TelegramViews:
             return
 
         if message.voice.duration > settings.SERVICE_MY_NERVES_LIMIT:
-            return await message.reply(settings.SERVICE_MY_NERVES_LIMIT)
+            return await message.reply(settings.SERVICE_POLITE_RESPONSE)
 
         with structlog.contextvars.bound_contextvars(message_id=message.message_id, chat_id=message.chat.id):
-            data = await self.transcribe_media(message.voice.file_id, message.voice.file_unique_id)
-            return await self.answer_summary(message, data)
+            progress = await self.start_progress(message, self.render_summary_progress)
+            data = await self.transcribe_media(
+                message,
+                message.voice.file_id,
+                message.voice.file_unique_id,
+                message.voice.duration,
+                streamable=True,
+                progress=progress,
+            )
+            if data is None:
+                return
+            return await self.answer_summary(message, data, progress)
 
     async def handle_video_note(self, message: types.Message):
         if message.video_note is None:
             return
 
         with structlog.contextvars.bound_contextvars(message_id=message.message_id, chat_id=message.chat.id):
-            data = await self.transcribe_media(message.video_note.file_id, message.video_note.file_unique_id)
-            return await self.answer_summary(message, data)
+            progress = await self.start_progress(message, self.render_summary_progress)
+            data = await self.transcribe_media(
+                message,
+                message.video_note.file_id,
+                message.video_note.file_unique_id,
+                message.video_note.duration,
+                progress=progress,
+            )
+            if data is None:
+                return
+            return await self.answer_summary(message, data, progress)
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
-    async def transcribe_media(self, file_id: str, file_unique_id: str) -> TranscriptionData:
-        with (
-            structlog.contextvars.bound_contextvars(file_unique_id=file_unique_id),
-            tempfile.NamedTemporaryFile() as temp_audio_file,
-        ):
-            await self.bot.download(file_id, destination=temp_audio_file)  # type: ignore
-            temp_audio_file.seek(0)
-            logger.debug("Voice file stored to temp", file=repr(temp_audio_file.name), file_id=file_id)
-            return await self.core.transcribe_and_summarize(file_unique_id, temp_audio_file)
+    async def start_progress(self, message: types.Message, render: Callable[[str], str]) -> ProgressiveReply | None:
+        if not self.progressive_replies:
+            return None
+        progress = ProgressiveReply(message, render, interval=settings.TELEGRAM_PROGRESS_EDIT_INTERVAL)
+        await progress.start()
+        return progress
+
+    async def transcribe_media(
+        self,
+        message: types.Message,
+        file_id: str,
+        file_unique_id: str,
+        duration: float,
+        priority: Priority = Priority.NORMAL,
+        streamable: bool = False,
+        progress: ProgressiveReply | None = None,
+    ) -> TranscriptionData | None:
+        if message.chat.type == ChatType.PRIVATE:
+            priority = Priority.HIGH
+
+        media = TelegramMediaSource(self.bot, file_id, file_unique_id, streamable=streamable)
+        with structlog.contextvars.bound_contextvars(file_unique_id=file_unique_id):
+            try:
+                return await self.core.transcribe_and_summarize(
+                    media,
+                    chat_id=message.chat.id,
+                    duration=duration,
+                    priority=priority,
+                    on_progress=progress.update if progress else None,
+                )
+            except SchedulerOverloaded as e:
+                logger.warning("Transcription rejected", reason=e.reason, queue_depth=e.queue_depth)
+                if progress is not None:
+                    await progress.finish()
+                    await progress.edit(settings.SERVICE_OVERLOAD_RESPONSE)
+                else:
+                    await message.reply(settings.SERVICE_OVERLOAD_RESPONSE)
+                return None
+            except Exception:
+                if progress is not None:
+                    await progress.cancel()
+                raise
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
-    async def answer_summary(self, message: types.Message, data: TranscriptionData):
+    @staticmethod
+    def format_summary(transcription: str, summary: TextSummary) -> str:
         # Overall stats
-        bad_words_total = sum(data.summary.counter.values())
+        bad_words_total = sum(summary.counter.values())
         if bad_words_total == 0:
             # TODO: template response messages
-            response_text = "Я не обнаружил ругательств, :red_heart: <b>вы восхитительны</b> :red_heart:"
-            return await message.reply(emoji.emojize(response_text), parse_mode=ParseMode.HTML)
+            return "Я не обнаружил ругательств, :red_heart: <b>вы восхитительны</b> :red_heart:"
 
-        words_total = count_words_total(data.transcription)
+        words_total = count_words_total(transcription)
         bad_words_percentage = (bad_words_total / words_total) * 100
 
         # Assembling answer
         # TODO: template response messages
         response_text = "<b><i>Cтатистика:</i></b>\n"
-        for word, cnt in data.summary.counter.most_common():  # Sorted by count from high to low
+        for word, cnt in summary.counter.most_common():  # Sorted by count from high to low
             response_text += f":sparkles: <b>{word}</b> - {cnt}\n"
         response_text += (
             f"\nВсего около <b>{bad_words_total}</b> матерных слов из <b>{words_total}</b> "
             f"или <b>{bad_words_percentage:.2f}%</b> :new_moon_face:"
         )
-
-        return await message.reply(emoji.emojize(response_text), parse_mode=ParseMode.HTML)
-
-    async def answer_transcription(self, message: types.Message, data: TranscriptionData):
-        if len(data.summary.markup):
-            highlighted = emoji.emojize(highlight_text(data.transcription, data.summary.markup))
-        else:
-            highlighted = data.transcription
+        return response_text
+
+    @staticmethod
+    def format_transcription(transcription: str, summary: TextSummary) -> str:
+        if len(summary.markup):
+            return emoji.emojize(highlight_text(transcription, summary.markup))
+        return transcription
+
+    def render_summary_progress(self, text: str) -> str:
+        summary = self.core.calculate_summary(text)
+        counted = sum(summary.counter.values())
+        counted_text = settings.TELEGRAM_PROGRESS_COUNTED.format(counted=counted)
+        response_text = f"{settings.TELEGRAM_PROGRESS_PLACEHOLDER}\n\n{counted_text}\n"
+        for word, cnt in summary.counter.most_common():
+            response_text += f":sparkles: <b>{word}</b> - {cnt}\n"
+        return emoji.emojize(response_text)
+
+    def render_transcription_progress(self, text: str) -> str:
+        highlighted = self.format_transcription(text, self.core.calculate_summary(text))
+        # Only first message part is shown during transcription
+        first_part = next(split_in_chunks(highlighted, 4000, ["\n\n", "\n", " "]), "")
+        return first_part + emoji.emojize(" :hourglass_not_done:")
+
+    async def answer_summary(
+        self, message: types.Message, data: TranscriptionData, progress: ProgressiveReply | None = None
+    ):
+        response_text = emoji.emojize(self.format_summary(data.transcription, data.summary))
+        if data.partial:
+            response_text += f"\n\n<i>{settings.SERVICE_PARTIAL_RESPONSE}</i>"
+        if progress is not None and await progress.finish() is not None:
+            return await progress.edit(response_text)
+        return await message.reply(response_text, parse_mode=ParseMode.HTML)
+
+    async def answer_transcription(
+        self, message: types.Message, data: TranscriptionData, progress: ProgressiveReply | None = None
+    ):
+        highlighted = self.format_transcription(data.transcription, data.summary)
+        if not highlighted.strip():
+            # Telegram refuses empty messages, and placeholder would be left as is
+            highlighted = settings.SERVICE_EMPTY_TRANSCRIPTION_RESPONSE
+        if data.partial:
+            highlighted += f"\n\n<i>{settings.SERVICE_PARTIAL_RESPONSE}</i>"
+        placeholder = await progress.finish() if progress is not None else None
         for msg_part in split_in_chunks(highlighted, 4096, ["\n\n", "\n", " "]):
+            if placeholder is not None:
+                # First part replaces progress message
+                await progress.edit(msg_part)  # type: ignore
+                placeholder = None
+                continue
             await message.reply(msg_part, parse_mode=ParseMode.HTML)
 
 
-def build_bot(bot_token, bot_core: BotCore, transcribe_command: str = "/transcribe") -> tuple[Bot, Dispatcher]:
+def build_bot(
+    bot_token,
+    bot_core: BotCore,
+    transcribe_command: str = "/transcribe",
+    progressive_replies: bool = False,
+    dictionary_reloader: DictionaryReloader | None = None,
+    reload_dictionary_command: str = "/reload_dictionary",
+    admin_ids: list[int] | None = None,
+) -> tuple[Bot, Dispatcher]:
     bot = Bot(token=bot_token)
     dp = Dispatcher()
-    views = TelegramViews(bot_core, bot)
+    views = TelegramViews(
+        bot_core, bot, progressive_replies=progressive_replies, dictionary_reloader=dictionary_reloader
+    )
+
+    if dictionary_reloader is not None and admin_ids:
+        dp.message(F.text.startswith(reload_dictionary_command) & F.from_user.id.in_(admin_ids))(
+            views.handle_reload_dictionary
+        )
 
     dp.message(F.voice.is_not(None))(views.handle_voice)
     dp.message(F.video_note.is_not(None))(views.handle_video_note)
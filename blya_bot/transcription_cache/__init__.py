@@ -1,5 +1,13 @@
+from .fingerprint import FingerprintTranscriptionCache, audio_fingerprint
 from .interface import BaseTranscriptionCache, NullTranscriptionCache
 from .memory_cache import InMemoryTranscriptionCache
 from .sqlite_cache import SqliteTranscriptionCache
 
-__all__ = ["BaseTranscriptionCache", "NullTranscriptionCache", "InMemoryTranscriptionCache", "SqliteTranscriptionCache"]
+__all__ = [
+    "BaseTranscriptionCache",
+    "FingerprintTranscriptionCache",
+    "NullTranscriptionCache",
+    "InMemoryTranscriptionCache",
+    "SqliteTranscriptionCache",
+    "audio_fingerprint",
+]
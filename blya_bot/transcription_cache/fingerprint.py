@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import structlog
+
+from blya_bot.models import TranscriptionData
+
+from .interface import BaseTranscriptionCache
+
+logger = structlog.getLogger(__name__)
+
+KEY_PREFIX = "fingerprint:"
+
+FRAME_SIZE = 4096
+FRAME_HOP = 2048
+# 33 log-spaced band edges give 32 energy differences, so every frame is described by one 32-bit word
+BANDS = 33
+MIN_FREQ = 300.0
+MAX_FREQ = 3000.0
+# Fingerprints of too short audio (about 1 sec.) are compared only by exact hash, similarity is not reliable there
+MIN_SIMILARITY_FRAMES = 8
+# Same audio gives the same amount of frames, give or take container padding
+MAX_LENGTH_DIFF = 2
+
+
+def audio_fingerprint(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Robust audio hash: one 32-bit word per frame.
+
+    Every bit is a sign of energy difference between adjacent spectral bands, compared to the previous frame.
+    Signs of such differences survive re-encoding, resampling and volume changes.
+    """
+    frames_count = 1 + (len(audio) - FRAME_SIZE) // FRAME_HOP
+    if frames_count < 2:
+        return np.zeros(0, dtype=np.uint32)
+
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME_SIZE)[::FRAME_HOP][:frames_count]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1 / sample_rate)
+    edges = np.searchsorted(freqs, np.geomspace(MIN_FREQ, MAX_FREQ, BANDS + 1))
+    energy = np.add.reduceat(spectrum, edges[:-1], axis=1)[:, :BANDS]
+
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    return np.packbits(bits, axis=1, bitorder="little").view(np.uint32).ravel()
+
+
+def bit_error_rates(known: np.ndarray, fingerprint: np.ndarray, max_shift: int = 2) -> np.ndarray:
+    """Bit error rate of every row of "known" (fingerprints of the same length), compared to given fingerprint"""
+    # Re-encoded audio may be shifted by a few frames (encoder delay, container padding)
+    best = np.ones(len(known))
+    for shift in range(-max_shift, max_shift + 1):
+        x, y = (known[:, shift:], fingerprint) if shift >= 0 else (known, fingerprint[-shift:])
+        size = min(x.shape[1], len(y))
+        if size == 0:
+            continue
+        diff = np.bitwise_xor(x[:, :size], y[:size])
+        errors = np.unpackbits(diff.view(np.uint8), axis=1).sum(axis=1)
+        best = np.minimum(best, errors / (size * 32))
+    return best
+
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray, max_shift: int = 2) -> float:
+    return float(bit_error_rates(a[np.newaxis], b, max_shift)[0])
+
+
+class FingerprintTranscriptionCache:
+    """
+    Transcription cache, keyed by content of decoded audio, stored in the regular transcription cache.
+
+    Exactly the same audio is found by fingerprint hash even after restart. Re-encoded audio gives slightly
+    different fingerprint, so recent fingerprints are also kept in memory and matched by bit error rate.
+    Only fingerprints of about the same length are compared, the comparison runs in executor.
+    """
+
+    def __init__(
+        self,
+        cache: BaseTranscriptionCache,
+        sample_rate: int,
+        max_bit_error_rate: float = 0.25,
+        max_index_size: int = 10_000,
+    ) -> None:
+        self.cache = cache
+        self.sample_rate = sample_rate
+        self.max_bit_error_rate = max_bit_error_rate
+        self.max_index_size = max_index_size
+        self._index: OrderedDict[str, np.ndarray] = OrderedDict()
+        # The same fingerprints by length, most recently used last
+        self._by_length: dict[int, OrderedDict[str, np.ndarray]] = {}
+
+    async def fingerprint(self, audio: np.ndarray) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, audio_fingerprint, audio, self.sample_rate)
+
+    @staticmethod
+    def make_key(fingerprint: np.ndarray) -> str:
+        return KEY_PREFIX + hashlib.blake2b(fingerprint.tobytes(), digest_size=16).hexdigest()
+
+    def _add(self, key: str, fingerprint: np.ndarray) -> None:
+        self._index[key] = fingerprint
+        self._index.move_to_end(key)
+        bucket = self._by_length.setdefault(len(fingerprint), OrderedDict())
+        bucket[key] = fingerprint
+        bucket.move_to_end(key)
+        while len(self._index) > self.max_index_size:
+            self._forget(next(iter(self._index)))
+
+    def _forget(self, key: str) -> None:
+        fingerprint = self._index.pop(key, None)
+        if fingerprint is None:
+            return
+        bucket = self._by_length[len(fingerprint)]
+        del bucket[key]
+        if not bucket:
+            del self._by_length[len(fingerprint)]
+
+    def _candidates(self, fingerprint: np.ndarray) -> list[tuple[list[str], list[np.ndarray]]]:
+        """Keys and fingerprints of about the same length, by length, the closest length first"""
+        if len(fingerprint) < MIN_SIMILARITY_FRAMES:
+            return []
+        candidates = []
+        for diff in sorted(range(-MAX_LENGTH_DIFF, MAX_LENGTH_DIFF + 1), key=abs):
+            if bucket := self._by_length.get(len(fingerprint) + diff):
+                # Snapshot: index may be changed, while candidates are compared in executor
+                keys, fingerprints = zip(*reversed(bucket.items()))
+                candidates.append((list(keys), list(fingerprints)))
+        return candidates
+
+    def _find_similar(
+        self, fingerprint: np.ndarray, candidates: list[tuple[list[str], list[np.ndarray]]]
+    ) -> str | None:
+        for keys, fingerprints in candidates:
+            matches = np.flatnonzero(bit_error_rates(np.stack(fingerprints), fingerprint) <= self.max_bit_error_rate)
+            if len(matches):
+                # The most recently used one
+                return keys[matches[0]]
+        return None
+
+    async def get(self, fingerprint: np.ndarray, file_unique_id: str) -> TranscriptionData | None:
+        if len(fingerprint) == 0:
+            return None
+
+        key = self.make_key(fingerprint)
+        data = await self.cache.get(key)
+        if data is None and (candidates := self._candidates(fingerprint)):
+            # Thousands of fingerprints may be compared, event loop is not blocked meanwhile
+            loop = asyncio.get_running_loop()
+            similar_key = await loop.run_in_executor(None, self._find_similar, fingerprint, candidates)
+            if similar_key is not None:
+                data = await self.cache.get(similar_key)
+                if data is None:
+                    # Entry expired in underlying cache
+                    self._forget(similar_key)
+                elif (known := self._index.get(similar_key)) is not None:
+                    self._add(similar_key, known)
+        if data is None:
+            return None
+        return dataclasses.replace(data, file_unique_id=file_unique_id)
+
+    async def store(self, fingerprint: np.ndarray, transcription_data: TranscriptionData):
+        if len(fingerprint) == 0:
+            return
+
+        key = self.make_key(fingerprint)
+        await self.cache.store(key, dataclasses.replace(transcription_data, file_unique_id=key))
+        self._add(key, fingerprint)
@@ -83,7 +83,9 @@ class SqliteTranscriptionCache(BaseTranscriptionCache):
         async with self.conn.cursor() as cursor:
             await self._clean_expired_entries(cursor)
             # Store the new transcription data
+            # Entry is stored under given key, which may differ from file id (e.g. audio fingerprint)
+            _, *params = self._data_as_params(transcription_data)
             await cursor.execute(
-                "INSERT INTO transcription_cache VALUES (?, ?, ?, ?)", self._data_as_params(transcription_data)
+                "INSERT OR REPLACE INTO transcription_cache VALUES (?, ?, ?, ?)", (file_unique_id, *params)
             )
         await self.conn.commit()
@@ -1,3 +1,4 @@
+import os
 from collections import defaultdict, namedtuple
 from typing import Generator, Optional, Tuple
 
@@ -98,3 +99,10 @@ def split_in_chunks(
         offset, chunk = try_split(text)
         yield chunk
         text = text[offset:]
+
+
+def available_cpus() -> int:
+    # CPUs, current process may run on (may be limited by container or "taskset")
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
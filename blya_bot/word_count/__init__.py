@@ -1,5 +1,24 @@
+from typing import Type
+
 from . import utils
 from .achocorasik_counter import AhoCorasickWordCounter
 from .interface import BaseWordCounter
 
-__all__ = ["utils", "BaseWordCounter", "AhoCorasickWordCounter"]
+AVAILABLE_WORD_COUNTERS = {
+    "aho-corasick": AhoCorasickWordCounter,
+}
+
+
+def get_word_counter_by_name(name: str) -> Type[BaseWordCounter]:
+    if name not in AVAILABLE_WORD_COUNTERS:
+        raise Exception(f"Unknown word counter name {name!r}, available: {', '.join(AVAILABLE_WORD_COUNTERS)}")
+    return AVAILABLE_WORD_COUNTERS[name]
+
+
+__all__ = [
+    "utils",
+    "AVAILABLE_WORD_COUNTERS",
+    "BaseWordCounter",
+    "AhoCorasickWordCounter",
+    "get_word_counter_by_name",
+]
@@ -1,50 +1,64 @@
 from __future__ import annotations
 
+import logging
+from array import array
 from collections import Counter
-from operator import itemgetter
-from typing import Dict, List
 
 import structlog
 from ahocorasick_rs import AhoCorasick, Implementation, MatchKind
 
 from blya_bot.dictionary.entry import DictEntry
+from blya_bot.dictionary.store import DictionaryStore
 from blya_bot.models import TextSummary
 
 from .interface import BaseWordCounter
-from .utils import is_whitespace_or_symbol, normalize_text
+from .utils import is_whitespace_or_symbol, normalize_text, normalize_word
 
 logger = structlog.getLogger(__name__)
 
 
 class AhoCorasickWordCounter(BaseWordCounter):
-    def __init__(self, dictionary: list[DictEntry]) -> None:
+    def __init__(self, dictionary: DictionaryStore | list[DictEntry]) -> None:
+        self.dictionary = DictionaryStore.coerce(dictionary)
+        # Dictionary words are matched in normalized form, so forms different only in equal chars are the same pattern
+        patterns: dict[str, int] = {}
+        for idx, word in enumerate(self.dictionary.pattern_words()):
+            patterns.setdefault(normalize_word(word), idx)
         self.ac = AhoCorasick(
-            [e.word for e in dictionary],
+            list(patterns),
             matchkind=MatchKind.LeftmostLongest,
             implementation=Implementation.ContiguousNFA,
         )
-        self.dictionary = dictionary
+        # Dictionary word index and exact match flag of every automaton pattern
+        self.pattern_words = array("I", patterns.values())
+        self.exact_match = self.dictionary.exact_match()[self.pattern_words].tobytes()
 
     @classmethod
-    def from_dictionary(cls, dictionary: list[DictEntry]) -> AhoCorasickWordCounter:
+    def from_dictionary(cls, dictionary: DictionaryStore | list[DictEntry]) -> AhoCorasickWordCounter:
         return cls(dictionary)
 
     def calculate_summary(self, text) -> TextSummary:
         counter = Counter()
         markup: list[tuple[tuple[int, int], str]] = []
 
-        for word_idx, start, end in self.ac.find_matches_as_indexes(text.lower()):
-            entry = self.dictionary[word_idx]
-            word = text[start:end]
-
-            logger.debug(f"Word {word!r} detected, source: {entry.chain_str()!r}")
-            if entry.flags.exact_match:
-                if start != 0 and not is_whitespace_or_symbol(text[start - 1]):
+        normalized = normalize_text(text)
+        # Provenance of every match is looked up only if it's going to be logged
+        debug = logging.getLogger(__name__).isEnabledFor(logging.DEBUG)
+        for pattern_idx, start, end in self.ac.find_matches_as_indexes(normalized.text):
+            if self.exact_match[pattern_idx]:
+                if start != 0 and not is_whitespace_or_symbol(normalized.text[start - 1]):
                     continue
-                if end != len(text) and not is_whitespace_or_symbol(text[end]):
+                if end != len(normalized.text) and not is_whitespace_or_symbol(normalized.text[end]):
                     continue
 
-            counter[word] += 1
+            # Markup is reported in original text positions
+            start, end = normalized.original_span(start, end)
+            word = text[start:end]
+            if debug:
+                logger.debug(
+                    "Word detected", word=word, source=self.dictionary.provenance(self.pattern_words[pattern_idx])
+                )
+            counter[word.lower()] += 1
             markup.append(((start, end), word))
 
         return TextSummary(counter=counter, markup=markup)
@@ -4,13 +4,14 @@ from abc import abstractmethod
 from typing import Protocol
 
 from blya_bot.dictionary.entry import DictEntry
+from blya_bot.dictionary.store import DictionaryStore
 from blya_bot.models import TextSummary
 
 
 class BaseWordCounter(Protocol):
     @classmethod
     @abstractmethod
-    def from_dictionary(cls, dictionary: list[DictEntry]) -> "BaseWordCounter":
+    def from_dictionary(cls, dictionary: DictionaryStore | list[DictEntry]) -> "BaseWordCounter":
         pass
 
     @abstractmethod
@@ -1,10 +1,50 @@
+from __future__ import annotations
+
 import string
+from array import array
+from dataclasses import dataclass
+
+# Characters, considered equal in dictionary words and in text, are folded to the same one
+EQUAL_CHARS = (("ё", "е"), ("й", "и"))
+
+
+def fold_equal_chars(text: str) -> str:
+    # "str.replace" is an order of magnitude faster, than "str.translate" with non-ASCII table
+    for char, equal_char in EQUAL_CHARS:
+        text = text.replace(char, equal_char)
+    return text
+
+
+@dataclass(slots=True)
+class NormalizedText:
+    text: str
+    # Index of original char for every normalized char. Not set, if chars positions are the same (almost always).
+    offsets: array | None = None
+
+    def original_span(self, start: int, end: int) -> tuple[int, int]:
+        if self.offsets is None or start == end:
+            return start, end
+        return self.offsets[start], self.offsets[end - 1] + 1
+
+
+def normalize_text(text: str) -> NormalizedText:
+    """Lowercases text and folds equal chars, keeping positions of normalized chars in original text"""
+    normalized = fold_equal_chars(text.lower())
+    if len(normalized) == len(text):
+        # Lowercasing changed no text length, every char is mapped to a single one
+        return NormalizedText(normalized)
+
+    chars = []
+    offsets = array("I")
+    for idx, char in enumerate(text):
+        folded = fold_equal_chars(char.lower())
+        chars.append(folded)
+        offsets.extend([idx] * len(folded))
+    return NormalizedText("".join(chars), offsets)
 
 
-def normalize_text(text: str) -> str:
-    # return text.translate(str.maketrans("", "", string.punctuation)).lower().strip() \
-    # .replace("ё", "е").replace("й", "и")
-    return text.replace("ё", "е").replace("й", "и")
+def normalize_word(word: str) -> str:
+    return fold_equal_chars(word.lower())
 
 
 def count_words_total(text) -> int:
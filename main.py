@@ -1,4 +1,4 @@
 from blya_bot import main
 
-
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+
+# Settings are read on import of bot modules, and some of them are required: dummy values, unless set in environment
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:test")
+os.environ.setdefault("RECOGNITION_ENGINE", "vosk")
+os.environ.setdefault("RECOGNITION_ENGINE_OPTIONS", '{"model_path": "model"}')
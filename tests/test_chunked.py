@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from blya_bot.recognition.chunked import ChunkedSpeechRecognizer, SilenceSplitter
+from blya_bot.recognition.decoding import SAMPLE_RATE
+from blya_bot.recognition.interface import BaseSpeechRecognizer
+from blya_bot.recognition.vad import EnergyVad
+
+
+def make_audio(duration: float, speech: list[tuple[float, float]]) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    audio = rng.normal(0, 0.001, int(duration * SAMPLE_RATE)).astype(np.float32)
+    t = np.arange(len(audio)) / SAMPLE_RATE
+    for start, end in speech:
+        mask = (t >= start) & (t < end)
+        audio[mask] += 0.5 * np.sin(2 * np.pi * 220 * t[mask])
+    return audio
+
+
+def make_chunks(count: int) -> np.ndarray:
+    # Loud audio without pauses, one second of the same level per chunk, so chunk is known by its samples
+    return np.repeat(1.0 + 0.01 * np.arange(count, dtype=np.float32), SAMPLE_RATE)
+
+
+def chunk_index(chunk: np.ndarray) -> int:
+    return round((float(chunk[0]) - 1.0) * 100)
+
+
+def make_splitter(max_chunk_duration: float = 1.0, min_chunk_duration: float = 0.5) -> SilenceSplitter:
+    return SilenceSplitter(
+        EnergyVad(min_silence_ms=300, padding_ms=0),
+        max_chunk_duration=max_chunk_duration,
+        min_chunk_duration=min_chunk_duration,
+    )
+
+
+class FakeRecognizer(BaseSpeechRecognizer):
+    def __init__(self, delays: dict[int, float] | None = None, fail: int | None = None) -> None:
+        self.delays = delays or {}
+        self.fail = fail
+        self.running = 0
+        self.max_running = 0
+        self.cancelled: list[int] = []
+
+    @classmethod
+    def from_options(cls, **options) -> FakeRecognizer:
+        return cls()
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        idx = chunk_index(audio)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delays.get(idx, 0.0))
+            if idx == self.fail:
+                raise RuntimeError(f"Chunk {idx} failed")
+            return f" w{idx} "
+        except asyncio.CancelledError:
+            self.cancelled.append(idx)
+            raise
+        finally:
+            self.running -= 1
+
+
+def test_short_audio_is_not_split():
+    assert make_splitter().cut_points(make_audio(1.0, [(0.0, 1.0)])) == []
+
+
+def test_latest_pause_is_cut():
+    splitter = make_splitter(max_chunk_duration=3.0, min_chunk_duration=1.0)
+    # Pauses at 0.5 (too early), 1.5 and 2.5 - the latest one gives the longest chunk
+    audio = make_audio(5.0, [(0.0, 0.3), (0.7, 1.3), (1.7, 2.3), (2.7, 5.0)])
+    points = splitter.cut_points(audio)
+    assert [point / SAMPLE_RATE for point in points] == [pytest.approx(2.5, abs=0.031)]
+    assert [len(chunk) for chunk in splitter.split(audio)] == [points[0], len(audio) - points[0]]
+
+
+def test_pauses_before_min_chunk_are_skipped():
+    splitter = make_splitter(max_chunk_duration=3.0, min_chunk_duration=1.0)
+    audio = make_audio(4.0, [(0.0, 0.3), (0.7, 4.0)])
+    # The only pause is too early, audio is cut at max chunk length
+    assert splitter.cut_points(audio) == [3 * SAMPLE_RATE]
+
+
+def test_hard_cut_without_pauses():
+    splitter = make_splitter(max_chunk_duration=1.0)
+    audio = make_chunks(3)[: int(2.5 * SAMPLE_RATE)]
+    assert splitter.cut_points(audio) == [SAMPLE_RATE, 2 * SAMPLE_RATE]
+
+
+def test_invalid_chunk_durations():
+    with pytest.raises(ValueError, match="Minimal chunk duration"):
+        make_splitter(max_chunk_duration=1.0, min_chunk_duration=2.0)
+
+
+@pytest.mark.asyncio
+async def test_texts_are_joined_in_original_order():
+    # Earlier chunks finish later
+    recognizer = FakeRecognizer(delays={0: 0.03, 1: 0.02, 2: 0.01})
+    chunked = ChunkedSpeechRecognizer(recognizer, make_splitter(), parallelism=4, min_duration=0.0)
+    audio = make_chunks(4)
+    assert await chunked.recognize(audio) == "w0 w1 w2 w3"
+    assert recognizer.max_running == 4
+
+    parts = [part async for part in chunked.recognize_iter(audio)]
+    assert parts == ["w0", " w1", " w2", " w3"]
+    # Parts are equal to the whole text, as interface requires
+    assert "".join(parts) == await chunked.recognize(audio)
+
+
+@pytest.mark.asyncio
+async def test_parallelism_limit():
+    recognizer = FakeRecognizer(delays={idx: 0.01 for idx in range(5)})
+    chunked = ChunkedSpeechRecognizer(recognizer, make_splitter(), parallelism=2, min_duration=0.0)
+    assert await chunked.recognize(make_chunks(5)) == "w0 w1 w2 w3 w4"
+    assert recognizer.max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_short_audio_is_recognized_as_is():
+    recognizer = FakeRecognizer()
+    chunked = ChunkedSpeechRecognizer(recognizer, make_splitter(), min_duration=10.0)
+    assert await chunked.recognize(make_chunks(3)) == " w0 "
+    assert [part async for part in chunked.recognize_iter(make_chunks(3))] == [" w0 "]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("iterate", [False, True])
+async def test_other_chunks_are_cancelled_on_error(iterate):
+    recognizer = FakeRecognizer(delays={0: 0.01, 2: 10.0, 3: 10.0}, fail=0)
+    chunked = ChunkedSpeechRecognizer(recognizer, make_splitter(), parallelism=4, min_duration=0.0)
+    with pytest.raises(RuntimeError, match="Chunk 0 failed"):
+        if iterate:
+            async for _ in chunked.recognize_iter(make_chunks(4)):
+                pass
+        else:
+            await chunked.recognize(make_chunks(4))
+    assert sorted(recognizer.cancelled) == [2, 3]
+    assert recognizer.running == 0
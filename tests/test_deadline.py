@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+from time import monotonic
+from typing import AsyncIterator, BinaryIO
+
+import numpy as np
+import pytest
+
+from blya_bot.core import bot_core
+from blya_bot.core.bot_core import BotCore
+from blya_bot.dictionary.entry import DictEntry, DictEntryFlags
+from blya_bot.recognition.chunked import ChunkedSpeechRecognizer, SilenceSplitter
+from blya_bot.recognition.decoding import SAMPLE_RATE
+from blya_bot.recognition.interface import BaseSpeechRecognizer, RecognitionContext, recognition_context
+from blya_bot.recognition.vad import EnergyVad
+from blya_bot.transcription_cache.memory_cache import InMemoryTranscriptionCache
+from blya_bot.word_count import AhoCorasickWordCounter
+
+
+class FakeMedia:
+    file_unique_id = "file"
+    streamable = True
+
+    def __init__(self, chunks: int = 10) -> None:
+        self.chunks = chunks
+
+    async def download(self, destination: BinaryIO) -> None:
+        raise NotImplementedError
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        for _ in range(self.chunks):
+            yield b"\0" * 1024
+
+
+class FakeStreamingRecognizer(BaseSpeechRecognizer):
+    """Recognizes every downloaded chunk as a word, taking "delay" seconds per chunk"""
+
+    def __init__(self, delay: float, honor_deadline: bool = True) -> None:
+        self.delay = delay
+        self.honor_deadline = honor_deadline
+
+    @classmethod
+    def from_options(cls, **options) -> FakeStreamingRecognizer:
+        return cls(**options)
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        raise NotImplementedError
+
+    @property
+    def supports_streaming(self) -> bool:
+        return True
+
+    async def recognize_stream(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        context = recognition_context.get()
+        async for _ in chunks:
+            if self.honor_deadline and context is not None and context.expired():
+                context.partial = True
+                return
+            await asyncio.sleep(self.delay)
+            yield "бля "
+
+
+def make_core(recognizer: BaseSpeechRecognizer, timeout: float) -> BotCore:
+    dictionary = [DictEntry(word="бля", flags=DictEntryFlags(morphing=False))]
+    return BotCore(
+        recognizer,
+        AhoCorasickWordCounter(dictionary),
+        cache=InMemoryTranscriptionCache(),
+        timeout=timeout,
+    )
+
+
+@pytest.mark.asyncio
+async def test_without_deadline_whole_text_is_recognized():
+    core = make_core(FakeStreamingRecognizer(delay=0.0), timeout=0.0)
+    data = await core.transcribe_and_summarize(FakeMedia())
+    assert not data.partial
+    assert data.transcription == "бля " * 10
+    assert await core.cache.get("file") is not None  # type: ignore[union-attr]
+
+
+@pytest.mark.asyncio
+async def test_engine_stops_at_deadline():
+    core = make_core(FakeStreamingRecognizer(delay=0.02), timeout=0.05)
+    data = await core.transcribe_and_summarize(FakeMedia())
+    assert data.partial
+    # Text recognized before deadline is kept, and counted
+    assert 0 < len(data.transcription) < len("бля " * 10)
+    assert sum(data.summary.counter.values()) == data.transcription.count("бля")
+    # Partial transcription is not cached
+    assert await core.cache.get("file") is None  # type: ignore[union-attr]
+
+
+@pytest.mark.asyncio
+async def test_engine_ignoring_deadline_is_cancelled(monkeypatch):
+    monkeypatch.setattr(bot_core, "DEADLINE_GRACE", 0.05)
+    core = make_core(FakeStreamingRecognizer(delay=0.03, honor_deadline=False), timeout=0.05)
+    progress: list[str] = []
+
+    async def on_progress(text: str) -> None:
+        progress.append(text)
+
+    start_time = monotonic()
+    data = await core.transcribe_and_summarize(FakeMedia(chunks=30), on_progress=on_progress)
+    # Engine would take about 0.9 sec., it's cancelled after deadline and grace time
+    assert monotonic() - start_time < 0.5
+    assert data.partial
+    assert data.transcription == progress[-1]
+    assert 0 < len(data.transcription) < len("бля " * 30)
+
+
+class FakeChunkRecognizer(BaseSpeechRecognizer):
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.recognized = 0
+
+    @classmethod
+    def from_options(cls, **options) -> FakeChunkRecognizer:
+        return cls(**options)
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        await asyncio.sleep(self.delay)
+        self.recognized += 1
+        return "бля"
+
+
+def make_chunked(recognizer: BaseSpeechRecognizer) -> ChunkedSpeechRecognizer:
+    splitter = SilenceSplitter(EnergyVad(padding_ms=0), max_chunk_duration=1.0, min_chunk_duration=0.5)
+    return ChunkedSpeechRecognizer(recognizer, splitter, parallelism=1, min_duration=0.0)
+
+
+@pytest.mark.asyncio
+async def test_chunks_after_deadline_are_skipped():
+    recognizer = FakeChunkRecognizer(delay=0.2)
+    context = RecognitionContext(deadline=monotonic() + 0.1)
+    token = recognition_context.set(context)
+    try:
+        # The first chunk is started before deadline, the rest are not
+        text = await make_chunked(recognizer).recognize(np.ones(4 * SAMPLE_RATE, dtype=np.float32))
+    finally:
+        recognition_context.reset(token)
+    assert text == "бля"
+    assert recognizer.recognized == 1
+    assert context.partial
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_skips_everything():
+    recognizer = FakeChunkRecognizer(delay=0.0)
+    context = RecognitionContext(deadline=monotonic() - 1.0)
+    token = recognition_context.set(context)
+    try:
+        parts = [part async for part in make_chunked(recognizer).recognize_iter(np.ones(3 * SAMPLE_RATE))]
+    finally:
+        recognition_context.reset(token)
+    assert parts == []
+    assert recognizer.recognized == 0
+    assert context.partial
@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from blya_bot.dictionary.compiled import read_artifact, read_header, write_artifact
+from blya_bot.dictionary.entry import DictEntry, DictEntryFlags
+from blya_bot.dictionary.store import DictionaryStore
+
+
+def make_dictionary() -> list[DictEntry]:
+    root = DictEntry(word="[вы]блядок", flags=DictEntryFlags())
+    variant = DictEntry(word="выблядок", flags=root.flags, parent=root)
+    substring = DictEntryFlags(morphing=False, exact_match=False)
+    return [
+        DictEntry(word="блядок", flags=root.flags, parent=root),
+        variant,
+        DictEntry(word="выблядки", flags=root.flags, parent=variant),
+        DictEntry(word="бля", flags=substring),
+        # The same word of another entry
+        DictEntry(word="выблядок", flags=substring),
+    ]
+
+
+def chains(dictionary: list[DictEntry]) -> list[tuple[str, DictEntryFlags]]:
+    return [(entry.chain_str(), entry.flags) for entry in dictionary]
+
+
+def test_entries_roundtrip():
+    dictionary = make_dictionary()
+    store = DictionaryStore.from_entries(dictionary)
+    assert len(store) == 5
+    # Shared root is stored once, every distinct word is stored once
+    assert store.entries == 6
+    assert len(store.offsets) - 1 == 5
+    assert store.pattern_words() == [entry.word for entry in dictionary]
+    assert [store.word(idx) for idx in range(len(store))] == [entry.word for entry in dictionary]
+    assert chains(store.to_entries()) == chains(dictionary)
+
+
+def test_parents_precede_children():
+    store = DictionaryStore.from_entries(make_dictionary())
+    assert all(parent < idx for idx, parent in enumerate(store.parents.tolist()))
+    entries = store.to_entries()
+    assert entries[2].parent is entries[1]
+    assert entries[0].parent is entries[1].parent
+
+
+def test_exact_match_and_provenance():
+    store = DictionaryStore.from_entries(make_dictionary())
+    assert store.exact_match().tolist() == [True, True, True, False, False]
+    assert str(store.provenance(2)) == "[вы]блядок -> выблядок -> выблядки"
+    assert str(store.provenance(3)) == "бля"
+    assert repr(store.provenance(0)) == repr("[вы]блядок -> блядок")
+
+
+def test_coerce():
+    store = DictionaryStore.from_entries(make_dictionary())
+    assert DictionaryStore.coerce(store) is store
+    assert DictionaryStore.coerce(make_dictionary()).pattern_words() == store.pattern_words()
+
+
+def test_empty_dictionary():
+    store = DictionaryStore.from_entries([])
+    assert len(store) == 0
+    assert store.pattern_words() == []
+    assert store.to_entries() == []
+
+
+def test_artifact_roundtrip(tmp_path: Path):
+    store = DictionaryStore.from_entries(make_dictionary())
+    path = tmp_path / "words.compiled"
+    header = write_artifact(path, store, "digest", "1.0")
+    assert read_header(path) == header
+
+    loaded = read_artifact(path)
+    for name in ("offsets", "words", "word_ids", "flags", "parents", "patterns"):
+        array = getattr(loaded, name)
+        assert array.dtype == getattr(store, name).dtype
+        assert np.array_equal(array, getattr(store, name)), name
+        # Arrays are read-only views of mapped file
+        assert not array.flags.writeable
+    assert chains(loaded.to_entries()) == chains(make_dictionary())
+    assert str(loaded.provenance(2)) == "[вы]блядок -> выблядок -> выблядки"
+
+
+def test_invalid_artifact(tmp_path: Path):
+    path = tmp_path / "words.compiled"
+    path.write_bytes(b"NOTADICT" + bytes(64))
+    assert read_header(path) is None
+    assert read_header(tmp_path / "missing.compiled") is None
+    with pytest.raises(ValueError, match="Not a compiled dictionary"):
+        read_artifact(path)
@@ -0,0 +1,136 @@
+import pickle
+import random
+from itertools import product
+from pathlib import Path
+from time import perf_counter
+
+import pytest
+
+from blya_bot.dictionary import DslError, DslFileDict, ExpansionBudget
+from blya_bot.dictionary.dsl_dict import GroupType, LiteralNode
+
+FIXTURE_DICTIONARY = Path(__file__).parent.parent / "fixtures" / "bad_words.txt"
+
+
+def eager_generate(nodes) -> list[str]:
+    # Reference expansion: every combination is materialized, group by group
+    results = [""]
+    for node in nodes:
+        if isinstance(node, LiteralNode):
+            results = [prefix + node.value for prefix in results]
+        else:
+            options = [word for option in node.options for word in eager_generate(option)]
+            if node.group_type == GroupType.OPTIONAL:
+                options.append("")
+            results = ["".join(pair) for pair in product(results, options)]
+    return results
+
+
+def write_dictionary(tmp_path: Path, *lines: str) -> Path:
+    path = tmp_path / "words.txt"
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("he[llo|ll]", ["hello", "hell", "he"]),
+        ("he{llo|ll}", ["hello", "hell"]),
+        ("bad[ass]", ["badass", "bad"]),
+        ("{{h|b}el|al}l", ["hell", "bell", "all"]),
+        ("{[g]r|s}oup", ["group", "roup", "soup"]),
+        ("[{a|b}c]d", ["acd", "bcd", "d"]),
+        ("[a|a]b", ["ab", "b"]),
+    ],
+)
+def test_expand(line, expected):
+    assert list(DslFileDict().expand(line)) == expected
+
+
+def test_expansion_is_the_same_as_eager_one():
+    dsl = DslFileDict()
+    lines = [line.strip() for line in FIXTURE_DICTIONARY.read_text(encoding="utf-8").splitlines()]
+    lines = [line.replace("!", "").replace("~", "").replace("^", "") for line in lines if line and line[0] != "#"]
+    rnd = random.Random(0)
+    for _ in range(300):
+        # Random nested groups
+        line = ""
+        for _ in range(rnd.randint(1, 6)):
+            line += rnd.choice(["a", "b", "ab", "[", "{", "|", "]", "}"])
+        lines.append(line)
+
+    for line in lines:
+        try:
+            nodes = dsl.parse(line)
+        except ValueError:
+            continue
+        assert list(dict.fromkeys(dsl.generate(nodes))) == list(dict.fromkeys(eager_generate(nodes))), line
+
+
+def test_combinations_are_counted_with_duplicates():
+    dsl = DslFileDict()
+    combinations = dsl.generate(dsl.parse("[a][a][a]"))
+    assert combinations.size == 8
+    assert set(combinations) == {"aaa", "aa", "a", ""}
+
+
+def test_line_budget_counts_combinations_before_expansion(tmp_path):
+    # 4M combinations of only 23 distinct words
+    path = write_dictionary(tmp_path, "word", "[a]" * 22)
+    dsl = DslFileDict(budget=ExpansionBudget(max_line_expansions=10_000))
+    start_time = perf_counter()
+    with pytest.raises(DslError) as exc_info:
+        dsl.load(path)
+    assert perf_counter() - start_time < 1.0
+    assert exc_info.value.line_number == 2
+    assert "10000 combinations" in str(exc_info.value)
+
+
+def test_group_budget(tmp_path):
+    path = write_dictionary(tmp_path, "{" + "|".join(f"w{idx}" for idx in range(20)) + "}")
+    with pytest.raises(DslError, match="Line 1: Group expands to more than 10 variants"):
+        DslFileDict(budget=ExpansionBudget(max_line_expansions=10)).load(path)
+
+
+def test_file_budget(tmp_path):
+    path = write_dictionary(tmp_path, "[a|b]c", "# comment", "", "[a][a]", "d")
+    # 3 + 4 + 1 combinations
+    budget = ExpansionBudget(max_line_expansions=10, max_expansions=7)
+    with pytest.raises(DslError) as exc_info:
+        DslFileDict(budget=budget).load(path)
+    assert exc_info.value.line_number == 5
+    assert [entry.word for entry in DslFileDict(budget=ExpansionBudget(max_expansions=8)).load(path)] == [
+        "ac",
+        "bc",
+        "c",
+        "aa",
+        "a",
+        "",
+        "d",
+    ]
+
+
+def test_syntax_error_line_number(tmp_path):
+    path = write_dictionary(tmp_path, "# comment", "word", "he[llo")
+    with pytest.raises(DslError) as exc_info:
+        DslFileDict().load(path)
+    assert exc_info.value.line_number == 3
+    assert exc_info.value.line == "he[llo"
+    assert str(exc_info.value).startswith("Line 3: Unmatched '['")
+
+
+def test_error_is_pickled():
+    error = pickle.loads(pickle.dumps(DslError("expands to more than 10 combinations", 3, "[a][a]")))
+    assert isinstance(error, DslError)
+    assert (error.message, error.line_number, error.line) == ("expands to more than 10 combinations", 3, "[a][a]")
+    assert str(error) == "Line 3: expands to more than 10 combinations: '[a][a]'"
+
+
+def test_flags_and_parents(tmp_path):
+    path = write_dictionary(tmp_path, "^~he[llo]", "word")
+    hello, he, word = DslFileDict().load(path)
+    assert (hello.word, he.word, word.word) == ("hello", "he", "word")
+    assert not hello.flags.morphing and not hello.flags.exact_match
+    assert hello.parent is not None and hello.parent.word == "^~he[llo]"
+    assert word.parent is None and word.flags.morphing and word.flags.exact_match
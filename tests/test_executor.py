@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from blya_bot.recognition.executor import InferenceExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor("test", workers=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError, match="at least one worker"):
+        InferenceExecutor("test", workers=0)
+
+
+@pytest.mark.asyncio
+async def test_run_in_named_thread(executor):
+    name = await executor.run(lambda: threading.current_thread().name)
+    assert name.startswith("test-inference")
+    assert await executor.run(pow, 2, 10) == 1024
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="CPU affinity is supported only on Linux")
+@pytest.mark.asyncio
+async def test_cpu_affinity():
+    cpu = min(os.sched_getaffinity(0))
+    executor = InferenceExecutor("test", cpu_affinity=[cpu])
+    try:
+        assert await executor.run(os.sched_getaffinity, 0) == {cpu}
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_items_are_delivered_in_order(executor):
+    assert [item async for item in executor.iterate(lambda: range(1000), max_buffered=8)] == list(range(1000))
+
+
+@pytest.mark.asyncio
+async def test_producer_error_is_raised_after_items(executor):
+    def produce(emit):
+        emit(1)
+        emit(2)
+        raise RuntimeError("failed")
+
+    items = []
+    with pytest.raises(RuntimeError, match="failed"):
+        async for item in executor.stream(produce):
+            items.append(item)
+    assert items == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_producer_is_blocked_by_slow_consumer(executor):
+    produced = []
+
+    def produce(emit):
+        for item in range(10):
+            produced.append(item)
+            emit(item)
+
+    stream = executor.stream(produce, max_buffered=2)
+    assert await stream.__anext__() == 0
+    await asyncio.sleep(0.1)
+    # Batch taken by consumer, two buffered items, and the one producer is blocked on
+    assert len(produced) <= 5
+    assert [item async for item in stream] == list(range(1, 10))
+
+
+@pytest.mark.asyncio
+async def test_early_exit_stops_producer(executor):
+    closed = threading.Event()
+
+    def make_iter():
+        try:
+            yield from range(1_000_000)
+        finally:
+            closed.set()
+
+    async for item in executor.iterate(make_iter, max_buffered=2):
+        if item == 3:
+            break
+    assert await asyncio.get_running_loop().run_in_executor(None, closed.wait, 5.0)
@@ -0,0 +1,139 @@
+import threading
+from collections import Counter
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+import pytest
+
+from blya_bot.models import TextSummary, TranscriptionData
+from blya_bot.recognition.decoding import SAMPLE_RATE
+from blya_bot.transcription_cache import fingerprint as fingerprint_module
+from blya_bot.transcription_cache.fingerprint import (
+    FRAME_HOP,
+    FRAME_SIZE,
+    FingerprintTranscriptionCache,
+    audio_fingerprint,
+    bit_error_rate,
+)
+from blya_bot.transcription_cache.memory_cache import InMemoryTranscriptionCache
+
+
+def make_audio(seed: int, duration: float = 3.0) -> np.ndarray:
+    # Noise with changing spectrum, so every frame has its own fingerprint
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = np.zeros_like(t)
+    for _ in range(8):
+        audio += rng.uniform(0.05, 0.2) * np.sin(2 * np.pi * rng.uniform(300, 3000) * t * (1 + 0.1 * t))
+    return (audio + rng.normal(0, 0.01, len(t))).astype(np.float32)
+
+
+def make_transcription(text: str) -> TranscriptionData:
+    return TranscriptionData(
+        file_unique_id="original",
+        transcription=text,
+        summary=TextSummary(counter=Counter(), markup=[]),
+        date_processed=datetime(2024, 1, 1),
+    )
+
+
+def test_fingerprint_size():
+    audio = make_audio(0)
+    fingerprint = audio_fingerprint(audio, SAMPLE_RATE)
+    assert fingerprint.dtype == np.uint32
+    # One word per frame, except the first one, which has no previous frame to compare with
+    assert len(fingerprint) == (len(audio) - FRAME_SIZE) // FRAME_HOP
+    assert len(audio_fingerprint(audio[:FRAME_SIZE], SAMPLE_RATE)) == 0
+
+
+def test_fingerprint_survives_volume_change_and_noise():
+    audio = make_audio(0)
+    fingerprint = audio_fingerprint(audio, SAMPLE_RATE)
+    assert np.array_equal(audio_fingerprint(audio * 0.5, SAMPLE_RATE), fingerprint)
+
+    noisy = audio + np.random.default_rng(1).normal(0, 0.005, len(audio)).astype(np.float32)
+    assert bit_error_rate(fingerprint, audio_fingerprint(noisy, SAMPLE_RATE)) < 0.25
+    assert bit_error_rate(fingerprint, audio_fingerprint(make_audio(1), SAMPLE_RATE)) > 0.35
+
+
+def test_bit_error_rate_of_shifted_fingerprint():
+    fingerprint = audio_fingerprint(make_audio(0), SAMPLE_RATE)
+    assert bit_error_rate(fingerprint, fingerprint) == 0.0
+    assert bit_error_rate(fingerprint[2:], fingerprint) == 0.0
+    assert bit_error_rate(fingerprint, fingerprint[1:]) == 0.0
+    assert bit_error_rate(fingerprint[3:], fingerprint) > 0.0
+
+
+@pytest.mark.asyncio
+async def test_cache_finds_exact_and_similar_audio():
+    cache = FingerprintTranscriptionCache(InMemoryTranscriptionCache(), SAMPLE_RATE)
+    audio = make_audio(0)
+    await cache.store(await cache.fingerprint(audio), make_transcription("text"))
+
+    data = await cache.get(await cache.fingerprint(audio), "same")
+    assert data is not None and (data.transcription, data.file_unique_id) == ("text", "same")
+
+    noisy = audio + np.random.default_rng(1).normal(0, 0.005, len(audio)).astype(np.float32)
+    data = await cache.get(await cache.fingerprint(noisy), "noisy")
+    assert data is not None and (data.transcription, data.file_unique_id) == ("text", "noisy")
+
+    assert await cache.get(await cache.fingerprint(make_audio(1)), "other") is None
+
+
+@pytest.mark.asyncio
+async def test_cache_is_keyed_by_hash_after_restart():
+    underlying = InMemoryTranscriptionCache()
+    audio = make_audio(0)
+    first = FingerprintTranscriptionCache(underlying, SAMPLE_RATE)
+    await first.store(await first.fingerprint(audio), make_transcription("text"))
+
+    # Index of similar fingerprints is lost, the same audio is still found
+    second = FingerprintTranscriptionCache(underlying, SAMPLE_RATE)
+    data = await second.get(await second.fingerprint(audio), "same")
+    assert data is not None and data.transcription == "text"
+
+
+@pytest.mark.asyncio
+async def test_short_audio_and_index_size():
+    cache = FingerprintTranscriptionCache(InMemoryTranscriptionCache(), SAMPLE_RATE, max_index_size=2)
+    short = await cache.fingerprint(np.zeros(FRAME_SIZE, dtype=np.float32))
+    await cache.store(short, make_transcription("text"))
+    assert await cache.get(short, "short") is None
+
+    for seed in range(3):
+        await cache.store(await cache.fingerprint(make_audio(seed)), make_transcription(str(seed)))
+    assert len(cache._index) == 2
+    assert cache.make_key(await cache.fingerprint(make_audio(0))) not in cache._index
+
+
+@pytest.mark.asyncio
+async def test_similar_audio_is_found_in_full_index(monkeypatch):
+    cache = FingerprintTranscriptionCache(InMemoryTranscriptionCache(), SAMPLE_RATE)
+    audio = make_audio(0)
+    fingerprint = await cache.fingerprint(audio)
+    await cache.store(fingerprint, make_transcription("text"))
+    # Newer fingerprints, half of them of about the same length
+    rng = np.random.default_rng(0)
+    for idx in range(cache.max_index_size - 1):
+        length = len(fingerprint) + idx % 5 - 2 if idx % 2 else int(rng.integers(8, 300))
+        await cache.store(rng.integers(0, 2**32, length, dtype=np.uint32), make_transcription(str(idx)))
+    assert len(cache._index) == cache.max_index_size
+
+    threads = set()
+    original_bit_error_rates = fingerprint_module.bit_error_rates
+
+    def bit_error_rates(*args):
+        threads.add(threading.current_thread())
+        return original_bit_error_rates(*args)
+
+    monkeypatch.setattr(fingerprint_module, "bit_error_rates", bit_error_rates)
+
+    noisy = audio + np.random.default_rng(1).normal(0, 0.005, len(audio)).astype(np.float32)
+    start_time = perf_counter()
+    data = await cache.get(await cache.fingerprint(noisy), "noisy")
+    assert perf_counter() - start_time < 1.0
+    assert data is not None and data.transcription == "text"
+    # Fingerprints are compared out of event loop thread, a few lengths at a time
+    assert threads and threading.current_thread() not in threads
+    assert len(cache._candidates(fingerprint)) == 5
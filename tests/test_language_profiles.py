@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from blya_bot.core.language_profiles import ChatLanguageProfiles
+from blya_bot.recognition import RecognitionContext
+
+
+def detected(language: str, probability: float = 0.95) -> RecognitionContext:
+    return RecognitionContext(chat_id=1, detected_language=language, language_probability=probability)
+
+
+def pinned(language: str, avg_logprob: float = -0.2) -> RecognitionContext:
+    return RecognitionContext(chat_id=1, language=language, detected_language=language, avg_logprob=avg_logprob)
+
+
+@pytest.fixture
+def profiles(tmp_path):
+    profiles = ChatLanguageProfiles(tmp_path / "languages.json", pin_after=3, redetect_every=5)
+    profiles.saves = 0
+    dump = profiles._dump
+
+    def counting_dump(data: str) -> None:
+        profiles.saves += 1
+        dump(data)
+
+    profiles._dump = counting_dump
+    return profiles
+
+
+@pytest.mark.asyncio
+async def test_language_is_pinned_after_confident_detections(profiles):
+    for _ in range(2):
+        await profiles.observe(detected("ru"))
+        assert profiles.language_for(1) is None
+    await profiles.observe(detected("ru"))
+    assert profiles.language_for(1) == "ru"
+    assert profiles.language_for(2) is None
+
+
+@pytest.mark.asyncio
+async def test_unreliable_detection_resets_profile(profiles):
+    for _ in range(3):
+        await profiles.observe(detected("ru"))
+    await profiles.observe(detected("en", probability=0.3))
+    assert profiles.language_for(1) is None
+
+
+@pytest.mark.asyncio
+async def test_bad_recognition_with_pinned_language_unpins_it(profiles):
+    for _ in range(3):
+        await profiles.observe(detected("ru"))
+    await profiles.observe(pinned("ru", avg_logprob=-3.0))
+    assert profiles.language_for(1) is None
+
+
+@pytest.mark.asyncio
+async def test_language_is_redetected_periodically(profiles):
+    for _ in range(3):
+        await profiles.observe(detected("ru"))
+    for _ in range(5):
+        assert profiles.language_for(1) == "ru"
+        await profiles.observe(pinned("ru"))
+    assert profiles.language_for(1) is None
+    await profiles.observe(detected("ru"))
+    assert profiles.language_for(1) == "ru"
+
+
+@pytest.mark.asyncio
+async def test_profiles_are_saved_only_on_changes(profiles):
+    for _ in range(3):
+        await profiles.observe(detected("ru"))
+    # Language is learned on the first message, and pinned on the third one
+    assert profiles.saves == 2
+    for _ in range(5):
+        await profiles.observe(pinned("ru"))
+    # Unpinned by unreliable detection, then detected again, not pinned yet
+    await profiles.observe(detected("en", probability=0.3))
+    await profiles.observe(detected("ru"))
+    await profiles.observe(detected("ru"))
+    assert profiles.saves == 3
+
+    restored = ChatLanguageProfiles(profiles.path)
+    restored.load()
+    assert json.loads(profiles.path.read_text())["1"]["language"] == "ru"
+    assert restored.language_for(1) is None
@@ -0,0 +1,57 @@
+import pytest
+
+from blya_bot.dictionary import PyMorphyRuDictModifier
+from blya_bot.dictionary.entry import DictEntry, DictEntryFlags
+from blya_bot.dictionary.morph_modifier import WordFormsGenerator, make_morph_analyzer
+
+pytest.importorskip("pymorphy3")
+
+
+@pytest.fixture(scope="module")
+def morph():
+    return make_morph_analyzer()
+
+
+def make_dictionary() -> list[DictEntry]:
+    root = DictEntry(word="[вы]блядок", flags=DictEntryFlags())
+    return [
+        DictEntry(word="блядок", flags=root.flags, parent=root),
+        DictEntry(word="выблядок", flags=root.flags, parent=root),
+        DictEntry(word="шлюха", flags=DictEntryFlags()),
+        DictEntry(word="минет", flags=DictEntryFlags(morphing=False)),
+    ]
+
+
+def test_analyzer_is_loaded_only_for_in_process_morphing():
+    modifier = PyMorphyRuDictModifier(workers=2)
+    assert modifier.morph is None
+    assert modifier._workers_for(10) == 2
+    assert PyMorphyRuDictModifier(workers=0)._workers_for(100_000) == 0
+
+
+def test_word_forms(morph):
+    dictionary = PyMorphyRuDictModifier(morph).modify_dict(make_dictionary())
+    words = [entry.word for entry in dictionary]
+    assert {"шлюха", "шлюхи", "шлюхой", "выблядки", "блядки"} <= set(words)
+    assert words.count("минет") == 1 and "минета" not in words
+
+    forms = {entry.word: entry for entry in dictionary}
+    # Source entries are kept, forms are their children
+    assert forms["шлюха"].parent is None
+    assert forms["шлюхой"].parent is forms["шлюха"]
+    assert forms["выблядки"].parent.word == "выблядок"
+
+
+def test_lexemes_are_reused(morph):
+    generator = WordFormsGenerator(morph)
+    forms, lexemes, hits = generator.chunk_forms(["шлюха", "шлюхи", "шлюхой"])
+    # The word itself goes first, then forms of its lexemes
+    assert [word_forms[0] for word_forms in forms] == ["шлюха", "шлюхи", "шлюхой"]
+    assert set(forms[0]) == set(forms[1]) == set(forms[2])
+    assert lexemes > 0 and hits > 0
+
+
+def test_worker_processes_give_the_same_forms(morph):
+    in_process = PyMorphyRuDictModifier(morph).modify_dict(make_dictionary())
+    in_workers = PyMorphyRuDictModifier(workers=2).modify_dict(make_dictionary())
+    assert sorted(entry.word for entry in in_workers) == sorted(entry.word for entry in in_process)
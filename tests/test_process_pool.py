@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from blya_bot.recognition.interface import BaseSpeechRecognizer, RecognitionContext, recognition_context
+from blya_bot.recognition.process_pool import ProcessPoolSpeechRecognizer
+
+pytestmark = pytest.mark.skipif(sys.platform != "linux", reason="Requires 'fork' start method and /dev/shm")
+
+
+class FakeRecognizer(BaseSpeechRecognizer):
+    """Reports what it received, and the process it was run in"""
+
+    def __init__(self, language: str = "ru") -> None:
+        self.language = language
+
+    @classmethod
+    def from_options(cls, **options) -> FakeRecognizer:
+        return cls(**options)
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        context = recognition_context.get()
+        if context is not None:
+            context.detected_language = self.language
+            context.language_probability = 0.9
+        return f"{len(audio)} {float(audio.sum()):.1f} {self.language} {os.getpid()}"
+
+    def with_params(self, **params) -> FakeRecognizer:
+        return FakeRecognizer(**params)
+
+
+def shared_memory_segments() -> set[str]:
+    return {path.name for path in Path("/dev/shm").iterdir() if path.name.startswith("psm_")}
+
+
+@pytest.mark.asyncio
+async def test_recognition_in_workers():
+    segments = shared_memory_segments()
+    recognizer = ProcessPoolSpeechRecognizer(FakeRecognizer(), workers=2)
+    processes = list(recognizer.executor._processes.values())  # type: ignore[attr-defined]
+    try:
+        assert len(processes) == 2
+
+        audio = np.arange(1000, dtype=np.float64) / 1000
+        samples, total, language, pid = (await recognizer.recognize(audio)).split()
+        # Audio is passed through shared memory as float32
+        assert (int(samples), float(total), language) == (1000, 499.5, "ru")
+        assert int(pid) in {process.pid for process in processes}
+        assert int(pid) != os.getpid()
+
+        # Empty audio is passed as well
+        assert (await recognizer.recognize(np.zeros(0, dtype=np.float32))).split()[:2] == ["0", "0.0"]
+    finally:
+        await recognizer.teardown()
+
+    assert not any(process.is_alive() for process in processes)
+    assert shared_memory_segments() == segments
+
+
+@pytest.mark.asyncio
+async def test_context_is_propagated_back():
+    recognizer = ProcessPoolSpeechRecognizer(FakeRecognizer(), workers=1)
+    try:
+        context = RecognitionContext(chat_id=1, duration=1.0)
+        token = recognition_context.set(context)
+        try:
+            await recognizer.recognize(np.zeros(100, dtype=np.float32))
+        finally:
+            recognition_context.reset(token)
+        # Engine reported results to its copy of context in worker
+        assert (context.detected_language, context.language_probability) == ("ru", 0.9)
+        assert (context.chat_id, context.duration) == (1, 1.0)
+
+        # Without context nothing is reported
+        assert (await recognizer.recognize(np.zeros(100, dtype=np.float32))).split()[2] == "ru"
+    finally:
+        await recognizer.teardown()
+
+
+@pytest.mark.asyncio
+async def test_params_are_applied_in_workers():
+    recognizer = ProcessPoolSpeechRecognizer(FakeRecognizer(), workers=1)
+    try:
+        variant = recognizer.with_params(language="uk")
+        assert variant.executor is recognizer.executor
+        assert (await variant.recognize(np.zeros(10, dtype=np.float32))).split()[2] == "uk"
+        assert (await recognizer.recognize(np.zeros(10, dtype=np.float32))).split()[2] == "ru"
+    finally:
+        await recognizer.teardown()
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError, match="at least one worker"):
+        ProcessPoolSpeechRecognizer(FakeRecognizer(), workers=0)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from blya_bot.recognition.interface import BaseSpeechRecognizer, RecognitionContext
+from blya_bot.recognition.router import RoutingSpeechRecognizer
+
+
+class FakeRecognizer(BaseSpeechRecognizer):
+    def __init__(self, name: str, **params) -> None:
+        self.name = name
+        self.params = params
+        self.warmed_up = False
+
+    @classmethod
+    def from_options(cls, **options) -> FakeRecognizer:
+        return cls(**options)
+
+    async def recognize(self, audio: np.ndarray) -> str:
+        return self.name
+
+    async def warm_up(self, audio: np.ndarray) -> None:
+        self.warmed_up = True
+
+    def with_params(self, **params) -> FakeRecognizer:
+        return FakeRecognizer(self.name, **params) if params else self
+
+
+def make_router(**options) -> RoutingSpeechRecognizer:
+    engines = {"large": FakeRecognizer("large"), "small": FakeRecognizer("small")}
+    return RoutingSpeechRecognizer.from_engines(engines, **options)
+
+
+def test_first_matching_route_is_used():
+    router = make_router(
+        routes=[
+            {"engine": "large", "max_duration": 30, "max_queue_depth": 2},
+            {"engine": "large", "params": {"beam_size": 1}, "max_duration": 60},
+            "small",
+        ]
+    )
+    assert router.route(RecognitionContext(duration=10)).name == "large"
+    assert router.route(RecognitionContext(duration=10)).params == {}
+    # Under load the fast decoding of the same model is used
+    assert router.route(RecognitionContext(duration=10, queue_depth=3)).params == {"beam_size": 1}
+    assert router.route(RecognitionContext(duration=45)).params == {"beam_size": 1}
+    assert router.route(RecognitionContext(duration=90)).name == "small"
+
+
+def test_last_route_is_used_if_nothing_matches():
+    router = make_router(routes=[{"engine": "large", "max_duration": 30}, {"engine": "small", "max_duration": 60}])
+    assert router.select(RecognitionContext(duration=120)).engine == "small"
+
+
+def test_chat_routes():
+    router = make_router(routes=["large"], chats={"-100": "small", "42": [{"engine": "small", "max_duration": 5}]})
+    assert router.route(RecognitionContext(chat_id=-100, duration=100)).name == "small"
+    assert router.route(RecognitionContext(chat_id=42, duration=1)).name == "small"
+    assert router.route(RecognitionContext(chat_id=1, duration=1)).name == "large"
+    assert router.route(RecognitionContext()).name == "large"
+
+
+def test_recognizers_share_engines():
+    router = make_router(routes=["large", {"engine": "large", "params": {"beam_size": 1}}, "small"])
+    assert router.routes[0].recognizer is router.engines["large"]
+    assert router.routes[1].recognizer is not router.engines["large"]
+    assert router.routes[2].recognizer is router.engines["small"]
+
+
+@pytest.mark.parametrize(
+    "routes, message",
+    [
+        ([], "At least one recognition route required"),
+        (["medium"], "Unknown engine 'medium'"),
+    ],
+)
+def test_invalid_routes(routes, message):
+    with pytest.raises(ValueError, match=message):
+        make_router(routes=routes)
+
+
+def test_unknown_engine_in_chat_routes():
+    with pytest.raises(ValueError, match="Unknown engine 'medium'"):
+        make_router(routes=["large"], chats={"1": "medium"})
+
+
+@pytest.mark.asyncio
+async def test_recognize_without_context_and_warm_up():
+    router = make_router(routes=[{"engine": "large", "max_duration": 30}, "small"])
+    audio = np.zeros(16000, dtype=np.float32)
+    assert await router.recognize(audio) == "large"
+    assert [part async for part in router.recognize_iter(audio)] == ["large"]
+    await router.warm_up(audio)
+    assert all(engine.warmed_up for engine in router.engines.values())
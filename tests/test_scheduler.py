@@ -0,0 +1,99 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from blya_bot.core.scheduler import InferenceScheduler, Priority, SchedulerOverloaded
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="")
+
+
+async def _submit_many(scheduler: InferenceScheduler, jobs: list[tuple[str, Priority]], started: list[str]):
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    def job(name: str):
+        async def run():
+            started.append(name)
+
+        return run
+
+    # First job occupies the only slot, so the rest are queued and ordered by scheduler
+    tasks = [asyncio.create_task(scheduler.submit(blocker, flow="blocker"))]
+    await asyncio.sleep(0)
+    for name, priority in jobs:
+        tasks.append(asyncio.create_task(scheduler.submit(job(name), flow=name[0], priority=priority)))
+        await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_busy_flow_does_not_starve_others():
+    scheduler = InferenceScheduler(concurrency=1)
+    started: list[str] = []
+    await _submit_many(scheduler, [("a1", Priority.NORMAL), ("a2", Priority.NORMAL), ("b1", Priority.NORMAL)], started)
+    assert started == ["a1", "b1", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_high_priority_goes_first():
+    scheduler = InferenceScheduler(concurrency=1)
+    started: list[str] = []
+    await _submit_many(scheduler, [("a1", Priority.NORMAL), ("b1", Priority.HIGH)], started)
+    assert started == ["b1", "a1"]
+
+
+@pytest.mark.asyncio
+async def test_queue_depth_is_bounded():
+    scheduler = InferenceScheduler(concurrency=1, max_queue_depth=1)
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    running = asyncio.create_task(scheduler.submit(blocker))
+    queued = asyncio.create_task(scheduler.submit(blocker))
+    await asyncio.sleep(0)
+    with pytest.raises(SchedulerOverloaded) as exc_info:
+        await scheduler.submit(blocker)
+    assert exc_info.value.reason == "queue_depth"
+    gate.set()
+    await asyncio.gather(running, queued)
+    assert scheduler.running == 0 and scheduler.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_job_exception_is_raised_to_submitter():
+    scheduler = InferenceScheduler()
+
+    async def fail():
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError, match="failed"):
+        await scheduler.submit(fail)
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_submitter_context():
+    scheduler = InferenceScheduler(concurrency=1)
+    gate = asyncio.Event()
+    seen: list[str] = []
+
+    async def job():
+        await gate.wait()
+        seen.append(request_id.get())
+
+    async def submit(value: str):
+        request_id.set(value)
+        await scheduler.submit(job, flow=value)
+
+    # Queued jobs are dispatched after the first one is finished, from its task
+    tasks = [asyncio.create_task(submit(value)) for value in ("first", "second", "third")]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert seen == ["first", "second", "third"]
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from blya_bot.core.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_deduplicated():
+    single_flight: SingleFlight[str] = SingleFlight()
+    calls = 0
+    gate = asyncio.Event()
+
+    async def transcribe():
+        nonlocal calls
+        calls += 1
+        await gate.wait()
+        return "text"
+
+    tasks = [asyncio.create_task(single_flight.do("file", transcribe)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert len(single_flight) == 1
+    gate.set()
+    assert await asyncio.gather(*tasks) == ["text"] * 3
+    assert calls == 1
+    assert len(single_flight) == 0
+
+    # Call is forgotten after it's finished
+    assert await single_flight.do("file", transcribe) == "text"
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_deduplicated():
+    single_flight: SingleFlight[str] = SingleFlight()
+
+    async def echo(value: str):
+        await asyncio.sleep(0)
+        return value
+
+    assert await asyncio.gather(single_flight.do("a", lambda: echo("a")), single_flight.do("b", lambda: echo("b"))) == [
+        "a",
+        "b",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_exception_is_raised_to_every_caller():
+    single_flight: SingleFlight[str] = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("failed")
+
+    results = await asyncio.gather(*(single_flight.do("file", fail) for _ in range(2)), return_exceptions=True)
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert len(single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    single_flight: SingleFlight[str] = SingleFlight()
+    gate = asyncio.Event()
+
+    async def transcribe():
+        await gate.wait()
+        return "text"
+
+    first = asyncio.create_task(single_flight.do("file", transcribe))
+    second = asyncio.create_task(single_flight.do("file", transcribe))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    gate.set()
+    assert await second == "text"
+    assert first.cancelled()
@@ -0,0 +1,106 @@
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from blya_bot import settings
+from blya_bot.models.models import TextSummary, TranscriptionData
+from blya_bot.telegram import ProgressiveReply, TelegramViews
+
+
+class FakeMessage:
+    def __init__(self) -> None:
+        self.replies: list[str] = []
+        self.edits: list[str] = []
+        self.from_user = None
+
+    async def reply(self, text: str, parse_mode=None) -> "FakeMessage":
+        if not text:
+            raise ValueError("Telegram refuses empty messages")
+        self.replies.append(text)
+        return FakeMessage()
+
+    async def edit_text(self, text: str, parse_mode=None) -> None:
+        if not text:
+            raise ValueError("Telegram refuses empty messages")
+        self.edits.append(text)
+
+
+def transcription(text: str) -> TranscriptionData:
+    return TranscriptionData(
+        file_unique_id="file",
+        transcription=text,
+        summary=TextSummary(counter=Counter(), markup=[]),
+        date_processed=datetime.now(),
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("text", ["", "   "])
+async def test_empty_transcription_replaces_placeholder(text):
+    message, placeholder = FakeMessage(), FakeMessage()
+    progress = ProgressiveReply(message, render=str)  # type: ignore
+    progress.placeholder = placeholder  # type: ignore
+
+    await TelegramViews(None, None).answer_transcription(message, transcription(text), progress)  # type: ignore
+    assert placeholder.edits == [settings.SERVICE_EMPTY_TRANSCRIPTION_RESPONSE]
+    assert message.replies == []
+
+
+@pytest.mark.asyncio
+async def test_empty_transcription_reply():
+    message = FakeMessage()
+    await TelegramViews(None, None).answer_transcription(message, transcription(""))  # type: ignore
+    assert message.replies == [settings.SERVICE_EMPTY_TRANSCRIPTION_RESPONSE]
+
+
+@pytest.mark.asyncio
+async def test_long_transcription_continues_after_placeholder():
+    message, placeholder = FakeMessage(), FakeMessage()
+    progress = ProgressiveReply(message, render=str)  # type: ignore
+    progress.placeholder = placeholder  # type: ignore
+
+    text = "слово " * 1000
+    await TelegramViews(None, None).answer_transcription(message, transcription(text), progress)  # type: ignore
+    assert len(placeholder.edits) == 1
+    assert "".join(placeholder.edits + message.replies).replace(" ", "") == text.replace(" ", "")
+
+
+class FakeReloader:
+    def __init__(self, error: Exception | None = None) -> None:
+        self.error = error
+
+    async def reload(self) -> int:
+        if self.error is not None:
+            raise self.error
+        return 42
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "reloader, expected",
+    [
+        (FakeReloader(), "Словарь перезагружен, слов: 42"),
+        (
+            FakeReloader(ValueError("Line 3: Unmatched '['")),
+            "Не получилось перезагрузить словарь: Line 3: Unmatched '['",
+        ),
+    ],
+)
+async def test_reload_dictionary_replies(reloader, expected):
+    message = FakeMessage()
+    views = TelegramViews(None, None, dictionary_reloader=reloader)  # type: ignore
+    await views.handle_reload_dictionary(message)  # type: ignore
+    assert message.replies == [expected]
+
+
+class FakeCore:
+    @staticmethod
+    def calculate_summary(text: str) -> TextSummary:
+        return TextSummary(counter=Counter(text.split()), markup=[])
+
+
+def test_summary_progress():
+    rendered = TelegramViews(FakeCore(), None).render_summary_progress("бля бля хер")  # type: ignore
+    assert "Уже насчитал: <b>3</b>\n" in rendered
+    assert "<b>бля</b> - 2\n" in rendered
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from blya_bot.recognition.decoding import SAMPLE_RATE
+from blya_bot.recognition.vad import EnergyVad
+
+
+def make_audio(duration: float, speech: list[tuple[float, float]]) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    audio = rng.normal(0, 0.001, int(duration * SAMPLE_RATE)).astype(np.float32)
+    t = np.arange(len(audio)) / SAMPLE_RATE
+    for start, end in speech:
+        mask = (t >= start) & (t < end)
+        audio[mask] += 0.5 * np.sin(2 * np.pi * 220 * t[mask])
+    return audio
+
+
+def seconds(spans: list[tuple[int, int]]) -> list[tuple[float, float]]:
+    return [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in spans]
+
+
+def approx(spans: list[tuple[float, float]]) -> list:
+    # Speech edges are found with frame precision (30ms)
+    return [pytest.approx(span, abs=0.031) for span in spans]
+
+
+def test_silence_is_trimmed():
+    vad = EnergyVad()
+    audio = make_audio(5.0, [(1.0, 2.0), (3.5, 4.0)])
+    spans = vad.detect(audio)
+    assert seconds(spans) == approx([(0.8, 2.2), (3.3, 4.2)])
+    assert len(vad.trim(audio)) == sum(end - start for start, end in spans)
+
+
+def test_short_pauses_are_kept():
+    vad = EnergyVad(min_silence_ms=500)
+    audio = make_audio(4.0, [(1.0, 1.5), (1.7, 2.5)])
+    assert seconds(vad.detect(audio)) == approx([(0.8, 2.7)])
+
+
+def test_short_noise_is_dropped():
+    vad = EnergyVad(min_speech_ms=200)
+    audio = make_audio(4.0, [(1.0, 1.05), (2.0, 3.0)])
+    assert seconds(vad.detect(audio)) == approx([(1.8, 3.2)])
+
+
+@pytest.mark.parametrize("speech", [(0.0, 0.3), (2.7, 3.0)])
+def test_speech_at_audio_edges_is_kept(speech):
+    # Padding is clipped at audio edges, it should not affect speech length check
+    vad = EnergyVad(min_speech_ms=200, padding_ms=200)
+    spans = vad.detect(make_audio(3.0, [speech]))
+    assert seconds(spans) == approx([(max(speech[0] - 0.2, 0.0), min(speech[1] + 0.2, 3.0))])
+
+
+def test_loud_audio_is_not_trimmed():
+    audio = make_audio(2.0, [(0.0, 2.0)])
+    assert EnergyVad().trim(audio) is audio
+
+
+def test_silent_audio_is_trimmed_completely():
+    assert len(EnergyVad().trim(np.zeros(SAMPLE_RATE, dtype=np.float32))) == 0
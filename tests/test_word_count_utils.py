@@ -0,0 +1,49 @@
+import pytest
+
+from blya_bot.dictionary.entry import DictEntry, DictEntryFlags
+from blya_bot.word_count import AhoCorasickWordCounter
+from blya_bot.word_count.utils import fold_equal_chars, normalize_text, normalize_word
+
+
+def test_equal_chars_are_folded():
+    assert fold_equal_chars("ёжик йод") == "ежик иод"
+    assert normalize_word("ЁЖИК Йод") == "ежик иод"
+
+
+def test_same_length_text_has_no_offsets():
+    normalized = normalize_text("Ёлка и ЙОД")
+    assert normalized.text == "елка и иод"
+    assert normalized.offsets is None
+    assert normalized.original_span(2, 4) == (2, 4)
+
+
+def test_length_changing_lowercase_is_mapped_back():
+    # "İ" is lowercased to two chars: "i" and combining dot
+    text = "İİ ёж"
+    normalized = normalize_text(text)
+    assert normalized.text == "i̇i̇ еж"
+    assert len(normalized.text) == len(text) + 2
+    start = normalized.text.index("еж")
+    assert normalized.original_span(start, start + 2) == (3, 5)
+    # Span, which ends inside of expanded char, covers the whole original char
+    assert normalized.original_span(0, 1) == (0, 1)
+    assert normalized.original_span(0, 3) == (0, 2)
+
+
+def test_empty_span():
+    assert normalize_text("İ ёж").original_span(2, 2) == (2, 2)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Ну ЁЖ да", [((3, 5), "ЁЖ")]),
+        ("İ ёж, İİ йожик", [((2, 4), "ёж"), ((9, 14), "йожик")]),
+    ],
+)
+def test_markup_is_in_original_text_positions(text, expected):
+    flags = DictEntryFlags(morphing=False)
+    counter = AhoCorasickWordCounter([DictEntry(word="еж", flags=flags), DictEntry(word="иожик", flags=flags)])
+    summary = counter.calculate_summary(text)
+    assert summary.markup == expected
+    assert [text[start:end] for (start, end), _ in summary.markup] == [word for _, word in expected]
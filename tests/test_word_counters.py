@@ -0,0 +1,52 @@
+import logging
+
+import pytest
+
+from blya_bot.dictionary.entry import DictEntry, DictEntryFlags
+from blya_bot.dictionary.store import DictionaryStore
+from blya_bot.word_count import AVAILABLE_WORD_COUNTERS
+
+
+def make_dictionary(words: dict[str, bool]) -> list[DictEntry]:
+    # Word -> exact match flag
+    return [
+        DictEntry(word=word, flags=DictEntryFlags(morphing=False, exact_match=exact)) for word, exact in words.items()
+    ]
+
+
+@pytest.mark.parametrize("counter_cls", AVAILABLE_WORD_COUNTERS.values())
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("ну ab да", [((3, 5), "ab")]),
+        ("ну AB, ab! xab abx", [((3, 5), "AB"), ((7, 9), "ab")]),
+        # Substring entry is found inside of other words
+        ("bcd xbcdx", [((0, 3), "bcd"), ((5, 8), "bcd")]),
+        # Exact entry of several words
+        ("x a b, xa b", [((2, 5), "a b")]),
+        # Longer exact word is rejected as a part of another word, and hides substring inside of it
+        ("abbcd", []),
+        ("xabbcd", []),
+        ("ab bcd", [((0, 2), "ab"), ((3, 6), "bcd")]),
+    ],
+)
+def test_counters(counter_cls, text, expected):
+    counter = counter_cls.from_dictionary(make_dictionary({"ab": True, "abbc": True, "bcd": False, "a b": True}))
+    summary = counter.calculate_summary(text)
+    assert summary.markup == expected
+    assert sum(summary.counter.values()) == len(expected)
+
+
+@pytest.mark.parametrize("counter_cls", AVAILABLE_WORD_COUNTERS.values())
+def test_provenance_is_looked_up_only_for_debug_log(counter_cls, monkeypatch, caplog):
+    counter = counter_cls.from_dictionary(make_dictionary({"ab": True}))
+    calls = []
+    monkeypatch.setattr(DictionaryStore, "provenance", lambda store, idx: calls.append(idx))
+
+    caplog.set_level(logging.INFO)
+    counter.calculate_summary("ab ab")
+    assert calls == []
+
+    caplog.set_level(logging.DEBUG)
+    counter.calculate_summary("ab ab")
+    assert calls == [0, 0]